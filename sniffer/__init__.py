@@ -16,7 +16,7 @@ This method was used because of its:
 Alternatively, third party modules can be installed to increase performance.
 The library to install is dependent on your operating system:
 
- - Linux: install pyinotify
+ - Linux: nothing, the built-in inotify scanner is used (pyinotify works too)
  - Windows: install pywin32
  - OSX: install MacFSEvents
 
@@ -1,22 +1,87 @@
 import os
 import collections.abc
 
-__all__ = ['get_files', 'file_validator', 'runnable', 'select_runnable']
+__all__ = ['get_files', 'file_validator', 'runnable', 'select_runnable',
+           'changed_files', 'targets_for', 'test_files_for']
+
+
+def _has_ext(filename, exts):
+    return filename.split('.')[-1].lower() in exts
+
+
+def _exts(exts):
+    if type(exts) is str:
+        exts = [exts]
+    return set(exts)
 
 
 def get_files(exts=('py',), dirname=None):
     if dirname is None:
         dirname = os.getcwd()
-    if type(exts) is str:
-        exts = [exts]
-    exts = set(exts)
+    exts = _exts(exts)
     for root, dirs, files in os.walk(dirname):
         for f in files:
-            if f.split('.')[-1].lower() not in exts:
+            if not _has_ext(f, exts):
                 continue
             yield os.path.join(root, f)
 
 
+def changed_files(changes, exts=None, deleted=False):
+    """
+    Returns the sorted paths created or modified (and deleted, if deleted is
+    True) in a ChangeSet, only the ones with the given extensions if any.
+    """
+    paths = changes.created | changes.modified
+    if deleted:
+        paths = paths | changes.deleted
+    if exts is not None:
+        exts = _exts(exts)
+        paths = [p for p in paths if _has_ext(p, exts)]
+    return sorted(paths)
+
+
+def targets_for(paths, targets):
+    """
+    Returns the targets (directories, eg - packages or projects) containing
+    any of the given paths, in the given order. A path counts for the
+    deepest target containing it.
+    """
+    prefixes = sorted(((os.path.join(os.path.abspath(t), ''), t)
+                       for t in targets), reverse=True)
+    found = set()
+    for path in paths:
+        path = os.path.abspath(path)
+        for prefix, target in prefixes:
+            if path.startswith(prefix):
+                found.add(target)
+                break
+    return [t for t in targets if t in found]
+
+
+def test_files_for(paths, dirname=None, prefix='test_'):
+    """
+    Returns the sorted test modules for the given Python files: the changed
+    test modules themselves, and the ``test_<name>.py`` files found under
+    dirname (cwd if None given) for the other modules.
+    """
+    names = set()
+    tests = set()
+    for path in paths:
+        basename = os.path.basename(path)
+        if not basename.endswith('.py'):
+            continue
+        if basename.startswith(prefix):
+            if os.path.exists(path):
+                tests.add(os.path.abspath(path))
+        else:
+            names.add(prefix + basename)
+    if names:
+        for filepath in get_files('py', dirname):
+            if os.path.basename(filepath) in names:
+                tests.add(os.path.abspath(filepath))
+    return sorted(tests)
+
+
 class Wrapper(object):
     def __init__(self, func, api_type):
         self.scent_api_type = api_type
@@ -51,5 +116,16 @@ def file_validator(func):
     return Wrapper(func, api_type='file_validator')
 
 
-def runnable(func):
-    return Wrapper(func, api_type='runnable')
+def runnable(func=None, changes=False):
+    """
+    Marks a function to run for changes. Used as ``@runnable``, it's called
+    with sys.argv[0] and the test args. With ``@runnable(changes=True)``, it
+    also gets the ChangeSet of the batch as the ``changes`` keyword argument;
+    the ChangeSet is empty (falsy) when everything should run (eg - the
+    first run).
+    """
+    if func is None:
+        return lambda f: runnable(f, changes)
+    wrapper = Wrapper(func, api_type='runnable')
+    wrapper.wants_changes = changes
+    return wrapper
@@ -0,0 +1,125 @@
+"""
+Coalesces scanner events into batches, so a burst of changes (a checkout,
+an editor's "save all") results in a single test run.
+"""
+import threading
+import time
+
+from .changes import ChangeSet
+
+__all__ = ['EventBatcher']
+
+
+class EventBatcher(object):
+    """
+    Collects scanner events into a ChangeSet and hands it to ``dispatch``
+    once no event arrived for ``quiet`` seconds, or ``max_latency`` seconds
+    after the batch started, whichever comes first.
+
+    Batches are dispatched from a background thread, one at a time. Events
+    arriving while a batch is being dispatched start the next batch.
+    """
+    def __init__(self, dispatch, quiet=0.5, max_latency=5.0):
+        self._dispatch = dispatch
+        self.quiet = quiet
+        self.max_latency = max_latency
+        self._cond = threading.Condition()
+        self._pending = None
+        self._started_at = self._last_event_at = 0
+        self._running = False
+        self._thread = None
+
+    def observe(self, scanner):
+        """Attaches the batcher to every event of a scanner."""
+        scanner.observe('init', self.init)
+        scanner.observe('created', self.created)
+        scanner.observe('modified', self.modified)
+        scanner.observe('deleted', self.deleted)
+
+    def unobserve(self, scanner):
+        scanner.unobserve('init', self.init)
+        scanner.unobserve('created', self.created)
+        scanner.unobserve('modified', self.modified)
+        scanner.unobserve('deleted', self.deleted)
+
+    def init(self):
+        """Starts a (possibly empty) batch, like the scanner's init event."""
+        self.add(None, None)
+
+    def created(self, filepath):
+        self.add('created', filepath)
+
+    def modified(self, filepath):
+        self.add('modified', filepath)
+
+    def deleted(self, filepath):
+        self.add('deleted', filepath)
+
+    def add(self, event_name, filepath):
+        """
+        Records an event into the pending batch. An event_name of None only
+        ensures a batch is pending.
+        """
+        now = time.time()
+        with self._cond:
+            if self._pending is None:
+                self._pending = ChangeSet()
+                self._started_at = time.monotonic()
+            if event_name is not None:
+                self._pending.add(event_name, filepath, now)
+            self._last_event_at = time.monotonic()
+            self._cond.notify()
+
+    def start(self):
+        """Starts the dispatching thread."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._worker,
+                                        name='sniffer-batcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops the dispatching thread, dropping any pending batch."""
+        with self._cond:
+            self._running = False
+            self._pending = None
+            self._cond.notify()
+
+    def flush(self):
+        """
+        Returns the pending batch (or None), without waiting for it to
+        settle. The batch is no longer pending afterwards.
+        """
+        with self._cond:
+            changes, self._pending = self._pending, None
+            return changes
+
+    def _next_batch(self):
+        """
+        Blocks until the pending batch settles and returns it, or returns
+        None once stopped.
+        """
+        with self._cond:
+            while self._running:
+                if self._pending is None:
+                    self._cond.wait()
+                    continue
+                deadline = min(self._last_event_at + self.quiet,
+                               self._started_at + self.max_latency)
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                changes, self._pending = self._pending, None
+                return changes
+            return None
+
+    def _worker(self):
+        while True:
+            changes = self._next_batch()
+            if changes is None:
+                return
+            self._dispatch(changes)
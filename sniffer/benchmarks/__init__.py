@@ -0,0 +1,82 @@
+"""
+Benchmarks for sniffer's scanners.
+
+These are plain scripts that run locally against synthetic directory trees,
+eg::
+
+  python -m sniffer.benchmarks.syscalls --files 20000
+
+``sniffer.benchmarks.suite`` measures every scanner backend end to end
+(poll time, idle CPU, peak memory and edit to callback latencies) and
+prints a JSON report.
+
+None of them are run as part of the test suite.
+"""
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+__all__ = ['SHAPES', 'make_tree', 'synthetic_tree']
+
+
+# shape name: (files per directory, directories per directory or None for
+# all directories side by side)
+SHAPES = {
+    'flat': (50, None),
+    'wide': (1000, None),
+    'deep': (10, 2),
+}
+
+
+def _dirname(root, index, fanout):
+    """
+    Returns the path of the index-th directory of a tree. With a fanout,
+    directories nest: each has ``fanout`` subdirectories.
+    """
+    if fanout is None:
+        return os.path.join(root, 'pkg%d' % index)
+    names = []
+    while index:
+        names.append('pkg%d' % index)
+        index = (index - 1) // fanout
+    return os.path.join(root, *reversed(names))
+
+
+def make_tree(root, files=1000, per_dir=50, ext='.py', fanout=None):
+    """
+    Creates ``files`` small files under root, ``per_dir`` to a directory.
+    With a fanout, the directories are nested ``fanout`` to a directory
+    instead of all being under root.
+    Timestamps are moved a minute back so the tree looks settled.
+    Returns the list of created file paths.
+    """
+    paths, dirs = [], [root]
+    for i in range(files):
+        dirpath = _dirname(root, i // per_dir, fanout)
+        if i % per_dir == 0:
+            if not os.path.isdir(dirpath):
+                os.makedirs(dirpath)
+            dirs.append(dirpath)
+        filepath = os.path.join(dirpath, 'mod%d%s' % (i, ext))
+        with open(filepath, 'w') as handle:
+            handle.write('x = %d\n' % i)
+        paths.append(filepath)
+    past = time.time() - 60
+    for path in paths + dirs:
+        os.utime(path, (past, past))
+    return paths
+
+
+@contextmanager
+def synthetic_tree(files=1000, per_dir=50, fanout=None):
+    """
+    Context manager yielding (root, filepaths) of a temporary tree built by
+    make_tree. The tree is removed afterwards.
+    """
+    root = tempfile.mkdtemp(prefix='sniffer-bench-')
+    try:
+        yield root, make_tree(root, files, per_dir, fanout=fanout)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
@@ -0,0 +1,119 @@
+"""
+Wall time per poll of the PollingScanner against its number of workers::
+
+  python -m sniffer.benchmarks.parallel --files 200000 --workers 1,2,4,8,16
+
+Local disks answer stat calls from the page cache, so ``--latency`` can add
+an artificial delay (in milliseconds) to every stat and directory listing to
+approximate a network or overlay filesystem.
+"""
+from __future__ import print_function
+from optparse import OptionParser
+import os
+import time
+
+from . import synthetic_tree
+from ..scanner.base import PollingScanner
+
+
+class _SlowEntry(object):
+    def __init__(self, entry, delay):
+        self._entry = entry
+        self._delay = delay
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+    def stat(self, *args, **kwargs):
+        time.sleep(self._delay)
+        return self._entry.stat(*args, **kwargs)
+
+
+class SlowFilesystem(object):
+    """
+    Patches os.stat and os.scandir to sleep ``delay`` seconds per call (and
+    per DirEntry.stat()) while the context is active. Sleeping releases the
+    GIL, just like a blocking stat call does.
+    """
+    def __init__(self, delay):
+        self.delay = delay
+
+    def __enter__(self):
+        self._originals = os.stat, os.scandir
+        stat, scandir = self._originals
+        delay = self.delay
+
+        def slow_stat(*args, **kwargs):
+            time.sleep(delay)
+            return stat(*args, **kwargs)
+
+        def slow_scandir(*args, **kwargs):
+            time.sleep(delay)
+            iterator = scandir(*args, **kwargs)
+
+            class Listing(object):
+                def __enter__(self):
+                    return self
+
+                def __exit__(self, *exc_info):
+                    iterator.close()
+
+                def __iter__(self):
+                    for entry in iterator:
+                        yield _SlowEntry(entry, delay)
+            return Listing()
+
+        if delay:
+            os.stat, os.scandir = slow_stat, slow_scandir
+        return self
+
+    def __exit__(self, *exc_info):
+        os.stat, os.scandir = self._originals
+
+
+def measure(root, workers, incremental=False, repeat=3):
+    """Returns the best wall time, in seconds, of ``repeat`` polls."""
+    scanner = PollingScanner([root], warn_missing_lib=False, workers=workers,
+                             incremental=incremental)
+    scanner._scan(trigger=False)
+    timings = []
+    for i in range(repeat):
+        start = time.time()
+        scanner._scan()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main(args=None):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option('--files', dest='files', type='int', default=200000,
+                      help="Number of files in the tree. (default: %default)")
+    parser.add_option('--per-dir', dest='per_dir', type='int', default=50,
+                      help="Files per directory. (default: %default)")
+    parser.add_option('--workers', dest='workers', default='1,2,4,8,16',
+                      help="Comma separated worker counts to measure. "
+                      "(default: %default)")
+    parser.add_option('--latency', dest='latency', type='float', default=0,
+                      help="Artificial latency, in ms, added to each stat "
+                      "and directory listing. (default: %default)")
+    parser.add_option('--incremental', dest='incremental', default=False,
+                      action='store_true',
+                      help="Measure the incremental polling mode.")
+    options, args = parser.parse_args(args)
+    counts = [int(w) for w in options.workers.split(',')]
+
+    with synthetic_tree(options.files, options.per_dir) as (root, paths):
+        print("files=%d latency=%.2fms incremental=%s" % (
+            options.files, options.latency, options.incremental))
+        print("%8s %12s %10s" % ('workers', 'ms/poll', 'speedup'))
+        baseline = None
+        with SlowFilesystem(options.latency / 1000.0):
+            for workers in counts:
+                elapsed = measure(root, workers, options.incremental)
+                baseline = baseline or elapsed
+                print("%8d %12.1f %9.2fx" % (
+                    workers, elapsed * 1000, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+"""
+Measures every scanner backend available here against synthetic trees::
+
+  python -m sniffer.benchmarks.suite --files 1000,100000 --shapes flat,deep \
+      --output report.json
+
+Each backend runs in its own process, per tree, which measures:
+
+  ``poll_ms``           Wall time of a poll of an unchanged tree (polling
+                        backends only).
+  ``idle_cpu_per_min``  CPU seconds used per minute while nothing changes.
+  ``peak_rss_mb``       Peak resident memory of the process.
+  ``bytes_per_file``    Memory the watch list takes per file, estimated
+                        with sys.getsizeof, next to what a plain
+                        {path: signature} dict would take (polling backends
+                        only).
+  ``latency_ms``        Percentiles of the time from an edit to its
+                        callback, per edit pattern.
+
+The report is printed as JSON (with sorted keys, to be diffed between
+runs); progress goes to stderr.
+"""
+from __future__ import print_function
+from optparse import OptionParser
+import importlib
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from . import SHAPES, synthetic_tree
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+# name: (module of sniffer.scanner, class, keyword options, polls)
+BACKENDS = (
+    ('polling', 'base', 'PollingScanner', {}, True),
+    ('polling-incremental', 'base', 'PollingScanner',
+     {'incremental': True}, True),
+    ('inotify', 'inotify_scanner', 'INotifyScanner', {}, False),
+    ('pyinotify', 'pyinotify_scanner', 'PyINotifyScanner', {}, False),
+    ('fsevents', 'fsevents_scanner', 'FSEventsScanner', {}, False),
+    ('pywin', 'pywin_scanner', 'PyWinScanner', {}, False),
+)
+
+PATTERNS = ('modify-one', 'modify-burst', 'create-delete', 'atomic-save')
+
+
+def scanner_class(name):
+    """Returns the scanner class and options of a backend, or None."""
+    for backend, module, cls, options, polls in BACKENDS:
+        if backend == name:
+            try:
+                mod = importlib.import_module('sniffer.scanner.' + module)
+            except ImportError:
+                return None
+            return getattr(mod, cls), options
+    raise ValueError("Unknown backend: %r" % name)
+
+
+def available_backends():
+    return [b[0] for b in BACKENDS if scanner_class(b[0]) is not None]
+
+
+def percentiles(samples):
+    """Returns the p50, p90, p99 and max of samples (nearest rank)."""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+
+    def rank(p):
+        index = max(0, int(round(p / 100.0 * len(samples))) - 1)
+        return samples[min(index, len(samples) - 1)]
+    return {'p50': rank(50), 'p90': rank(90), 'p99': rank(99),
+            'max': samples[-1]}
+
+
+def dict_nbytes(files):
+    """
+    Estimates the memory a {filepath: signature} dict takes, with its keys
+    and values.
+    """
+    size = sys.getsizeof(files)
+    for filepath, signature in files.items():
+        size += sys.getsizeof(filepath) + sys.getsizeof(signature) + \
+            sum(sys.getsizeof(n) for n in signature)
+    return size
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on OSX
+    return peak / (1024.0 * 1024 if sys.platform == 'darwin' else 1024.0)
+
+
+class Recorder(object):
+    """Records when the first event for each path was received."""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seen = {}
+
+    def record(self, filepath):
+        with self._cond:
+            self._seen.setdefault(filepath, time.time())
+            self._cond.notify_all()
+
+    def expect(self, paths):
+        """Forgets the events of paths, before editing them."""
+        with self._cond:
+            for path in paths:
+                self._seen.pop(path, None)
+
+    def wait(self, paths, timeout):
+        """
+        Waits until every path had an event. Returns {path: time or None}.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: all(p in self._seen for p in paths),
+                                timeout)
+            return dict((p, self._seen.get(p)) for p in paths)
+
+
+class _Edits(object):
+    """The edit patterns, applied to a tree. Each returns latencies."""
+    def __init__(self, root, paths, recorder, edits, timeout, interval):
+        self.root = root
+        self.paths = paths
+        self.recorder = recorder
+        self.edits = edits
+        self.timeout = timeout
+        self.interval = interval
+        self.random = random.Random(0)
+        self.counter = 0
+        self.missed = 0
+
+    def _write(self, filepath):
+        self.counter += 1
+        with open(filepath, 'w') as handle:
+            handle.write('x = %d\n' % self.counter)
+
+    def _measure(self, edit, paths):
+        """
+        Calls edit(path) for each path, then waits for their events. Edits
+        start at a random point of the polling interval, not right after the
+        previous events.
+        """
+        time.sleep(self.random.uniform(0, self.interval))
+        self.recorder.expect(paths)
+        edited_at = {}
+        for path in paths:
+            edited_at[path] = time.time()
+            edit(path)
+        seen = self.recorder.wait(paths, self.timeout)
+        latencies = []
+        for path in paths:
+            if seen[path] is None:
+                self.missed += 1
+            else:
+                latencies.append(max(0.0, seen[path] - edited_at[path]))
+        return latencies
+
+    def modify_one(self):
+        latencies = []
+        for i in range(self.edits):
+            latencies += self._measure(self._write,
+                                       [self.random.choice(self.paths)])
+        return latencies
+
+    def modify_burst(self):
+        count = min(len(self.paths), self.edits * 10)
+        return self._measure(self._write,
+                             self.random.sample(self.paths, count))
+
+    def create_delete(self):
+        paths = [os.path.join(os.path.dirname(self.random.choice(self.paths)),
+                              'new%d.py' % i) for i in range(self.edits)]
+        return self._measure(self._write, paths) + \
+            self._measure(os.remove, paths)
+
+    def atomic_save(self):
+        def save(filepath):
+            tmp = os.path.join(os.path.dirname(filepath),
+                               '.' + os.path.basename(filepath) + '.tmp')
+            self._write(tmp)
+            os.replace(tmp, filepath)
+        latencies = []
+        for i in range(self.edits):
+            latencies += self._measure(save, [self.random.choice(self.paths)])
+        return latencies
+
+
+def _wait_until_watching(root, recorder, timeout):
+    """
+    Touches a file until the scanner reports it, so measurements start once
+    the scanner watches the tree.
+    """
+    sentinel = os.path.join(root, 'sentinel.py')
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        recorder.expect([sentinel])
+        with open(sentinel, 'w') as handle:
+            handle.write('x = %r\n' % time.time())
+        if recorder.wait([sentinel], 0.5)[sentinel] is not None:
+            return True
+    return False
+
+
+def measure(backend, root, interval=0.5, idle=5.0, edits=10, timeout=10.0):
+    """
+    Measures a backend against the tree at root, in this process. Returns
+    the results as a dictionary.
+    """
+    cls, options = scanner_class(backend)
+    polls = [b[4] for b in BACKENDS if b[0] == backend][0]
+    paths = sorted(os.path.join(dirpath, f)
+                   for dirpath, dirs, files in os.walk(root)
+                   for f in files if f.endswith('.py'))
+    results = {'backend': backend, 'files': len(paths)}
+
+    recorder = Recorder()
+    scanner = cls([root], warn_missing_lib=False, **options)
+    for event in ('created', 'modified', 'deleted'):
+        scanner.observe(event, recorder.record)
+    thread = threading.Thread(target=scanner.loop, args=(interval,))
+    thread.daemon = True
+    started_at = time.time()
+    thread.start()
+    if not _wait_until_watching(root, recorder, timeout + len(paths) / 1e4):
+        results['error'] = "The scanner never reported changes."
+        return results
+    results['startup_s'] = time.time() - started_at
+
+    cpu = time.process_time()
+    time.sleep(idle)
+    results['idle_cpu_per_min'] = (time.process_time() - cpu) * 60 / idle
+
+    patterns = _Edits(root, paths, recorder, edits, timeout, interval)
+    results['latency_ms'] = {}
+    for pattern in PATTERNS:
+        patterns.missed = 0
+        latencies = getattr(patterns, pattern.replace('-', '_'))()
+        stats = dict((k, v * 1000) for k, v in
+                     percentiles(latencies).items())
+        stats.update(samples=len(latencies), missed=patterns.missed)
+        results['latency_ms'][pattern] = stats
+    scanner.stop()
+    thread.join(interval + 1)
+    os.remove(os.path.join(root, 'sentinel.py'))
+
+    if polls:
+        scanner = cls([root], warn_missing_lib=False, **options)
+        scanner._scan(trigger=False)
+        timings = []
+        for i in range(3):
+            start = time.time()
+            scanner._scan()
+            timings.append(time.time() - start)
+        results['poll_ms'] = min(timings) * 1000
+        table = scanner._watched_files
+        count = max(1, len(table))
+        results['bytes_per_file'] = {
+            'table': table.nbytes() / float(count),
+            'dict': dict_nbytes(dict(table.items())) / float(count)}
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def run_worker(backend, root, options):
+    """Runs measure() for a backend in a new process."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p or os.curdir for p in sys.path)
+    command = [sys.executable, '-m', 'sniffer.benchmarks.suite',
+               '--worker', backend, '--root', root,
+               '--interval', str(options.interval),
+               '--idle', str(options.idle), '--edits', str(options.edits)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, env=env)
+    output = process.communicate()[0].decode('utf-8', 'replace')
+    try:
+        return json.loads(output.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {'backend': backend,
+                'error': "The worker exited with status %d." %
+                process.returncode}
+
+
+def main(args=None):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option('--files', dest='files', default='1000,10000',
+                      help="Comma separated tree sizes. (default: %default)")
+    parser.add_option('--shapes', dest='shapes', default='flat,wide,deep',
+                      help="Comma separated tree shapes, among %s. "
+                      "(default: %%default)" % ', '.join(sorted(SHAPES)))
+    parser.add_option('--backends', dest='backends', default=None,
+                      help="Comma separated backends. (default: every "
+                      "backend available here)")
+    parser.add_option('--interval', dest='interval', type='float',
+                      default=0.5,
+                      help="Polling interval in seconds. (default: %default)")
+    parser.add_option('--idle', dest='idle', type='float', default=5.0,
+                      help="Seconds of idle time the CPU usage is measured "
+                      "over. (default: %default)")
+    parser.add_option('--edits', dest='edits', type='int', default=10,
+                      help="Edits per pattern (ten times that for bursts). "
+                      "(default: %default)")
+    parser.add_option('--output', dest='output', metavar='FILE',
+                      help="Also write the report to FILE.")
+    parser.add_option('--worker', dest='worker', help="(internal)")
+    parser.add_option('--root', dest='root', help="(internal)")
+    options, args = parser.parse_args(args)
+
+    if options.worker:
+        print(json.dumps(measure(options.worker, options.root,
+                                 options.interval, options.idle,
+                                 options.edits)))
+        return
+
+    backends = available_backends()
+    if options.backends:
+        backends = [b for b in options.backends.split(',') if b in backends]
+    report = {'python': sys.version.split()[0], 'platform': sys.platform,
+              'interval': options.interval, 'runs': []}
+    for files in [int(f) for f in options.files.split(',')]:
+        for shape in options.shapes.split(','):
+            per_dir, fanout = SHAPES[shape]
+            print("Building a %s tree of %d files..." % (shape, files),
+                  file=sys.stderr)
+            with synthetic_tree(files, per_dir, fanout) as (root, paths):
+                for backend in backends:
+                    print("  %s" % backend, file=sys.stderr)
+                    results = run_worker(backend, root, options)
+                    results['shape'] = shape
+                    report['runs'].append(results)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if options.output:
+        with open(options.output, 'w') as handle:
+            handle.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
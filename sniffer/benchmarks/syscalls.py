@@ -0,0 +1,183 @@
+"""
+Counts the filesystem calls made by a single poll of the PollingScanner.
+
+Compares the os.walk based scan that sniffer used to ship (kept here as
+LegacyPollingScanner) with the current os.scandir based scan, plain and
+incremental::
+
+  python -m sniffer.benchmarks.syscalls --files 20000 --touch 10
+"""
+from __future__ import print_function
+from functools import partial
+from optparse import OptionParser
+import os
+import time
+
+from . import synthetic_tree
+from ..scanner.base import PollingScanner
+
+
+class LegacyPollingScanner(PollingScanner):
+    """
+    The os.walk + os.stat scan loop that PollingScanner used before it moved
+    to os.scandir. Each changed file is stat'ed two or three times.
+    """
+    def __init__(self, *args, **kwargs):
+        super(LegacyPollingScanner, self).__init__(*args, **kwargs)
+        self._watched_files = {}  # {filepath: mtime}
+
+    def _mtime(self, filepath):
+        try:
+            return os.stat(filepath).st_mtime
+        except OSError:
+            return 0
+
+    def _scan(self, trigger=True):
+        changed = False
+        files_seen = set()
+        for path in self.paths:
+            for root, dirs, files in os.walk(path):
+                for f in files:
+                    fpath = os.path.join(root, f)
+                    if not self.is_valid_type(fpath):
+                        continue
+                    files_seen.add(fpath)
+                    is_new = fpath not in self._watched_files
+                    if is_new or \
+                            self._watched_files[fpath] < self._mtime(fpath):
+                        if trigger:
+                            if is_new:
+                                if os.path.exists(fpath):
+                                    self._trigger('created', fpath)
+                            elif self._mtime(fpath) > \
+                                    self._watched_files[fpath]:
+                                self._trigger('modified', fpath)
+                        self._watched_files[fpath] = self._mtime(fpath)
+                        changed = True
+        return changed
+
+
+class _CountingEntry(object):
+    "Wraps an os.DirEntry, counting the first (uncached) stat() call."
+    def __init__(self, entry, counter):
+        self._entry = entry
+        self._counter = counter
+        self._stated = False
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+    def stat(self, *args, **kwargs):
+        if not self._stated:
+            self._stated = True
+            self._counter['stat'] += 1
+        return self._entry.stat(*args, **kwargs)
+
+
+class _CountingScandir(object):
+    def __init__(self, iterator, counter):
+        self._iterator = iterator
+        self._counter = counter
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return _CountingEntry(next(self._iterator), self._counter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._iterator.close()
+
+    def close(self):
+        self._iterator.close()
+
+
+class SyscallCounter(object):
+    """
+    Patches os.stat, os.lstat and os.scandir to count calls made while the
+    context is active. stat() calls made through DirEntry objects are counted
+    as well.
+    """
+    def __init__(self):
+        self.counts = {'stat': 0, 'scandir': 0}
+
+    def __enter__(self):
+        self._originals = os.stat, os.lstat, os.scandir
+        counts = self.counts
+        stat, lstat, scandir = self._originals
+
+        def counting_stat(*args, **kwargs):
+            counts['stat'] += 1
+            return stat(*args, **kwargs)
+
+        def counting_lstat(*args, **kwargs):
+            counts['stat'] += 1
+            return lstat(*args, **kwargs)
+
+        def counting_scandir(*args, **kwargs):
+            counts['scandir'] += 1
+            return _CountingScandir(scandir(*args, **kwargs), counts)
+
+        os.stat, os.lstat, os.scandir = \
+            counting_stat, counting_lstat, counting_scandir
+        return self
+
+    def __exit__(self, *exc_info):
+        os.stat, os.lstat, os.scandir = self._originals
+
+
+def measure(scanner_cls, root, filepaths, touch, repeat=5):
+    """
+    Returns (counts, seconds) of a single poll after touching ``touch`` files.
+    The timing is taken from separate, uninstrumented polls.
+    """
+    def poll(counter=None):
+        scanner = scanner_cls([root], warn_missing_lib=False)
+        scanner._scan(trigger=False)
+        later = time.time() + 10 + len(timings)
+        for filepath in filepaths[:touch]:
+            os.utime(filepath, (later, later))
+        start = time.time()
+        if counter is None:
+            scanner._scan()
+        else:
+            with counter:
+                scanner._scan()
+        timings.append(time.time() - start)
+
+    timings = []
+    for i in range(repeat):
+        poll()
+    counter = SyscallCounter()
+    poll(counter)
+    return counter.counts, min(timings[:repeat])
+
+
+def main(args=None):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option('--files', dest='files', type='int', default=10000,
+                      help="Number of files in the tree. (default: %default)")
+    parser.add_option('--touch', dest='touch', type='int', default=10,
+                      help="Files modified before the measured poll. "
+                      "(default: %default)")
+    options, args = parser.parse_args(args)
+
+    with synthetic_tree(options.files) as (root, filepaths):
+        print("files=%d touched=%d" % (options.files, options.touch))
+        print("%-12s %10s %10s %10s %10s" % (
+            'scanner', 'scandir', 'stat', 'total', 'ms/poll'))
+        for name, cls in (('before', LegacyPollingScanner),
+                          ('after', PollingScanner),
+                          ('incremental', partial(PollingScanner,
+                                                  incremental=True))):
+            counts, elapsed = measure(cls, root, filepaths, options.touch)
+            print("%-12s %10d %10d %10d %10.1f" % (
+                name, counts['scandir'], counts['stat'],
+                counts['scandir'] + counts['stat'], elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
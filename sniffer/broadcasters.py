@@ -1,6 +1,8 @@
 from __future__ import print_function
 import sys
 
+from .metrics import NULL_METRICS
+
 
 class NullEmitter(object):
     "Emitter that does nothing."
@@ -108,16 +110,20 @@ class Broadcaster(object):
         self.emitters = list(emitters)
 
     def success(self, sniffer):
+        metrics = getattr(sniffer, 'metrics', NULL_METRICS)
         for emit in list(self.emitters):
             try:
-                emit.success(sniffer)
+                with metrics.span('emit:' + type(emit).__name__):
+                    emit.success(sniffer)
             except Exception as e:
                 self.remove(emit, str(e))
 
     def failure(self, sniffer):
+        metrics = getattr(sniffer, 'metrics', NULL_METRICS)
         for emit in list(self.emitters):
             try:
-                emit.failure(sniffer)
+                with metrics.span('emit:' + type(emit).__name__):
+                    emit.failure(sniffer)
             except Exception as e:
                 self.remove(emit, str(e))
 
@@ -0,0 +1,121 @@
+"""
+Structured description of what changed on disk between two points in time.
+"""
+import time
+
+__all__ = ['ChangeSet']
+
+
+class ChangeSet(object):
+    """
+    Sets of created, modified and deleted file paths.
+
+    A ChangeSet is falsy when it contains no changes, so it can stand in for
+    the boolean that scanners used to return from a scan.
+
+    ``timestamps`` maps each path added through add() to the time of its
+    latest event.
+    """
+    EVENTS = ('created', 'modified', 'deleted')
+
+    def __init__(self, created=(), modified=(), deleted=()):
+        self.created = set(created)
+        self.modified = set(modified)
+        self.deleted = set(deleted)
+        self.timestamps = {}
+
+    @classmethod
+    def diff(cls, old, new):
+        """
+        Computes the ChangeSet between two {filepath: signature} mappings.
+        """
+        old_paths, new_paths = old.keys(), new.keys()
+        return cls(
+            created=new_paths - old_paths,
+            modified=[p for p in new_paths & old_paths if old[p] != new[p]],
+            deleted=old_paths - new_paths,
+        )
+
+    def state(self, filepath):
+        """
+        Returns the event name filepath is recorded under, or None.
+        """
+        for event in self.EVENTS:
+            if filepath in getattr(self, event):
+                return event
+        return None
+
+    def add(self, event_name, filepath, timestamp=None):
+        """
+        Records an event, folding it with what is already known about the
+        path so each path ends up with one logical change:
+
+          created then modified  -> created
+          created then deleted   -> nothing (a temporary file)
+          modified then deleted  -> deleted
+          deleted then created   -> modified (eg - an editor's atomic save)
+        """
+        if event_name not in self.EVENTS:
+            raise TypeError(('event_name ("%s") can only be one of the '
+                             'following: %s') % (event_name,
+                                                 repr(self.EVENTS)))
+        previous = self.state(filepath)
+        self.discard(filepath)
+        if previous == 'created':
+            if event_name == 'deleted':
+                return
+            event_name = 'created'
+        elif previous == 'deleted' and event_name != 'deleted':
+            event_name = 'modified'
+        elif previous == 'modified' and event_name == 'created':
+            event_name = 'modified'
+        getattr(self, event_name).add(filepath)
+        self.timestamps[filepath] = timestamp or time.time()
+
+    def discard(self, filepath):
+        """Forgets everything recorded about filepath."""
+        for event in self.EVENTS:
+            getattr(self, event).discard(filepath)
+        self.timestamps.pop(filepath, None)
+
+    def update(self, other):
+        """Folds the changes of another ChangeSet into this one."""
+        for event_name, filepath in other.events():
+            self.add(event_name, filepath, other.timestamps.get(filepath))
+
+    @property
+    def paths(self):
+        """All the paths that changed, in any way."""
+        return self.created | self.modified | self.deleted
+
+    def events(self):
+        """
+        Yields (event_name, filepath) pairs in a stable order: created, then
+        modified, then deleted, each sorted by path.
+        """
+        for event in self.EVENTS:
+            for filepath in sorted(getattr(self, event)):
+                yield event, filepath
+
+    def __len__(self):
+        return len(self.created) + len(self.modified) + len(self.deleted)
+
+    def __bool__(self):
+        return len(self) > 0
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        if not isinstance(other, ChangeSet):
+            return NotImplemented
+        return (self.created, self.modified, self.deleted) == \
+            (other.created, other.modified, other.deleted)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __repr__(self):
+        return "<ChangeSet created=%r modified=%r deleted=%r>" % (
+            sorted(self.created), sorted(self.modified), sorted(self.deleted))
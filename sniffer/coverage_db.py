@@ -0,0 +1,362 @@
+"""
+Coverage driven test selection.
+
+While nose runs, the lines each test executes in the watched files are
+recorded into a SQLite database. When files change, the stored copy of each
+file is diffed against the new one, and only the tests that executed a
+changed line are rerun. Their rows are then replaced by the new recording,
+while the rows of the other tests are moved along with the lines they point
+to, so the database stays in sync without full runs.
+"""
+import bisect
+import difflib
+import os
+import sqlite3
+import sys
+import threading
+
+from .impact import TEST_MATCH
+
+__all__ = ['CoverageDatabase', 'LineTracer', 'nose_plugin']
+
+# pseudo test owning the lines run while importing modules
+MODULE_LEVEL = '<module>'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tests (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    path TEXT
+);
+CREATE TABLE IF NOT EXISTS lines (
+    file INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    test INTEGER NOT NULL,
+    PRIMARY KEY (file, line, test)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lines_test ON lines (test);
+"""
+
+
+def _read(filepath):
+    try:
+        with open(filepath, 'rb') as handle:
+            return handle.read().decode('utf-8', 'replace')
+    except (OSError, IOError):
+        return None
+
+
+def _diff(old, new):
+    """
+    Compares two versions of a file. Returns the old line numbers that
+    changed (lines around insertions included) and a function mapping old
+    line numbers to new ones.
+    """
+    opcodes = difflib.SequenceMatcher(None, old.splitlines(),
+                                      new.splitlines(),
+                                      autojunk=False).get_opcodes()
+    changed = set()
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'insert':
+            changed.update((i1, i1 + 1))
+        elif tag != 'equal':
+            changed.update(range(i1 + 1, i2 + 1))
+
+    ends = [i2 for tag, i1, i2, j1, j2 in opcodes]
+
+    def remap(line):
+        index = bisect.bisect_left(ends, line)
+        if index == len(opcodes):
+            return line
+        tag, i1, i2, j1, j2 = opcodes[index]
+        return line + j1 - i1 if tag == 'equal' else j1 + 1
+    return changed, remap
+
+
+class CoverageDatabase(object):
+    """
+    Maps the lines of the watched files to the tests executing them.
+
+    Tests are named like nose's command line addresses
+    (``path/to/test_file.py:Class.method``), so the names select() returns
+    can be passed to nose as is.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            dirname = os.path.dirname(self.filename)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            # runs happen on the batcher's thread
+            self._db = sqlite3.connect(self.filename,
+                                       check_same_thread=False)
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _file_id(self, filepath):
+        row = self.db.execute("SELECT id FROM files WHERE path = ?",
+                              (filepath,)).fetchone()
+        return row and row[0]
+
+    def _test_id(self, name):
+        row = self.db.execute("SELECT id FROM tests WHERE name = ?",
+                              (name,)).fetchone()
+        if row:
+            return row[0]
+        return self.db.execute(
+            "INSERT INTO tests (name, path) VALUES (?, ?)",
+            (name, name.partition(':')[0])).lastrowid
+
+    def is_empty(self):
+        return self.db.execute("SELECT 1 FROM lines LIMIT 1").fetchone() \
+            is None
+
+    def select(self, changes):
+        """
+        Returns the sorted names of the tests that executed lines changed by
+        a ChangeSet, or None when the whole suite should run: no coverage
+        was recorded yet, or files that can't be mapped to lines changed
+        (new files, non Python files).
+        """
+        if not changes or changes.created or self.is_empty():
+            return None
+        if any(not f.endswith('.py') for f in changes.paths):
+            return None
+        with self.db:
+            tests = set()
+            for filepath in changes.deleted:
+                tests.update(self._tests_covering(filepath))
+                self.prune(filepath)
+            for filepath in changes.modified:
+                tests.update(self._update_file(filepath))
+        return sorted(tests)
+
+    def _tests_covering(self, filepath, lines=None):
+        """Returns the names of the tests covering (some lines of) a file."""
+        query = ("SELECT DISTINCT tests.name FROM lines JOIN files ON "
+                 "files.id = lines.file JOIN tests ON tests.id = lines.test "
+                 "WHERE files.path = ?")
+        names = set()
+        if lines is None:
+            names.update(r[0] for r in self.db.execute(query, (filepath,)))
+        else:
+            query += " AND lines.line = ?"
+            for line in lines:
+                names.update(r[0] for r in
+                             self.db.execute(query, (filepath, line)))
+        if lines is not None and MODULE_LEVEL in names:
+            # module level code changed: every test using the file is affected
+            names = self._tests_covering(filepath)
+        names.discard(MODULE_LEVEL)
+        return names
+
+    def _update_file(self, filepath):
+        """
+        Diffs a modified file against its stored copy, moves the rows of its
+        lines accordingly and returns the tests that ran changed lines.
+        """
+        row = self.db.execute("SELECT id, source FROM files WHERE path = ?",
+                              (filepath,)).fetchone()
+        source = _read(filepath)
+        if row is None or source is None:
+            # never executed by a test (test modules that failed to import
+            # included), so only a test module itself needs to run
+            if TEST_MATCH.search(os.path.basename(filepath)):
+                return set([filepath])
+            return set()
+        file_id, old = row
+        changed, remap = _diff(old, source)
+        tests = self._tests_covering(filepath, sorted(changed))
+        rows = self.db.execute("SELECT line, test FROM lines WHERE file = ?",
+                               (file_id,)).fetchall()
+        self.db.execute("DELETE FROM lines WHERE file = ?", (file_id,))
+        self.db.executemany(
+            "INSERT OR IGNORE INTO lines (file, line, test) VALUES (?, ?, ?)",
+            ((file_id, remap(line), test) for line, test in rows))
+        self.db.execute("UPDATE files SET source = ? WHERE id = ?",
+                        (source, file_id))
+        if any(name.partition(':')[0] == filepath for name in tests):
+            # tests may have been renamed or removed: rerun the whole module
+            tests = set(name for name in tests
+                        if name.partition(':')[0] != filepath)
+            tests.add(filepath)
+            self._forget_tests(filepath)
+        return tests
+
+    def prune(self, filepath):
+        """Forgets a deleted file, and the tests it defined."""
+        file_id = self._file_id(filepath)
+        if file_id is not None:
+            self.db.execute("DELETE FROM lines WHERE file = ?", (file_id,))
+            self.db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        self._forget_tests(filepath)
+
+    def _forget_tests(self, filepath):
+        """Forgets the tests defined in a file."""
+        test_ids = [r[0] for r in self.db.execute(
+            "SELECT id FROM tests WHERE path = ?", (filepath,))]
+        for test_id in test_ids:
+            self.db.execute("DELETE FROM lines WHERE test = ?", (test_id,))
+        self.db.execute("DELETE FROM tests WHERE path = ?", (filepath,))
+
+    def begin(self, full):
+        """
+        Starts recording a run. A full run replaces everything recorded.
+        """
+        if full:
+            with self.db:
+                self.db.execute("DELETE FROM lines")
+                self.db.execute("DELETE FROM tests")
+                self.db.execute("DELETE FROM files")
+
+    def record(self, name, lines):
+        """
+        Replaces the lines recorded for a test by the given (filepath,
+        line number) pairs. Lines run at import time (name is MODULE_LEVEL)
+        are added to the ones already known instead.
+        """
+        with self.db:
+            test_id = self._test_id(name)
+            if name != MODULE_LEVEL:
+                self.db.execute("DELETE FROM lines WHERE test = ?",
+                                (test_id,))
+            by_file = {}
+            for filepath, line in lines:
+                by_file.setdefault(filepath, []).append(line)
+            for filepath, numbers in by_file.items():
+                file_id = self._file_id(filepath)
+                if file_id is None:
+                    source = _read(filepath)
+                    if source is None:
+                        continue
+                    file_id = self.db.execute(
+                        "INSERT INTO files (path, source) VALUES (?, ?)",
+                        (filepath, source)).lastrowid
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO lines (file, line, test) "
+                    "VALUES (?, ?, ?)",
+                    ((file_id, n, test_id) for n in numbers))
+
+
+class LineTracer(object):
+    """
+    Collects the (filepath, line number) pairs executed in files under the
+    given directories, through sys.settrace. Frames of other files are not
+    traced at all.
+    """
+    def __init__(self, paths):
+        self.prefixes = tuple(os.path.join(os.path.abspath(p), '')
+                              for p in paths)
+        self.lines = set()
+        self._files = {}  # co_filename -> absolute path, or None to skip
+        self._own_file = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+
+    def _path_of(self, filename):
+        path = os.path.abspath(filename)
+        if not path.endswith('.py') or not path.startswith(self.prefixes) \
+                or path == self._own_file:
+            path = None
+        self._files[filename] = path
+        return path
+
+    def _trace_call(self, frame, event, arg):
+        filename = frame.f_code.co_filename
+        try:
+            path = self._files[filename]
+        except KeyError:
+            path = self._path_of(filename)
+        if path is None:
+            return None
+        lines = self.lines
+
+        def trace_line(frame, event, arg):
+            if event == 'line':
+                lines.add((path, frame.f_lineno))
+            return trace_line
+        if frame.f_lineno:  # 0 when a module starts running
+            lines.add((path, frame.f_lineno))
+        return trace_line
+
+    def start(self):
+        threading.settrace(self._trace_call)
+        sys.settrace(self._trace_call)
+
+    def stop(self):
+        sys.settrace(None)
+        threading.settrace(None)
+
+    def take(self):
+        """Returns the lines collected so far and starts over."""
+        lines = set(self.lines)  # running frames keep a reference to the set
+        self.lines.clear()
+        return lines
+
+
+def test_name(test):
+    """
+    Returns the nose command line address of a test, or None for tests
+    without one (eg - import failures).
+    """
+    address = test.address()
+    if not address or not address[0]:
+        return None
+    filename, module, call = address
+    if filename.endswith(('.pyc', '.pyo')):
+        filename = filename[:-1]
+    if call:
+        return '%s:%s' % (filename, call)
+    return filename
+
+
+def nose_plugin(database, paths, full=True):
+    """
+    Returns a nose plugin recording per test coverage of the files under
+    paths into database.
+    """
+    from nose.plugins import Plugin
+
+    class CoverageRecorder(Plugin):
+        name = 'sniffer-coverage'
+        enabled = True
+        score = 10000  # start tracing before the other plugins run
+
+        def __init__(self):
+            super(CoverageRecorder, self).__init__()
+            self.tracer = LineTracer(paths)
+
+        def options(self, parser, env):
+            pass
+
+        def configure(self, options, conf):
+            self.conf = conf
+
+        def begin(self):
+            database.begin(full)
+            self.tracer.start()
+
+        def startTest(self, test):
+            database.record(MODULE_LEVEL, self.tracer.take())
+
+        def stopTest(self, test):
+            database.record(test_name(test) or MODULE_LEVEL,
+                            self.tracer.take())
+
+        def finalize(self, result):
+            self.tracer.stop()
+            database.record(MODULE_LEVEL, self.tracer.take())
+
+    return CoverageRecorder()
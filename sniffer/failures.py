@@ -0,0 +1,96 @@
+"""
+Remembers which tests failed, so the next run can start with them.
+
+Tests that failed last time are the likeliest to fail again: running them
+first tells whether the latest changes fixed them (or not) without waiting
+for the rest of the suite.
+"""
+from __future__ import print_function
+import json
+import os
+import unittest
+
+from .coverage_db import test_name
+from .sharding import hooks_plugin, nose_options, test_module
+
+__all__ = ['FailureHistory', 'exclude_plugin', 'nose_options',
+           'recorder_plugin']
+
+
+class FailureHistory(object):
+    """
+    Names of the tests (or runnables) that failed last time, per runner,
+    kept in a JSON file.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.failures = {}
+        try:
+            with open(filename) as handle:
+                self.failures = dict((key, list(names)) for key, names in
+                                     json.load(handle).items())
+        except (IOError, OSError, ValueError, TypeError, AttributeError):
+            pass
+
+    def get(self, key):
+        """Returns the names that failed for key, in the order they did."""
+        return list(self.failures.get(key, ()))
+
+    def set(self, key, names):
+        seen = set()
+        names = [name for name in names
+                 if not (name in seen or seen.add(name))]
+        if names:
+            self.failures[key] = names
+        else:
+            self.failures.pop(key, None)
+
+    def prune(self, modules):
+        """Forgets the tests of the given test modules (eg - deleted ones)."""
+        modules = set(modules)
+        for key in list(self.failures):
+            self.set(key, [name for name in self.failures[key]
+                           if test_module(name) not in modules])
+
+    def save(self):
+        dirname = os.path.dirname(self.filename)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w') as handle:
+            json.dump(self.failures, handle, indent=0, sort_keys=True)
+        os.replace(tmp, self.filename)
+
+
+def recorder_plugin(failed):
+    """
+    Returns a nose plugin calling ``failed(name)`` with the address of each
+    test that fails or errors (skipped tests aside).
+    """
+    def add_error(test, err):
+        if not issubclass(err[0], unittest.SkipTest):
+            add_failure(test, err)
+
+    def add_failure(test, err):
+        name = test_name(test)
+        if name is not None:
+            failed(name)
+    return hooks_plugin(name='sniffer-failures', addError=add_error,
+                        addFailure=add_failure)
+
+
+def exclude_plugin(names):
+    """
+    Returns a nose plugin that doesn't run the tests with the given
+    addresses (eg - the ones already run).
+    """
+    names = set(names)
+
+    def skip(result):
+        pass
+
+    def prepare_test_case(test):
+        if test_name(test) in names:
+            return skip
+    return hooks_plugin(name='sniffer-exclude',
+                        prepareTestCase=prepare_test_case)
@@ -0,0 +1,277 @@
+"""
+Runs tests in fresh processes forked from a warm template process.
+
+Restoring sys.modules between in-process runs means every run imports its
+dependencies again, and state kept by C extensions or module globals leaks
+from one run to the next. Instead, a template process is forked once; it
+imports the stable dependencies (the ones outside the watched paths) and
+forks a child for each run. The child starts with those modules loaded,
+runs the tests and reports back over a pipe. Children tell the template
+which dependencies they had to import, so the template loads them for the
+following runs.
+"""
+from __future__ import print_function
+import gc
+import importlib
+import io
+import os
+import pickle
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+__all__ = ['ForkServer', 'ForkServerError', 'run_forked']
+
+
+class ForkServerError(Exception):
+    pass
+
+
+def _flush():
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+
+
+def run_forked(calls):
+    """
+    Calls each function of calls, without arguments, in its own forked
+    process; they all run at once. Yields (passed, output, seconds) for each
+    call, in order, output being what its process wrote to stdout and stderr.
+    Only call it from a process without other threads: the children would
+    inherit the locks those hold.
+    """
+    children = []
+    for call in calls:
+        output = tempfile.TemporaryFile()
+        _flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.dup2(output.fileno(), 1)
+                os.dup2(output.fileno(), 2)
+                # sys.stdout may not write to fd 1 (eg - when captured)
+                sys.stdout = io.open(1, 'w', buffering=1, closefd=False)
+                sys.stderr = io.open(2, 'w', buffering=1, closefd=False)
+                code = 0 if call() else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                _flush()
+                os._exit(code)
+        children.append((pid, output, time.time()))
+    for pid, output, started_at in children:
+        _, status = os.waitpid(pid, 0)
+        elapsed = time.time() - started_at
+        with output:
+            output.seek(0)
+            text = output.read().decode('utf-8', 'replace')
+        yield (os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0,
+               text, elapsed)
+
+
+class ForkServer(object):
+    """
+    Calls ``target(request)`` in a new process for each run() call.
+
+    ``target``  Called in a forked child with the request, returns True on
+                success, or a (picklable) dictionary with ``passed`` and
+                more keys to add to the response.
+    ``paths``   Modules loaded from files under these directories are never
+                imported by the template, since they may change.
+    ``preload`` Names of the modules the template imports up front.
+    ``freeze``  Boolean. Moves the template's objects out of the garbage
+                collector's reach (gc.freeze), so children don't copy the
+                memory pages the collector would touch.
+    ``prepare`` Called in the template with each request, before forking.
+    """
+    available = hasattr(os, 'fork')
+
+    def __init__(self, target, paths=(), preload=(), freeze=True,
+                 prepare=None):
+        self.target = target
+        self.prepare = prepare
+        self.prefixes = tuple(os.path.join(os.path.abspath(p), '')
+                              for p in paths)
+        self.preload = tuple(preload)
+        self.freeze = freeze
+        self.pid = None
+        self.child_pid = None
+        self._requests = self._responses = None
+
+    def start(self):
+        """Forks the template process."""
+        if not self.available:
+            raise ForkServerError("os.fork() isn't available")
+        request_r, request_w = os.pipe()
+        response_r, response_w = os.pipe()
+        _flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(request_w)
+            os.close(response_r)
+            code = 0
+            try:
+                self._serve(os.fdopen(request_r, 'rb'),
+                            os.fdopen(response_w, 'wb'))
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                _flush()
+                os._exit(code)
+        os.close(request_r)
+        os.close(response_w)
+        self.pid = pid
+        self._requests = os.fdopen(request_w, 'wb')
+        self._responses = os.fdopen(response_r, 'rb')
+
+    def stop(self):
+        """Stops the template process."""
+        if self.pid is None:
+            return
+        for pipe in (self._requests, self._responses):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        try:
+            os.waitpid(self.pid, 0)
+        except OSError:
+            pass
+        self.pid = None
+
+    def run(self, request=None):
+        """
+        Runs the target in a fresh child with the given (picklable) request.
+        Returns a dictionary with ``passed`` (boolean), ``cpu`` (CPU seconds
+        the child used), the other keys the target returned and, if the child
+        died without reporting, ``error`` (and ``signal`` if it was killed by
+        one).
+        """
+        if self.pid is None:
+            self.start()
+        try:
+            pickle.dump(request, self._requests)
+            self._requests.flush()
+            while True:
+                response = pickle.load(self._responses)
+                if 'started' not in response:
+                    return response
+                self.child_pid = response['started']
+        except (EOFError, OSError, pickle.UnpicklingError):
+            self.stop()
+            raise ForkServerError("The template process died.")
+        finally:
+            self.child_pid = None
+
+    def cancel(self, sig=signal.SIGTERM):
+        """
+        Kills the child of the current run() call, if any. Can be called
+        from any thread. Returns True if a child was signaled.
+        """
+        pid = self.child_pid
+        if pid is None:
+            return False
+        try:
+            os.kill(pid, sig)
+        except OSError:
+            return False
+        return True
+
+    # template process
+
+    def _serve(self, requests, responses):
+        # Ctrl-C is for the parent and the running child
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self._import(self.preload)
+        while True:
+            try:
+                request = pickle.load(requests)
+            except EOFError:
+                return
+            if self.prepare is not None:
+                self.prepare(request)
+            response = self._fork_child(request, responses)
+            self._import(response.pop('modules', ()))
+            pickle.dump(response, responses)
+            responses.flush()
+
+    def _import(self, names):
+        """Imports the given modules, skipping the ones failing to."""
+        imported = False
+        for name in names:
+            if name in sys.modules:
+                continue
+            try:
+                importlib.import_module(name)
+                imported = True
+            except Exception:
+                pass
+        if imported and self.freeze and hasattr(gc, 'freeze'):
+            gc.freeze()
+
+    def _fork_child(self, request, responses):
+        result_r, result_w = os.pipe()
+        _flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(result_r)
+            responses.close()
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            self._child(request, os.fdopen(result_w, 'wb'))
+        os.close(result_w)
+        pickle.dump({'started': pid}, responses)
+        responses.flush()
+        with os.fdopen(result_r, 'rb') as results:
+            try:
+                response = pickle.load(results)
+            except (EOFError, pickle.UnpicklingError):
+                response = None
+        _, status, usage = os.wait4(pid, 0)
+        if response is None:
+            response = {'passed': False,
+                        'error': "The test process exited with status %d." %
+                        status}
+            if os.WIFSIGNALED(status):
+                response['signal'] = os.WTERMSIG(status)
+        response['cpu'] = usage.ru_utime + usage.ru_stime
+        return response
+
+    def _child(self, request, results):
+        loaded = set(sys.modules)
+        try:
+            response = self.target(request)
+            if not isinstance(response, dict):
+                response = {'passed': response}
+            response['passed'] = bool(response.get('passed'))
+        except BaseException:
+            traceback.print_exc()
+            response = {'passed': False}
+        try:
+            response['modules'] = self._dependencies(loaded)
+            pickle.dump(response, results)
+            results.close()
+        finally:
+            _flush()
+            os._exit(0)
+
+    def _dependencies(self, loaded):
+        """
+        Returns the names of the modules imported since loaded, whose files
+        are outside the watched paths.
+        """
+        names = []
+        for name, module in list(sys.modules.items()):
+            if name in loaded or module is None:
+                continue
+            filename = getattr(module, '__file__', None)
+            if filename and \
+                    not os.path.abspath(filename).startswith(self.prefixes):
+                names.append(name)
+        return sorted(names)
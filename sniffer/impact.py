@@ -0,0 +1,185 @@
+"""
+Test impact analysis through a static import graph.
+
+Maps a batch of changed files to the test modules that (transitively) import
+them, so only those get run. Files are parsed with the ast module, without
+importing anything, and only the files of a batch are parsed again.
+"""
+import ast
+import os
+import re
+
+from .scanner.filters import PathFilter
+
+__all__ = ['ImportGraph', 'module_name']
+
+# nose's default testMatch
+TEST_MATCH = re.compile(r'(?:^|[\b_\./-])[Tt]est')
+
+
+def module_name(filepath):
+    """
+    Returns the dotted module name of a Python file, going up the package
+    directories (the ones with an __init__.py).
+    """
+    dirpath, filename = os.path.split(filepath)
+    parts = [os.path.splitext(filename)[0]]
+    if parts[0] == '__init__':
+        parts = []
+    while os.path.exists(os.path.join(dirpath, '__init__.py')):
+        dirpath, package = os.path.split(dirpath)
+        parts.insert(0, package)
+    return '.'.join(parts)
+
+
+def _with_parents(name):
+    """Yields name and its parent packages: a.b.c, a.b, a."""
+    while name:
+        yield name
+        name = name.rpartition('.')[0]
+
+
+def parse_imports(source, filepath, name):
+    """
+    Returns (imported module names, dynamic) for the given source. Importing
+    a.b.c counts as importing a.b and a too, since their __init__ modules
+    run. For ``from a import b``, both a and a.b are listed as b may be a
+    submodule. dynamic is True if the source calls __import__ or
+    importlib.import_module, whose targets can't be known statically.
+    """
+    tree = ast.parse(source, filepath)
+    is_package = os.path.basename(filepath) == '__init__.py'
+    package = name if is_package else name.rpartition('.')[0]
+    names, dynamic = set(), False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names.update(_with_parents(alias.name))
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ''
+            if node.level:
+                parent = package.split('.') if package else []
+                if node.level > 1:
+                    parent = parent[:-(node.level - 1)]
+                base = '.'.join(parent + ([base] if base else []))
+            names.update(_with_parents(base))
+            for alias in node.names:
+                if alias.name != '*':
+                    names.add(base + '.' + alias.name if base else alias.name)
+        elif isinstance(node, ast.Call):
+            func = node.func
+            if (isinstance(func, ast.Name) and func.id == '__import__') or \
+                    (isinstance(func, ast.Attribute) and
+                     func.attr == 'import_module'):
+                dynamic = True
+    return names, dynamic
+
+
+class ImportGraph(object):
+    """
+    Static import graph of the Python files under some directories.
+
+    The graph is built on first use, then kept up to date from the
+    ChangeSets handed to select().
+    """
+    def __init__(self, paths, path_filter=None):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.path_filter = (path_filter or PathFilter()).for_roots(self.paths)
+        self._names = {}      # filepath -> module name
+        self._imports = {}    # filepath -> imported module names
+        self._files = {}      # module name -> filepath
+        self._importers = {}  # module name -> filepaths importing it
+        self._dynamic = set()
+        self._unparsable = set()
+        self._built = False
+
+    def build(self):
+        """Parses every Python file under the paths."""
+        for path in self.paths:
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [d for d in dirs if self.path_filter.accepts_dir(
+                    os.path.join(root, d))]
+                for f in files:
+                    if f.endswith('.py'):
+                        self.update(os.path.join(root, f))
+        self._built = True
+
+    def update(self, filepath):
+        """(Re)parses a single file."""
+        self.remove(filepath)
+        name = module_name(filepath)
+        try:
+            with open(filepath, 'rb') as handle:
+                imports, dynamic = parse_imports(handle.read(), filepath,
+                                                 name)
+        except (OSError, IOError):
+            return
+        except (SyntaxError, ValueError):
+            self._unparsable.add(filepath)
+            imports, dynamic = set(), False
+        self._names[filepath] = name
+        self._files[name] = filepath
+        self._imports[filepath] = imports
+        for imported in imports:
+            self._importers.setdefault(imported, set()).add(filepath)
+        if dynamic:
+            self._dynamic.add(filepath)
+
+    def remove(self, filepath):
+        """Forgets a file."""
+        name = self._names.pop(filepath, None)
+        if name is not None and self._files.get(name) == filepath:
+            del self._files[name]
+        for imported in self._imports.pop(filepath, ()):
+            importers = self._importers.get(imported)
+            if importers is not None:
+                importers.discard(filepath)
+        self._dynamic.discard(filepath)
+        self._unparsable.discard(filepath)
+
+    def refresh(self, changes):
+        """Applies a ChangeSet to the graph."""
+        if not self._built:
+            self.build()
+            return
+        for filepath in changes.deleted:
+            self.remove(filepath)
+        for filepath in changes.created | changes.modified:
+            if filepath.endswith('.py'):
+                self.update(filepath)
+
+    def importers(self, filepaths):
+        """
+        Returns the files that import any of the given files, directly or
+        not, including the given files themselves.
+        """
+        affected = set(filepaths)
+        pending = [module_name(f) for f in filepaths]
+        while pending:
+            for importer in self._importers.get(pending.pop(), ()):
+                if importer not in affected:
+                    affected.add(importer)
+                    pending.append(self._names[importer])
+        return affected
+
+    def is_test(self, filepath):
+        return TEST_MATCH.search(self._names.get(filepath) or
+                                 module_name(filepath)) is not None
+
+    def select(self, changes):
+        """
+        Updates the graph with a ChangeSet and returns the sorted test files
+        affected by it, or None when that can't be decided statically (eg -
+        non Python files changed, or a changed file doesn't parse) and the
+        whole suite should run.
+        """
+        self.refresh(changes)
+        changed = changes.paths
+        if not changed:
+            return None
+        if any(not f.endswith('.py') for f in changed) or \
+                not self._unparsable.isdisjoint(changed):
+            return None
+        affected = self.importers(changed) | self._dynamic
+        return sorted(f for f in affected
+                      if f not in changes.deleted and self.is_test(f))
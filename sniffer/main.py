@@ -15,34 +15,69 @@ __all__ = ['run', 'main']
 
 
 def run(sniffer_instance=None, wait_time=0.5, clear=True, args=(),
-        debug=False):
+        debug=False, *, scanner_options=None, max_wait=5.0, impact=False,
+        coverage=False, fork=False, jobs=1, restart=False, grace=0.0,
+        failed_first=False, failed_only=False, profile=False):
     """
     Runs the auto tester loop. Internally, the runner instanciates the sniffer_cls and
     scanner class.
 
     ``sniffer_instance`` The class to run. Usually this is set to but a subclass of scanner.
                     Defaults to Sniffer. Sniffer class documentation for more information.
-    ``wait_time``   The time, in seconds, to wait between polls. This is dependent on
-                    the underlying scanner implementation. OS-specific libraries may choose
-                    to ignore this parameter. Defaults to 0.5 seconds.
+    ``wait_time``   The time, in seconds, file changes must settle before tests are rerun.
+                    The polling scanner also uses it as the interval between polls.
+                    Defaults to 0.5 seconds.
     ``clear``       Boolean. Set to True to clear the terminal before running the sniffer,
                     (alias, the unit tests). Defaults to True.
     ``args``        The arguments to pass to the sniffer/test runner. Defaults to ().
     ``debug``       Boolean. Sets the scanner and sniffer in debug mode, printing more internal
                     information. Defaults to False (and should usually be False).
+    ``scanner_options`` Dictionary of keyword options for the scanner, overriding the ones
+                    of the sniffer instance (eg - from scent.py). Defaults to None.
+    ``max_wait``    The maximum time, in seconds, a batch of file changes is held back
+                    while changes keep coming in. Defaults to 5 seconds.
+    ``impact``      Boolean. Only run the test modules importing the changed files
+                    (found by parsing imports). Defaults to False.
+    ``coverage``    Boolean. Record the lines each test runs and only run the tests
+                    covering changed lines. Defaults to False.
+    ``fork``        Boolean. Run the tests in a fresh process per run, forked from a
+                    template process keeping the dependencies imported. Defaults to
+                    False.
+    ``jobs``        Number of processes to run nose tests in parallel. Defaults to 1.
+    ``restart``     Boolean. Cancel a (forked) run when files change during it, and
+                    start over with all the changes. Defaults to False.
+    ``grace``       Seconds a run may go on after files changed, before it is
+                    cancelled. Defaults to 0.
+    ``failed_first`` Boolean. Run the tests that failed last time before the
+                    others, broadcasting their failure right away. Defaults to
+                    False.
+    ``failed_only`` Boolean. Like failed_first, but don't run the others while
+                    those still fail. Defaults to False.
+    ``profile``     Boolean. Time each phase of the runs and count files and events,
+                    into .sniffer/profile.jsonl and .sniffer/metrics.prom.
+                    Defaults to False.
     """
     if sniffer_instance is None:
         sniffer_instance = ScentSniffer()
+    options = dict(sniffer_instance.scanner_options)
+    options.setdefault('path_filter', sniffer_instance.path_filter)
+    options.update(scanner_options or {})
 
     if debug:
         scanner = Scanner(
             sniffer_instance.watch_paths,
-            scent=sniffer_instance.scent, logger=sys.stdout)
+            scent=sniffer_instance.scent, logger=sys.stdout, **options)
     else:
         scanner = Scanner(
-            sniffer_instance.watch_paths, scent=sniffer_instance.scent)
+            sniffer_instance.watch_paths, scent=sniffer_instance.scent,
+            **options)
     #sniffer = sniffer_cls(tuple(args), clear, debug)
-    sniffer_instance.set_up(tuple(args), clear, debug)
+    sniffer_instance.set_up(tuple(args), clear, debug, wait_time=wait_time,
+                            max_wait=max_wait, impact=impact,
+                            coverage=coverage, fork=fork, jobs=jobs,
+                            restart=restart, grace=grace,
+                            failed_first=failed_first,
+                            failed_only=failed_only, profile=profile)
 
     sniffer_instance.observe_scanner(scanner)
     scanner.loop(wait_time)
@@ -63,8 +98,13 @@ def main(sniffer_instance=None, test_args=(), progname=sys.argv[0],
     parser = OptionParser(version="%prog " + __version__)
     parser.add_option('-w', '--wait', dest="wait_time", metavar="TIME",
                       default=0.5, type="float",
-                      help="Wait time, in seconds, before possibly rerunning"
-                      "tests. (default: %default)")
+                      help="Wait time, in seconds, for file changes to settle "
+                      "before rerunning tests. Also the polling interval. "
+                      "(default: %default)")
+    parser.add_option('--max-wait', dest="max_wait", metavar="TIME",
+                      default=5.0, type="float",
+                      help="Maximum time, in seconds, to hold back a rerun "
+                      "while files keep changing. (default: %default)")
     parser.add_option('--no-clear', dest="clear_on_run", default=True,
                       action="store_false",
                       help="Disable the clearing of screen")
@@ -75,8 +115,72 @@ def main(sniffer_instance=None, test_args=(), progname=sys.argv[0],
                       action="append",
                       help="Arguments to pass to nose (use multiple times to "
                       "pass multiple arguments.)")
+    parser.add_option('-j', '--jobs', dest="jobs", metavar="N", default=1,
+                      type="int",
+                      help="Run nose tests in N parallel processes, balanced "
+                      "by how long each test module took before. "
+                      "(default: %default)")
+    parser.add_option('--snapshot', dest="snapshot", metavar="FILE",
+                      default=None,
+                      help="Keep the polling scanner's watch list in FILE, so "
+                      "it starts warm and sees changes made while sniffer "
+                      "wasn't running.")
+    parser.add_option('--verify-content', dest="verify_content",
+                      default=False, action="store_true",
+                      help="Hash modified files and ignore the ones whose "
+                      "content didn't change (eg - touched or restamped).")
+    parser.add_option('--impact', dest="impact", default=False,
+                      action="store_true",
+                      help="Only rerun the test modules that import the "
+                      "changed files, directly or not. Runs everything when "
+                      "that can't be told from the imports.")
+    parser.add_option('--coverage', dest="coverage", default=False,
+                      action="store_true",
+                      help="Record the lines each test runs (in "
+                      ".sniffer/coverage.db) and only rerun the tests "
+                      "covering changed lines. Needs sniffer to run nose, "
+                      "not a scent's runnables.")
+    parser.add_option('--fork', dest="fork", default=False,
+                      action="store_true",
+                      help="Run each test run in a new process, forked from a "
+                      "process that keeps the dependencies imported.")
+    parser.add_option('--restart', dest="restart", default=False,
+                      action="store_true",
+                      help="Cancel a test run when files change during it and "
+                      "start over with all the changes. Runs tests in forked "
+                      "processes, like --fork.")
+    parser.add_option('--grace', dest="grace", metavar="TIME", default=0.0,
+                      type="float",
+                      help="With --restart, let a run go on for TIME seconds "
+                      "after files changed before cancelling it. "
+                      "(default: %default)")
+    parser.add_option('--failed-first', dest="failed_first", default=False,
+                      action="store_true",
+                      help="Run the tests that failed last time first, and "
+                      "signal their failure before running the others.")
+    parser.add_option('--failed-only', dest="failed_only", default=False,
+                      action="store_true",
+                      help="Like --failed-first, but skip the other tests "
+                      "while the ones that failed last time still fail.")
+    parser.add_option('--profile', dest="profile", default=False,
+                      action="store_true",
+                      help="Time each phase of the runs (scanning, "
+                      "validators, module restore, tests, notifications) and "
+                      "count files and events, into .sniffer/profile.jsonl "
+                      "and .sniffer/metrics.prom.")
     (options, args) = parser.parse_args(args)
+    if options.jobs > 1 and options.coverage:
+        parser.error("--jobs can't be combined with --coverage, which "
+                     "records coverage in the sniffer process.")
+    if options.jobs > 1 and (options.failed_first or options.failed_only):
+        parser.error("--jobs can't be combined with --failed-first or "
+                     "--failed-only.")
     test_args = test_args + tuple(options.test_args)
+    scanner_options = {}
+    if options.snapshot:
+        scanner_options['snapshot'] = options.snapshot
+    if options.verify_content:
+        scanner_options['verify_content'] = True
 
     if options.debug:
         print("Options:", options)
@@ -84,7 +188,12 @@ def main(sniffer_instance=None, test_args=(), progname=sys.argv[0],
     try:
         print("Starting watch...")
         run(sniffer_instance, options.wait_time, options.clear_on_run,
-            test_args, options.debug)
+            test_args, options.debug, scanner_options=scanner_options,
+            max_wait=options.max_wait, impact=options.impact,
+            coverage=options.coverage, fork=options.fork, jobs=options.jobs,
+            restart=options.restart, grace=options.grace,
+            failed_first=options.failed_first,
+            failed_only=options.failed_only, profile=options.profile)
     except KeyboardInterrupt:
         print("Good bye.")
     except Exception:
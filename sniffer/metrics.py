@@ -0,0 +1,143 @@
+"""
+Times the phases of a cycle (scanning, validating, restoring modules,
+running, broadcasting...) and counts files and events, for ``--profile``.
+
+Each test run appends a JSON line with what was measured since the previous
+one, and rewrites a file in Prometheus' text format with the totals. When
+profiling is off, NULL_METRICS stands in and does nothing.
+"""
+import json
+import os
+import threading
+import time
+
+__all__ = ['Metrics', 'NULL_METRICS']
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class NullMetrics(object):
+    """Metrics that aren't recorded."""
+    enabled = False
+    _span = _NullSpan()
+
+    def span(self, phase):
+        return self._span
+
+    def add_time(self, phase, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def flush(self, **fields):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class _Span(object):
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.phase, time.perf_counter() -
+                              self.started_at)
+
+
+class Metrics(object):
+    """
+    Accumulates phase timings and counters. Can be used from any thread.
+
+    ``jsonl``      Filename each flush() appends a JSON line to.
+    ``prometheus`` Filename each flush() rewrites with the totals, in
+                   Prometheus' text exposition format.
+    """
+    enabled = True
+
+    def __init__(self, jsonl=None, prometheus=None):
+        self.jsonl = jsonl
+        self.prometheus = prometheus
+        self._lock = threading.Lock()
+        # phase: [seconds, count], since the last flush and overall
+        self._times, self._total_times = {}, {}
+        self._counts, self._total_counts = {}, {}
+
+    def span(self, phase):
+        """Returns a context manager timing a phase."""
+        return _Span(self, phase)
+
+    def add_time(self, phase, seconds):
+        with self._lock:
+            for times in (self._times, self._total_times):
+                entry = times.setdefault(phase, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            for counts in (self._counts, self._total_counts):
+                counts[name] = counts.get(name, 0) + n
+
+    @property
+    def totals(self):
+        """Returns ({phase: (seconds, count)}, {counter: value}) overall."""
+        with self._lock:
+            return (dict((k, tuple(v)) for k, v in self._total_times.items()),
+                    dict(self._total_counts))
+
+    def flush(self, **fields):
+        """
+        Writes what was measured since the last flush, with the given extra
+        fields, and the totals.
+        """
+        with self._lock:
+            record = dict(fields, time=time.time(),
+                          phases=dict((k, {'seconds': v[0], 'count': v[1]})
+                                      for k, v in self._times.items()),
+                          counters=self._counts)
+            self._times, self._counts = {}, {}
+        if self.jsonl:
+            _makedirs(self.jsonl)
+            with open(self.jsonl, 'a') as handle:
+                handle.write(json.dumps(record, sort_keys=True) + '\n')
+        if self.prometheus:
+            _makedirs(self.prometheus)
+            tmp = self.prometheus + '.tmp'
+            with open(tmp, 'w') as handle:
+                handle.write(self.exposition())
+            os.replace(tmp, self.prometheus)
+
+    def exposition(self):
+        """Returns the totals in Prometheus' text format."""
+        times, counts = self.totals
+        lines = ['# HELP sniffer_phase_seconds Time spent in each phase.',
+                 '# TYPE sniffer_phase_seconds summary']
+        for phase in sorted(times):
+            seconds, count = times[phase]
+            lines.append('sniffer_phase_seconds_sum{phase="%s"} %r' %
+                         (phase, seconds))
+            lines.append('sniffer_phase_seconds_count{phase="%s"} %d' %
+                         (phase, count))
+        for name in sorted(counts):
+            lines.append('# TYPE sniffer_%s_total counter' % name)
+            lines.append('sniffer_%s_total %d' % (name, counts[name]))
+        return '\n'.join(lines) + '\n'
+
+
+def _makedirs(filename):
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
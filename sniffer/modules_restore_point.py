@@ -1,5 +1,8 @@
+import os
 import sys
 
+from .impact import parse_imports
+
 __all__ = ['ModulesRestorePoint']
 
 
@@ -8,6 +11,7 @@ class ModulesRestorePoint(object):
     def __init__(self, sys_modules=sys.modules):
         self._saved_modules = None
         self._sys_modules = sys_modules
+        self._imports = {}  # filepath -> (mtime_ns, imported names)
         self.save()
 
     def save(self):
@@ -16,10 +20,98 @@ class ModulesRestorePoint(object):
         """
         self._saved_modules = set(self._sys_modules.keys())
 
-    def restore(self):
+    def restore(self, changed_paths=None):
         """
         Unloads all modules that weren't loaded when save_modules was called.
+
+        When the paths of the changed files are given, only the modules
+        loaded from them and the modules importing those (directly or not)
+        are unloaded. Everything is unloaded if a changed file isn't a Python
+        source file, since it can't be told which modules read it.
+
+        Unloaded submodules are also removed from their parent packages, so
+        ``from pkg import mod`` imports mod again.
         """
-        sys = set(self._sys_modules.keys())
-        for mod_name in sys.difference(self._saved_modules):
+        if changed_paths is not None and \
+                all(p.endswith('.py') for p in changed_paths):
+            names = self._dependents(changed_paths)
+        else:
+            names = set(self._sys_modules.keys()) - self._saved_modules
+        for mod_name in names:
+            self._detach(mod_name)
+        for mod_name in names:
             del self._sys_modules[mod_name]
+        return names
+
+    def _detach(self, name):
+        """
+        Deletes the attribute binding the module called name in its parent
+        package, if the parent is loaded.
+        """
+        parent_name, _, attr = name.rpartition('.')
+        parent = self._sys_modules.get(parent_name) if parent_name else None
+        if parent is not None and \
+                getattr(parent, attr, None) is self._sys_modules[name]:
+            delattr(parent, attr)
+
+    def _loaded(self):
+        """
+        Returns {module name: source file} for the modules loaded since the
+        restore point.
+        """
+        loaded = {}
+        for name in set(self._sys_modules.keys()) - self._saved_modules:
+            filename = getattr(self._sys_modules[name], '__file__', None)
+            loaded[name] = filename and os.path.abspath(filename)
+        return loaded
+
+    def _imports_of(self, name, filepath):
+        """Returns the module names a module's source file imports."""
+        try:
+            mtime = os.stat(filepath).st_mtime_ns
+        except OSError:
+            return ()
+        cached = self._imports.get(filepath)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(filepath, 'rb') as handle:
+                imports = parse_imports(handle.read(), filepath, name)[0]
+        except (OSError, IOError, SyntaxError, ValueError):
+            imports = ()
+        self._imports[filepath] = (mtime, imports)
+        return imports
+
+    def _dependents(self, changed_paths):
+        """
+        Returns the names of the modules loaded from changed_paths and of
+        their transitive importers, among the modules loaded since the
+        restore point. The submodules of an unloaded package are unloaded
+        too: ``import pkg.mod`` would find them loaded and never bind them
+        to the new package. Only import statements are followed; modules
+        loaded through importlib keep their references.
+        """
+        changed = set(os.path.abspath(p) for p in changed_paths)
+        loaded = self._loaded()
+        importers = {}
+        for name, filepath in loaded.items():
+            parent_name = name.rpartition('.')[0]
+            while parent_name:
+                importers.setdefault(parent_name, set()).add(name)
+                parent_name = parent_name.rpartition('.')[0]
+            if not filepath or not filepath.endswith('.py'):
+                continue
+            for imported in self._imports_of(name, filepath):
+                if imported in loaded:
+                    importers.setdefault(imported, set()).add(name)
+        pending = [name for name, filepath in loaded.items()
+                   if filepath in changed]
+        names = set(pending)
+        while pending:
+            for importer in importers.get(pending.pop(), ()):
+                if importer not in names:
+                    names.add(importer)
+                    pending.append(importer)
+        for filepath in changed:
+            self._imports.pop(filepath, None)
+        return names
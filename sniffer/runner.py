@@ -1,13 +1,25 @@
 from __future__ import print_function
 from __future__ import absolute_import
 from .modules_restore_point import ModulesRestorePoint
+from .batcher import EventBatcher
+from .scheduler import RunScheduler
 from .broadcasters import broadcaster
 from functools import wraps
 from termstyle import bg_red, bg_green, white
 import platform
 import os
 import sys
+import threading
+import time
 from . import scent_picker
+from .scanner.filters import PathFilter
+from .impact import ImportGraph
+from .coverage_db import CoverageDatabase, nose_plugin
+from .forkserver import ForkServer, ForkServerError
+from .sharding import DurationHistory, ShardedRun, test_module
+from .failures import (FailureHistory, exclude_plugin, nose_options,
+                       recorder_plugin)
+from .metrics import NULL_METRICS, Metrics
 
 __all__ = ['Sniffer']
 
@@ -29,30 +41,81 @@ class Sniffer(object):
     Handles the execution of the sniffer. The interface that main.run expects
     is:
 
-    ``set_up(test_args, clear, debug)``
+    ``set_up(test_args, clear, debug, **options)``, the options (wait_time,
+    max_wait, impact, coverage, fork, jobs, restart, grace, failed_first,
+    failed_only, profile) being keyword arguments:
 
       ``test_args`` The arguments to pass to the test runner.
       ``clear``     Boolean. Set to True if we should clear console before
                     running the tests.
       ``debug``     Boolean. Set to True if we want to print debugging
                     information.
+      ``wait_time`` Seconds without any file event before a batch of
+                    changes is run.
+      ``max_wait``  Maximum seconds a batch of changes is held back.
+      ``impact``    Boolean. Set to True to only run the tests affected by
+                    a batch of changes.
+      ``coverage``  Boolean. Set to True to record per test coverage and only
+                    run the tests covering changed lines.
+      ``fork``      Boolean. Set to True to run the tests in processes forked
+                    from a warm template process.
+      ``jobs``      Number of nose processes to spread the tests over.
+      ``restart``   Boolean. Set to True to cancel a forked run when files
+                    change, and run again with all the changes.
+      ``grace``     Seconds a run may go on after files changed before it
+                    is cancelled.
+      ``failed_first`` Boolean. Set to True to run the tests that failed
+                    last time before the others.
+      ``failed_only`` Boolean. Set to True to skip the other tests while the
+                    ones that failed last time still fail.
+      ``profile``   Boolean. Set to True to time the phases of each run.
 
     ``observe_scanner(scanner)``
 
       ``scanner``   The scanner instance to hook events into. By default,
-                    ``self._run`` is attached, which then calls self.run(). The
-                    run method should return True on passing and False on
-                    failure.
+                    events are batched and each batch is scheduled on the
+                    scheduler, which calls ``self._run_batch`` with every
+                    batch received since the previous run. That then calls
+                    self.run(). The run method should return True on passing
+                    and False on failure.
     """
+    # where state kept between runs (eg - coverage) goes
+    state_dir = '.sniffer'
+    # modules a fork server's template process imports up front
+    preload_modules = ('nose',)
+
     def __init__(self):
         self.modules = ModulesRestorePoint()
         self._scanners = []
         self.pass_colors = {'fg': white, 'bg': bg_green}
         self.fail_colors = {'fg': white, 'bg': bg_red}
         self.watch_paths = ('.',)
+        self.scanner_options = {}
+        self.path_filter = PathFilter()
+        self._batcher = None
+        self._scheduler = None
+        self._import_graph = None
+        self._coverage_db = None
+        self.selected_tests = None
+        self.forkserver = None
+        self._durations = None
+        self._batch = None
+        self._cancel_lock = threading.Lock()
+        self._cancel_timer = None
+        self._forked_run = self._cancelling = self._cancelled = False
+        self._run_cpu = []
+        self.cancellations = 0
+        self.cpu_seconds_saved = 0.0
+        self._changed_at = None
+        self._failure_signaled = False
+        self.failure_latencies = []
+        self.metrics = NULL_METRICS
         self.set_up()
 
-    def set_up(self, test_args=(), clear=True, debug=False):
+    def set_up(self, test_args=(), clear=True, debug=False, *,
+               wait_time=0.5, max_wait=5.0, impact=False, coverage=False,
+               fork=False, jobs=1, restart=False, grace=0.0,
+               failed_first=False, failed_only=False, profile=False):
         """
         Sets properties right before calling run.
 
@@ -61,9 +124,176 @@ class Sniffer(object):
                         running the tests.
           ``debug``     Boolean. Set to True if we want to print debugging
                         information.
+          ``wait_time`` Seconds without any file event before a batch of
+                        changes is run. Defaults to 0.5.
+          ``max_wait``  Maximum seconds a batch of changes is held back while
+                        events keep arriving. Defaults to 5.0.
+          ``impact``    Boolean. Set to True to only run the test modules that
+                        import the changed files. Defaults to False.
+          ``coverage``  Boolean. Set to True to record which tests run which
+                        lines, and only run the tests covering changed lines.
+                        Defaults to False.
+          ``fork``      Boolean. Set to True to run the tests in a fresh
+                        process per run, forked from a template process that
+                        keeps the dependencies imported. Falls back to
+                        running in-process where os.fork isn't available.
+                        Defaults to False.
+          ``jobs``      Number of worker processes nose tests are spread over,
+                        balanced by the time each test module took before.
+                        Defaults to 1 (no worker processes).
+          ``restart``   Boolean. Set to True to run the tests in a forked
+                        process (see fork), cancelled when files change
+                        while it runs. The tests then run again for all the
+                        changes. Defaults to False.
+          ``grace``     Seconds a run may go on after files changed, before
+                        being cancelled. Defaults to 0.
+          ``failed_first`` Boolean. Set to True to run the tests that failed
+                        last time (kept in .sniffer/failures.json) first.
+                        Their failure is broadcast right away, before the
+                        other tests run. Defaults to False.
+          ``failed_only`` Boolean. Like failed_first, but the other tests
+                        only run once the ones that failed pass. Defaults to
+                        False.
+          ``profile``   Boolean. Set to True to time each phase (scanning,
+                        validating, restoring modules, running,
+                        broadcasting...) and count files and events. Each
+                        run appends a line to .sniffer/profile.jsonl and
+                        rewrites the totals in .sniffer/metrics.prom
+                        (Prometheus' text format). Defaults to False.
         """
         self.test_args = test_args
         self.debug, self.clear = debug, clear
+        self.wait_time, self.max_wait = wait_time, max_wait
+        self.impact, self.coverage = impact, coverage
+        self.jobs = jobs
+        self.restart, self.grace = restart, grace
+        self.failed_first = failed_first or failed_only
+        self.failed_only = failed_only
+        if jobs > 1 and coverage:
+            print("Running tests in this process: coverage can't be "
+                  "recorded over %d jobs." % jobs)
+        elif jobs > 1 and self.failed_first:
+            print("Running every test over %d jobs: failing tests can't "
+                  "run first." % jobs)
+        self.metrics = NULL_METRICS
+        if profile:
+            self.metrics = Metrics(jsonl=self.state_path('profile.jsonl'),
+                                   prometheus=self.state_path('metrics.prom'))
+        for scanner in self._scanners:
+            scanner.set_metrics(self.metrics)
+        if self.forkserver is not None:
+            self.forkserver.stop()
+            self.forkserver = None
+        if fork or restart or self.forks_runs:
+            self.start_forkserver()
+
+    @property
+    def forks_runs(self):
+        """
+        True if runs have to happen in forked processes even without the
+        fork option (eg - because they fork in turn).
+        """
+        return False
+
+    def start_forkserver(self):
+        """
+        Forks the template process runs are forked from. This is best done
+        before any thread is started.
+        """
+        if not ForkServer.available:
+            print("Forking isn't available here, running tests in-process.")
+            return
+        self.forkserver = ForkServer(self._run_forked, self.watch_paths,
+                                     preload=self.preload_modules,
+                                     prepare=self._prepare_fork)
+        self.forkserver.start()
+
+    def fork_request(self):
+        """
+        Returns the state a forked run needs from this process, handed to
+        _prepare_fork in the template process.
+        """
+        return {'selected_tests': self.selected_tests,
+                'changed_at': self._changed_at, 'changes': self._batch}
+
+    def _prepare_fork(self, request):
+        """Applies a fork_request() in the template process."""
+        self.selected_tests = request['selected_tests']
+        self._changed_at = request['changed_at']
+        self._batch = request['changes']
+
+    def _run_forked(self, request):
+        """Runs in the forked child."""
+        self._failure_signaled = False
+        passed = self.run()
+        return {'passed': passed, 'failure_signaled': self._failure_signaled,
+                'failure_latencies': self.failure_latencies[-1:]
+                if self._failure_signaled else []}
+
+    def _execute(self):
+        """
+        Calls self.run(), in a forked process if there is a fork server.
+        Returns None if the run got cancelled.
+        """
+        if self.forkserver is None:
+            return self.run()
+        with self._cancel_lock:
+            self._forked_run, self._cancelling = True, False
+        try:
+            response = self.forkserver.run(self.fork_request())
+        except ForkServerError as e:
+            print(e, "Running tests in-process from now on.")
+            self.forkserver = None
+            return self.run()
+        finally:
+            with self._cancel_lock:
+                self._forked_run = False
+                if self._cancel_timer is not None:
+                    self._cancel_timer.cancel()
+                    self._cancel_timer = None
+        if self._cancelling and 'signal' in response:
+            self._report_cancel(response['cpu'])
+            return None
+        if 'error' in response:
+            print(response['error'])
+        self._failure_signaled = response.get('failure_signaled', False)
+        self.failure_latencies.extend(response.get('failure_latencies', ()))
+        self._run_cpu = self._run_cpu[-9:] + [response['cpu']]
+        return response['passed']
+
+    def _interrupt(self, name):
+        """
+        Called by the scheduler when files change during a run. Schedules
+        the cancellation of a forked run, after the grace period.
+        """
+        if name != 'tests':
+            return
+        with self._cancel_lock:
+            if not self.restart or not self._forked_run or \
+                    self._cancel_timer is not None:
+                return
+            self._cancel_timer = threading.Timer(self.grace, self._cancel)
+            self._cancel_timer.daemon = True
+            self._cancel_timer.start()
+
+    def _cancel(self):
+        with self._cancel_lock:
+            if self._forked_run and self.forkserver is not None:
+                self._cancelling = self.forkserver.cancel()
+
+    def _report_cancel(self, cpu):
+        """
+        Counts a cancelled run. The CPU time saved is estimated from the
+        runs that completed.
+        """
+        self.cancellations += 1
+        print("Files changed, cancelled the run after %.2f CPU seconds." % cpu)
+        if self._run_cpu:
+            saved = max(0.0, sum(self._run_cpu) / len(self._run_cpu) - cpu)
+            self.cpu_seconds_saved += saved
+            print("~%.2f CPU seconds saved (%d cancellation(s), ~%.2f CPU "
+                  "seconds saved so far)." % (saved, self.cancellations,
+                                              self.cpu_seconds_saved))
 
     def absorb_args(self, func):
         """
@@ -75,16 +305,201 @@ class Sniffer(object):
             return func()
         return wrapper
 
+    @property
+    def batcher(self):
+        """
+        The EventBatcher that coalesces scanner events into runs.
+        """
+        if self._batcher is None:
+            self._batcher = EventBatcher(self.schedule, self.wait_time,
+                                         self.max_wait)
+        return self._batcher
+
+    @property
+    def scheduler(self):
+        """
+        The RunScheduler running the jobs scheduled for batches of changes.
+        """
+        if self._scheduler is None:
+            self._scheduler = RunScheduler(interrupt=self._interrupt)
+        return self._scheduler
+
+    def schedule(self, changes):
+        """
+        Schedules the jobs for a batch of changes: a test run. Returns
+        immediately.
+        """
+        self.scheduler.submit('tests', self._run_batch, changes)
+
+    @property
+    def import_graph(self):
+        """
+        The ImportGraph of the watched paths, used to select tests.
+        """
+        if self._import_graph is None:
+            self._import_graph = ImportGraph(self.watch_paths,
+                                             self.path_filter)
+        return self._import_graph
+
+    def state_path(self, filename):
+        """Returns the path of a file in the state directory."""
+        return os.path.join(self.state_dir, filename)
+
+    @property
+    def coverage_db(self):
+        """
+        The CoverageDatabase recording which tests run which lines.
+        """
+        if self._coverage_db is None:
+            self._coverage_db = CoverageDatabase(
+                self.state_path('coverage.db'))
+        return self._coverage_db
+
+    @property
+    def records_coverage(self):
+        """
+        True if coverage is recorded during runs, which requires sniffer to
+        run nose itself.
+        """
+        return self.coverage
+
+    @property
+    def selects_by_imports(self):
+        """
+        True if the tests to run are selected with the import graph, which
+        requires sniffer to hand them to the test runner.
+        """
+        return self.impact
+
+    def prune_failures(self, paths):
+        """
+        Forgets the failures recorded for the given (deleted) test modules.
+        """
+        filename = self.state_path('failures.json')
+        if not os.path.exists(filename):
+            return
+        history = FailureHistory(filename)
+        failures = dict(history.failures)
+        history.prune(paths)
+        if history.failures != failures:
+            history.save()
+
+    def select_tests(self, changes):
+        """
+        Returns the tests to run for a batch of changes, or None to run the
+        whole suite. Coverage data is used first, then the import graph.
+        """
+        if not changes:
+            return None
+        selected = None
+        if self.records_coverage:
+            selected = self.coverage_db.select(changes)
+        if selected is None and self.selects_by_imports:
+            selected = self.import_graph.select(changes)
+        return selected
+
+    @property
+    def duration_history(self):
+        """
+        The DurationHistory of the test modules, balancing parallel runs.
+        """
+        if self._durations is None:
+            self._durations = DurationHistory(
+                self.state_path('durations.json'))
+        return self._durations
+
+    def signal_failure(self):
+        """
+        Broadcasts a failure as soon as one is known, and records how long
+        after the change that triggered the run it came.
+        """
+        if self._failure_signaled:
+            return
+        self._failure_signaled = True
+        with self.metrics.span('broadcast'):
+            broadcaster.failure(self)
+        if self._changed_at is not None:
+            latency = max(0.0, time.time() - self._changed_at)
+            self.failure_latencies = self.failure_latencies[-99:] + [latency]
+            print("First failure signaled %.2fs after the change." % latency)
+
+    def run_failed_first(self):
+        """
+        Runs the nose tests that failed last time, then the other (selected)
+        tests. A failure of the former is broadcast before the others run,
+        which they don't with failed_only. Returns True if all tests passed.
+        """
+        import nose
+        history = FailureHistory(self.state_path('failures.json'))
+        previous = [name for name in history.get('nose')
+                    if os.path.exists(test_module(name))]
+        failures = []
+        passed = True
+        if previous:
+            print("Rerunning %d test(s) that failed last time:" %
+                  len(previous))
+            passed = nose.run(
+                argv=[sys.argv[0]] + nose_options(self.test_args) + previous,
+                addplugins=self.nose_plugins(full=False) +
+                [recorder_plugin(failures.append)])
+            if not passed:
+                self.signal_failure()
+                if self.failed_only:
+                    history.set('nose', failures)
+                    history.save()
+                    print("Skipped the other tests (the ones that failed "
+                          "still fail).")
+                    return False
+            print("Running the other tests:")
+        passed = nose.run(argv=self.test_arguments(),
+                          addplugins=self.nose_plugins() +
+                          [recorder_plugin(failures.append),
+                           exclude_plugin(previous)]) and passed
+        history.set('nose', failures)
+        history.save()
+        return passed
+
+    def run_sharded(self):
+        """
+        Runs the (selected) nose tests over self.jobs worker processes.
+        Returns True if they all passed.
+        """
+        argv = [sys.argv[0]] + list(self.test_args)
+        return ShardedRun(self.jobs, self.duration_history).run(
+            argv, self.selected_tests)
+
+    def nose_plugins(self, full=True):
+        """
+        Returns the extra plugins to run nose with. full=False when the run
+        isn't of every selected test.
+        """
+        plugins = []
+        if self.records_coverage:
+            plugins.append(nose_plugin(
+                self.coverage_db, self.watch_paths,
+                full=full and self.selected_tests is None))
+        return plugins
+
+    def test_arguments(self):
+        """
+        Returns the argument list for the test runner: the program name and
+        the test args or, when tests were selected, the options among the
+        test args followed by the selected test files (the tests or
+        directories the test args name would run everything again).
+        """
+        if self.selected_tests is None:
+            return [sys.argv[0]] + list(self.test_args)
+        return ([sys.argv[0]] + nose_options(self.test_args) +
+                list(self.selected_tests))
+
     def observe_scanner(self, scanner):
         """
         Hooks into multiple events of a scanner.
         """
-        scanner.observe(scanner.ALL_EVENTS,
-                        self.absorb_args(self.modules.restore))
-        if self.clear:
-            scanner.observe(scanner.ALL_EVENTS,
-                            self.absorb_args(self.clear_on_run))
-        scanner.observe(scanner.ALL_EVENTS, self.absorb_args(self._run))
+        scanner.set_metrics(self.metrics)
+        self.batcher.observe(scanner)
+        self.batcher.start()
+        self.scheduler.start()
         if self.debug:
             scanner.observe('created',  echo("callback - created  %(file)s"))
             scanner.observe('modified', echo("callback - changed  %(file)s"))
@@ -102,16 +517,78 @@ class Sniffer(object):
 
     def _stop(self):
         """Calls stop() to all scanner in an attempt to quit."""
+        if self._batcher is not None:
+            self._batcher.stop()
+        if self._scheduler is not None:
+            self._scheduler.stop(timeout=0)
+        with self._cancel_lock:
+            if self._cancel_timer is not None:
+                self._cancel_timer.cancel()
+        if self.forkserver is not None:
+            self.forkserver.stop()
         for scanner in self._scanners:
             scanner.stop()
 
+    def _run_batch(self, changes):
+        """
+        Runs once for a batch of changes (a ChangeSet, empty for the initial
+        run).
+        """
+        if self.debug:
+            print("Batch:", changes)
+        with self.metrics.span('restore'):
+            unloaded = self.modules.restore(changes.paths if changes else None)
+        if self.debug:
+            print("Unloaded modules:", len(unloaded))
+        if self._durations is not None and changes.deleted:
+            self._durations.prune(changes.deleted)
+        if changes.deleted:
+            self.prune_failures(changes.deleted)
+        with self.metrics.span('select'):
+            selected = self.select_tests(changes)
+        if self._cancelled:
+            # the cancelled run's selection was consumed by select_tests
+            self._cancelled = False
+            if self.selected_tests is None or selected is None:
+                selected = None
+            else:
+                selected = sorted(set(self.selected_tests) | set(selected))
+        self._batch, self.selected_tests = changes, selected
+        self._changed_at = max(changes.timestamps.values()) \
+            if changes.timestamps else time.time()
+        if self.clear:
+            with self.metrics.span('clear'):
+                self.clear_on_run()
+        try:
+            if self.selected_tests is not None:
+                if not self.selected_tests:
+                    print("No tests affected by the changes.")
+                    return True
+                print("Affected tests:", len(self.selected_tests))
+                if self.debug:
+                    for filepath in self.selected_tests:
+                        print("  " + filepath)
+            return self._run()
+        finally:
+            self.metrics.flush(changes=len(changes.paths),
+                               selected_tests=None if selected is None
+                               else len(selected))
+
     def _run(self):
         """Calls self.run() and wraps for errors."""
         try:
-            if self.run():
-                broadcaster.success(self)
+            self._failure_signaled = False
+            with self.metrics.span('run'):
+                passed = self._execute()
+            if passed is None:
+                self._cancelled = True
+                self.scheduler.submit('tests', self._run_batch, self._batch,
+                                      older=True)
+            elif passed:
+                with self.metrics.span('broadcast'):
+                    broadcaster.success(self)
             else:
-                broadcaster.failure(self)
+                self.signal_failure()
         except StandardError:
             import traceback
             traceback.print_exc()
@@ -129,8 +606,12 @@ class Sniffer(object):
         """
         try:
             import nose
-            arguments = [sys.argv[0]] + list(self.test_args)
-            return nose.run(argv=arguments)
+            if self.jobs > 1 and not self.records_coverage:
+                return self.run_sharded()
+            if self.failed_first:
+                return self.run_failed_first()
+            return nose.run(argv=self.test_arguments(),
+                            addplugins=self.nose_plugins())
         except ImportError:
             print()
             print("*** Nose library missing. Please install it. ***")
@@ -143,9 +624,26 @@ class ScentSniffer(Sniffer):
     def __init__(self, cwd=None, scent="scent.py"):
         self.cwd = cwd or os.getcwd()
         self.scent = scent_picker.exec_from_dir(self.cwd, scent)
+        self._scent_reloaded = False
+        # names of the runnables the batch's files select, None for all
+        self.runner_names = None
         super(ScentSniffer, self).__init__()
         self.update_from_scent()
 
+    @property
+    def forks_runs(self):
+        # parallel runnables are forked from the run's process, which must
+        # not have threads running (the scheduler's, the scanners'...)
+        return bool(self.scent and self.scent.parallel and
+                    len(self.scent.runners) > 1)
+
+    @property
+    def preload_modules(self):
+        modules = Sniffer.preload_modules
+        if self.scent:
+            modules += tuple(self.scent.preload_modules)
+        return modules
+
     def update_from_scent(self):
         if self.scent:
             self.pass_colors['fg'] = self.scent.fg_pass
@@ -153,39 +651,102 @@ class ScentSniffer(Sniffer):
             self.fail_colors['fg'] = self.scent.fg_fail
             self.fail_colors['bg'] = self.scent.bg_fail
             self.watch_paths = self.scent.watch_paths
+            self.scanner_options = dict(self.scent.scanner_options)
+            self.path_filter = self.scent.path_filter
+            self._import_graph = None
+
+    def schedule(self, changes):
+        """
+        Also schedules a reload of the scent when it changed, which runs
+        before the tests.
+        """
+        if self.scent and \
+                self.scent.filename in changes.created | changes.modified:
+            self.scheduler.submit('scent', self._reload_scent, priority=0)
+        return super(ScentSniffer, self).schedule(changes)
+
+    def _run_batch(self, changes):
+        """
+        Picks the runnables the changed files select (see select_runnable)
+        before running them.
+        """
+        self.runner_names = None
+        if self.scent and changes:
+            runners = self.scent.runners_for(changes.paths)
+            if runners:
+                self.runner_names = sorted(r.__name__ for r in runners)
+        return super(ScentSniffer, self)._run_batch(changes)
+
+    def _reload_scent(self, changes):
+        self.refresh_scent(self.scent.filename)
 
     def refresh_scent(self, filepath):
+        """
+        Reloads the scent. Validators and runnables that didn't change are
+        kept as they were, so the scanners only drop their cached decisions
+        when the validators (or the path filter) changed.
+        """
         if self.scent and filepath == self.scent.filename:
             print("Reloaded Scent:", filepath)
-            for s in self._scanners:
-                self.unobserve_scanner(s)
-            self.scent = self.scent.reload()
+            self._scent_reloaded = True
+            old, self.scent = self.scent, self.scent.reload()
+            if self.scent is old:
+                return
+            changed = self.scent.keep_unchanged(old)
+            if self.debug:
+                print("Changed:", ", ".join(changed) or "nothing")
             self.update_from_scent()
             for s in self._scanners:
                 self.scent_observe_scanner(s)
 
+    def fork_request(self):
+        request = super(ScentSniffer, self).fork_request()
+        request['reload_scent'] = self._scent_reloaded
+        request['runner_names'] = self.runner_names
+        self._scent_reloaded = False
+        return request
+
+    def _prepare_fork(self, request):
+        super(ScentSniffer, self)._prepare_fork(request)
+        if request['reload_scent']:
+            self.scent = self.scent.reload()
+            self.update_from_scent()
+        self.runner_names = request['runner_names']
+
     def unobserve_scanner(self, scanner):
-        for v in self.scent.validators:
-            if self.debug:
+        """Removes the scent's validators from the scanner."""
+        if self.debug:
+            for v in self.scent.validators:
                 print("Removed", repr(v))
-            scanner.remove_validator(v)
+        scanner.set_validators([v for v in scanner.validators
+                                if v not in self.scent.validators])
 
     def scent_observe_scanner(self, scanner):
+        scanner.set_filter(self.path_filter)
         if self.scent:
-            for v in self.scent.validators:
-                if self.debug:
-                    print("Added", repr(v))
-                scanner.add_validator(v)
+            if self.debug:
+                for v in self.scent.validators:
+                    print("Validator", repr(v))
+            scanner.set_validators(self.scent.validators)
 
     def observe_scanner(self, scanner):
-        scanner.observe('created', self.refresh_scent)
-        scanner.observe('modified', self.refresh_scent)
         self.scent_observe_scanner(scanner)
         return super(ScentSniffer, self).observe_scanner(scanner)
 
     def clear_on_run(self):
         super(ScentSniffer, self).clear_on_run(None)
 
+    @property
+    def records_coverage(self):
+        # the scent's runnables run the tests their own way
+        return self.coverage and not (self.scent and self.scent.runners)
+
+    @property
+    def selects_by_imports(self):
+        # the scent's runnables don't take test files (they can look at
+        # the changes with @runnable(changes=True))
+        return self.impact and not (self.scent and self.scent.runners)
+
     def run(self):
         """
         Runs the CWD's scent file.
@@ -195,6 +756,33 @@ class ScentSniffer(Sniffer):
             return super(ScentSniffer, self).run()
         else:
             print("Using scent:")
-            arguments = [sys.argv[0]] + list(self.test_args)
-            return self.scent.run(arguments)
+            if self.failed_first:
+                return self.run_scent_failed_first()
+            return self.scent.run(self.test_arguments(), self.scent_runners(),
+                                  self._batch)
         return True
+
+    def scent_runners(self):
+        """
+        Returns the runnables to run: the ones the batch's files select, or
+        all the scent's runners.
+        """
+        if self.runner_names is None:
+            return tuple(self.scent.runners)
+        return tuple(r for r in self.scent.runners
+                     if r.__name__ in self.runner_names)
+
+    def run_scent_failed_first(self):
+        """
+        Runs the scent's runnables, starting with the ones that failed last
+        time. The runnables after a failing one don't run (unless they run
+        in parallel).
+        """
+        history = FailureHistory(self.state_path('failures.json'))
+        failed = set(history.get('runnables'))
+        runners = sorted(self.scent_runners(),
+                         key=lambda r: r.__name__ not in failed)
+        passed = self.scent.run(self.test_arguments(), runners, self._batch)
+        history.set('runnables', self.scent.failed_runners)
+        history.save()
+        return passed
@@ -6,6 +6,9 @@ It provides a polling technique which is an OS-independent and uses no
 third-party libraries at the cost of performance. The polling technique
 constantly walks through the directory tree to see which files changed,
 calling os.stat on the files.
+
+On Linux, the built-in inotify scanner (which only needs ctypes) is preferred
+over both polling and pyinotify.
 """
 from __future__ import absolute_import
 from .base import PollingScanner
@@ -33,3 +36,4 @@ def _import(module, cls):
 _import('pywin_scanner', 'PyWinScanner')          # windows
 _import('fsevents_scanner', 'FSEventsScanner')    # osx
 _import('pyinotify_scanner', 'PyINotifyScanner')  # linux
+_import('inotify_scanner', 'INotifyScanner')      # linux, no dependencies
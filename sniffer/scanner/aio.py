@@ -0,0 +1,162 @@
+"""
+asyncio interface to the scanners.
+
+Every scanner provides ``watch()``, an asynchronous iterator of ChangeSets::
+
+  async for changes in scanner.watch():
+      print(changes.created, changes.modified, changes.deleted)
+
+Each ChangeSet holds everything that changed since the previous one was
+handed out. Nothing is read or scanned while the consumer is busy with a
+batch; changes pile up (folded per path) and come out as the next batch.
+Leaving the loop, or cancelling the task iterating it, releases the scanner.
+
+The backends are driven differently:
+
+ - inotify: the descriptor is registered with ``loop.add_reader`` while
+   waiting, so nothing runs until the kernel has events. They are processed
+   in the loop's default executor.
+ - polling: each scan runs in the loop's default executor.
+ - other native backends: their blocking loop runs in a thread.
+"""
+import asyncio
+import threading
+
+from ..changes import ChangeSet
+
+__all__ = ['watch_polling', 'watch_reader', 'watch_threaded']
+
+
+class _Collector(object):
+    """
+    Observes a scanner's file events into a ChangeSet, calling ``notify``
+    after each one. Safe to feed from another thread.
+    """
+    def __init__(self, scanner, notify=None):
+        self._scanner = scanner
+        self._notify = notify
+        self._lock = threading.Lock()
+        self._changes = ChangeSet()
+
+    def __enter__(self):
+        for event_name in ChangeSet.EVENTS:
+            self._scanner.observe(event_name, getattr(self, event_name))
+        return self
+
+    def __exit__(self, *exc_info):
+        for event_name in ChangeSet.EVENTS:
+            self._scanner.unobserve(event_name, getattr(self, event_name))
+
+    def add(self, event_name, filepath):
+        with self._lock:
+            self._changes.add(event_name, filepath)
+        if self._notify is not None:
+            self._notify()
+
+    def created(self, filepath):
+        self.add('created', filepath)
+
+    def modified(self, filepath):
+        self.add('modified', filepath)
+
+    def deleted(self, filepath):
+        self.add('deleted', filepath)
+
+    def take(self):
+        """Returns the changes collected so far, starting a new ChangeSet."""
+        with self._lock:
+            changes, self._changes = self._changes, ChangeSet()
+        return changes
+
+
+async def _run_blocking(func, *args):
+    """
+    Runs func in the default executor. If the awaiting task gets cancelled,
+    func is still waited for, so the scanner is never used concurrently.
+    """
+    future = asyncio.get_running_loop().run_in_executor(None, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+async def watch_polling(scanner, interval=0.5):
+    """
+    Yields the ChangeSet of each scan that found changes, sleeping interval
+    seconds after the ones that didn't. The scanner is stopped once the
+    iteration ends.
+    """
+    try:
+        changes = await _run_blocking(scanner._start)
+        if changes:
+            yield changes
+        while True:
+            changes = await _run_blocking(scanner._scan)
+            if changes:
+                yield changes
+            else:
+                await asyncio.sleep(interval)
+    finally:
+        scanner.stop()
+
+
+async def watch_reader(scanner):
+    """
+    Yields the changes behind each wake up of the scanner's file descriptor.
+    The scanner must provide fileno(), read_events(), process_events() and
+    close(), called once the iteration ends. The descriptor is only watched
+    while waiting for events: pending ones would otherwise wake the loop
+    over and over while the consumer works. Events are processed in the
+    default executor, since an overflow triggers a full rescan.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        changes = await _run_blocking(scanner._start)
+        if changes:
+            yield changes
+        ready = asyncio.Event()
+        fd = scanner.fileno()
+        with _Collector(scanner) as collector:
+            while True:
+                loop.add_reader(fd, ready.set)
+                try:
+                    await ready.wait()
+                finally:
+                    loop.remove_reader(fd)
+                ready.clear()
+                await _run_blocking(scanner.process_events,
+                                    scanner.read_events())
+                changes = collector.take()
+                if changes:
+                    yield changes
+    finally:
+        scanner.close()
+
+
+async def watch_threaded(scanner, interval=0.5):
+    """
+    Runs the scanner's blocking loop() in a daemon thread and yields the
+    changes its events describe.
+    """
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+
+    def notify():
+        loop.call_soon_threadsafe(ready.set)
+
+    with _Collector(scanner, notify) as collector:
+        thread = threading.Thread(target=scanner.loop, args=(interval,),
+                                  name='sniffer-scanner')
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                await ready.wait()
+                ready.clear()
+                changes = collector.take()
+                if changes:
+                    yield changes
+        finally:
+            scanner.stop()
@@ -3,45 +3,170 @@ Scanner class.
 
 Provides a polling technique which is an OS-independent and uses no third-party
 libraries at the cost of performance. The polling technique constantly walks
-throughthe directory tree to see which files changed, calling os.stat on the
-files.
+through the directory tree with os.scandir to see which files changed, reusing
+the stat result of each directory entry.
 """
+import hashlib
 import os
+import threading
 import time
+import types
 import collections.abc
+from concurrent.futures import ThreadPoolExecutor
+
+from ..changes import ChangeSet
+from ..metrics import NULL_METRICS
+from .filetable import FileTable
+from .filters import DEFAULT_IGNORED_DIRS, PathFilter
+from .hashing import ContentHashCache
+from .roots import normalize_roots
+from .snapshot import SnapshotError, load as load_snapshot, \
+    save as save_snapshot
+
+
+def _validator_key(func):
+    """
+    Returns a string identifying a validator from one process to the next:
+    its qualified name, the runnable it selects and, for Python functions,
+    a digest of its code. Reprs of plain functions hold their address.
+    """
+    runnable = getattr(func, 'runnable', None)
+    func = getattr(func, 'func', func)  # sniffer.api wrappers
+    key = '%s.%s' % (getattr(func, '__module__', None),
+                     getattr(func, '__qualname__', type(func).__qualname__))
+    if runnable is not None:
+        key += '>' + runnable
+    code = getattr(func, '__code__', None)
+    if code is not None:
+        digest = hashlib.sha1(code.co_code)
+        for const in code.co_consts:
+            if not isinstance(const, types.CodeType):
+                digest.update(repr(const).encode('utf-8', 'replace'))
+        key += ':' + digest.hexdigest()[:16]
+    return key
+
+
+def _signature(st):
+    """
+    Returns the (mtime_ns, size, inode) tuple used to detect file changes from
+    a stat result.
+    """
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
 
 
 class BaseScanner(object):
     """
     Provides basic hooking and logging mechanisms.
+
+    Accepts these keyword options:
+
+    ``verify_content`` Boolean. Hash files whose signature changed and drop
+                       modified events for files whose content is identical
+                       to what was last seen. Files found by the initial
+                       scan are hashed then. Defaults to False.
+    ``path_filter``    PathFilter deciding which files and directories are
+                       looked at before the validators run. Defaults to one
+                       that only skips repository directories.
+    ``metrics``        Metrics timing scans, validators and callbacks, and
+                       counting files and events. Defaults to none.
     """
     ALL_EVENTS = ('created', 'modified', 'deleted', 'init')
 
     def __init__(self, paths, scent=None, logger=None, *args, **kwargs):
         self._validators = []
         self._scent = scent
-        self._paths = [os.path.abspath(p) for p in paths]
+        # held while scanning and while the validators or the path filter
+        # change, which happens from other threads (eg - scent reloads)
+        self._lock = threading.RLock()
+        self._given_paths = list(paths)
         self._logger = logger
         self._events = {}
         for e in self.ALL_EVENTS:
             self._events[e] = []
-        self._watched_files = {}
+        self._watched_files = FileTable()
+        self._hashes = None
+        if kwargs.get('verify_content', False):
+            self._hashes = ContentHashCache()
+        self.suppressed_events = 0
+        self._decisions = {}
+        self._selects_runnable = False
+        self.decision_hits = self.decision_misses = 0
+        self._filter = kwargs.get('path_filter') or PathFilter()
+        self.metrics = kwargs.get('metrics') or NULL_METRICS
+        self._normalize_paths()
 
     def add_validator(self, func):
         if not isinstance(func, collections.abc.Callable):
             raise TypeError(("Param should return boolean and accept a "
                              "filename string"))
-        self._validators.append(func)
+        with self._lock:
+            self._validators.append(func)
+            self.clear_decisions()
 
     def remove_validator(self, func):
-        self._validators.remove(func)
+        with self._lock:
+            self._validators.remove(func)
+            self.clear_decisions()
+
+    @property
+    def validators(self):
+        return tuple(self._validators)
+
+    def set_validators(self, validators):
+        """
+        Replaces the validators. Cached decisions are kept if the list holds
+        the same validators, in the same order.
+        """
+        validators = list(validators)
+        for func in validators:
+            if not isinstance(func, collections.abc.Callable):
+                raise TypeError(("Param should return boolean and accept a "
+                                 "filename string"))
+        with self._lock:
+            if validators != self._validators:
+                self._validators = validators
+                self.clear_decisions()
+
+    @property
+    def path_filter(self):
+        return self._filter
+
+    def set_filter(self, path_filter):
+        """
+        Replaces the PathFilter applied before the validators.
+        """
+        with self._lock:
+            if path_filter != self._filter:
+                self._filter = path_filter
+                self._normalize_paths()
+                self.clear_decisions()
+
+    def set_metrics(self, metrics):
+        """Replaces the Metrics recording what the scanner does."""
+        self.metrics = metrics or NULL_METRICS
+
+    def clear_decisions(self):
+        """
+        Forgets the cached is_valid_type decisions. Called whenever the set
+        of validators changes.
+        """
+        with self._lock:
+            self._decisions = {}
+            self._selects_runnable = any(
+                hasattr(v, 'runnable') for v in self._validators)
 
     def trigger_modified(self, filepath):
-        """Triggers modified event if the given filepath mod time is newer."""
-        mod_time = self._get_modified_time(filepath)
-        if mod_time > self._watched_files.get(filepath, 0):
-            self._trigger('modified', filepath)
-            self._watched_files[filepath] = mod_time
+        """
+        Triggers modified event if the given filepath's signature changed.
+        """
+        signature = self._get_signature(filepath)
+        if signature is not None and \
+                signature != self._watched_files.get(filepath):
+            self._watched_files[filepath] = signature
+            if self._content_changed(filepath, signature):
+                self._trigger('modified', filepath)
+            else:
+                self._report_suppressed(1)
 
     def trigger_created(self, filepath):
         """Triggers created event if file exists."""
@@ -51,20 +176,69 @@ class BaseScanner(object):
     def trigger_deleted(self, filepath):
         """Triggers deleted event if the flie doesn't exist."""
         if not os.path.exists(filepath):
+            if self._hashes is not None:
+                self._hashes.forget(filepath)
+            self._decisions.pop(filepath, None)
             self._trigger('deleted', filepath)
 
     def trigger_init(self):
         """Triggers initialization event."""
         self._trigger('init')
 
-    def _get_modified_time(self, filepath):
+    def _content_changed(self, filepath, signature):
+        """
+        Returns False if content verification is enabled and filepath has the
+        same content as when it was last seen.
+        """
+        if self._hashes is None:
+            return True
+        return self._hashes.changed(filepath, signature)
+
+    def _verify_changes(self, changes, signatures):
+        """
+        Drops the modified files of a ChangeSet whose content didn't change,
+        given a {filepath: signature} mapping of the current files.
+        Returns the number of dropped modifications.
+        """
+        if self._hashes is None:
+            return 0
+        for filepath in changes.created:
+            self._hashes.digest(filepath, signatures[filepath])
+        for filepath in changes.deleted:
+            self._hashes.forget(filepath)
+        unchanged = [filepath for filepath in changes.modified
+                     if not self._content_changed(filepath,
+                                                  signatures[filepath])]
+        changes.modified.difference_update(unchanged)
+        if unchanged:
+            self._report_suppressed(len(unchanged))
+        return len(unchanged)
+
+    def _digest_all(self, signatures):
+        """
+        Hashes the files of a {filepath: signature} mapping that weren't
+        hashed at their signature yet, so touching them later is recognized.
+        """
+        if self._hashes is None:
+            return
+        for filepath, signature in signatures.items():
+            self._hashes.digest(filepath, signature)
+
+    def _report_suppressed(self, count):
+        self.suppressed_events += count
+        self.metrics.count('events_suppressed', count)
+        print("Ignored %d file(s) rewritten with identical content "
+              "(%d so far)" % (count, self.suppressed_events))
+
+    def _get_signature(self, filepath):
         """
-        Returns the modified time for the given filepath or 0 on failure
+        Returns the (mtime_ns, size, inode) signature for the given filepath or
+        None on failure.
         """
         try:
-            return os.stat(filepath).st_mtime
+            return _signature(os.stat(filepath))
         except OSError:
-            return 0  # this should be an older timestamp than any real file
+            return None
 
     def loop(self, sleep_time=0.5, callback=None):
         """Runs a blocking loop."""
@@ -85,10 +259,25 @@ class BaseScanner(object):
         """
         raise NotImplemented()
 
+    def watch(self, interval=0.5):
+        """
+        Returns an asynchronous iterator of ChangeSets, for use within
+        asyncio::
+
+          async for changes in scanner.watch():
+              ...
+
+        By default, the blocking loop() runs in a thread, with interval as
+        its sleep_time. See sniffer.scanner.aio.
+        """
+        from .aio import watch_threaded
+        return watch_threaded(self, interval)
+
     @property
     def paths(self):
         """
-        A tuple of directories to watch.
+        A tuple of directories to watch: the absolute paths of the given
+        ones, minus the ones overlapping others (see normalize_roots).
         """
         return tuple(self._paths)
 
@@ -96,9 +285,18 @@ class BaseScanner(object):
         """
         Adds a directory to watch.
         """
-        self._paths.append(path)
+        with self._lock:
+            self._given_paths.append(path)
+            self._normalize_paths()
         return self
 
+    def _normalize_paths(self):
+        self._paths = normalize_roots(self._given_paths, self._filter)
+        self._filter = self._filter.for_roots(self._paths)
+        dropped = len(self._given_paths) - len(self._paths)
+        if dropped:
+            self.log("Skipping %d overlapping or looping path(s)" % dropped)
+
     def log(self, *message):
         """
         Logs a messate to a defined io stream if available.
@@ -115,8 +313,10 @@ class BaseScanner(object):
         parameters.
         """
         self.log('event: %s' % event_name, *args)
-        for f in self._events[event_name]:
-            f(*args, **kwargs)
+        self.metrics.count('events_fired')
+        with self.metrics.span('callbacks'):
+            for f in self._events[event_name]:
+                f(*args, **kwargs)
 
     def default_validator(self, filepath):
         """
@@ -132,7 +332,7 @@ class BaseScanner(object):
         occationally.
         """
         filepath = set(filepath.replace('\\', '/').split('/'))
-        for p in ('.git', '.hg', '.svn', '.cvs', '.bzr'):
+        for p in DEFAULT_IGNORED_DIRS:
             if p in filepath:
                 return True
         return False
@@ -141,21 +341,39 @@ class BaseScanner(object):
         """
         Returns True if the given filepath is a valid watchable filetype.
         The filepath can be assumed to be a file (not a directory).
+
+        Decisions are cached per filepath until the validators change, since
+        validators are expected to only look at the path.
+        """
+        with self._lock:
+            decision = self._decisions.get(filepath)
+            if decision is None:
+                self.decision_misses += 1
+                with self.metrics.span('validate'):
+                    decision = self._decisions[filepath] = \
+                        self._decide(filepath)
+            else:
+                self.decision_hits += 1
+        return decision
+
+    def _decide(self, filepath):
+        """
+        Runs the path filter, then the validators, against filepath.
+        Which runnables the files select is decided per batch (see
+        ScentModule.runners_for), not while scanning.
         """
-        if self.in_repo(filepath):
+        if not self._filter.accepts_file(filepath):
             return False
 
         validators = self._validators
         if len(validators) == 0:
             validators = [self.default_validator]
 
-        if any([hasattr(v, 'runnable') for v in self._validators]):
+        if self._selects_runnable:
             # case where we select the runnable function by the validator
             for validator in validators:
-                if validator(filepath):
-                    if hasattr(validator, 'runnable'):
-                        self._scent.set_runner(validator.runnable)
-                        return True
+                if validator(filepath) and hasattr(validator, 'runnable'):
+                    return True
             return False
 
         for validator in validators:
@@ -209,53 +427,57 @@ class BaseScanner(object):
 class PollingScanner(BaseScanner):
     """
     Implements the naive, but cross-platform file scanner.
+
+    Accepts these keyword options on top of BaseScanner's:
+
+    ``warn_missing_lib`` Boolean. Print a hint about native backends when
+                         the loop starts. Defaults to True.
+    ``incremental``      Boolean. Only re-list directories whose mtime
+                         changed since the previous scan; files in unchanged
+                         directories just get stat'ed. Defaults to False.
+    ``snapshot``         Filename. The watch list is restored from it when
+                         the loop starts, firing events for files changed
+                         while sniffer wasn't running, and saved back to it
+                         periodically. Defaults to None (no snapshot).
+    ``checkpoint_interval`` Minimum time, in seconds, between snapshot
+                         saves. Defaults to 60.
+    ``workers``          Number of threads listing and stat'ing directories
+                         in parallel. Helps on filesystems with slow stat
+                         calls (eg - NFS). Defaults to 1 (no threads).
+
+    When watching several independent roots (eg - a few repositories), each
+    root is walked by its own thread; their changes make up a single
+    ChangeSet, fired as one stream of events.
     """
+    # A directory listing is only trusted once the directory's mtime is at
+    # least this old (in ns) at listing time. Otherwise an entry created in
+    # the same timestamp tick as the listing could go unnoticed.
+    RACY_NS = 2 * 10 ** 9
+
     def __init__(self, *args, **kwargs):
         super(PollingScanner, self).__init__(*args, **kwargs)
-        self._watched_files = {}
+        self._watched_files = FileTable()
+        self._dirs = {}
         self._running = False
         self._warn = kwargs.get('warn_missing_lib', True)
-
-    def _watch_file(self, filepath, trigger_event=True):
-        """Adds the file's modified time into its internal watchlist."""
-        is_new = filepath not in self._watched_files
-        if trigger_event:
-            if is_new:
-                self.trigger_created(filepath)
-            else:
-                self.trigger_modified(filepath)
-        try:
-            self._watched_files[filepath] = self._get_modified_time(filepath)
-        except OSError:
-            return  # didn't happen
-
-    def _unwatch_file(self, filepath, trigger_event=True):
-        """
-        Removes the file from the internal watchlist if exists.
-        """
-        if filepath not in self._watched_files:
-            return
-        if trigger_event:
-            self.trigger_deleted(filepath)
-        del self._watched_files[filepath]
-
-    def _is_modified(self, filepath):
-        """
-        Returns True if the file has been modified since last seen.
-        Will return False if the file has not been seen before.
-        """
-        if self._is_new(filepath):
-            return False
-        mtime = self._get_modified_time(filepath)
-        return self._watched_files[filepath] < mtime
-
-    def _requires_new_modtime(self, filepath):
-        """Returns True if the stored modtime needs to be updated."""
-        return self._is_new(filepath) or self._is_modified(filepath)
-
-    def _is_new(self, filepath):
-        """Returns True if file is not already on the watch list."""
-        return filepath not in self._watched_files
+        self._incremental = kwargs.get('incremental', False)
+        self._snapshot_file = kwargs.get('snapshot')
+        self._checkpoint_interval = kwargs.get('checkpoint_interval', 60)
+        self._last_checkpoint = 0
+        self._workers = kwargs.get('workers', 1)
+        self._pool = self._root_pool = None
+        self._root_pool_size = 0
+
+    def clear_decisions(self):
+        # cached directory listings only hold the files accepted before
+        with self._lock:
+            super(PollingScanner, self).clear_decisions()
+            self._dirs = {}
+
+    def _trigger_changes(self, changes):
+        """Fires an event for every entry of the given ChangeSet."""
+        for event_name, filepath in changes.events():
+            self._trigger(event_name, filepath)
 
     def loop(self, sleep_time=1, callback=None):
         """
@@ -266,7 +488,7 @@ class PollingScanner(BaseScanner):
         self.log("No supported libraries found: using polling-method.")
         self._running = True
         self.trigger_init()
-        self._scan(trigger=False)  # put after the trigger
+        self._start()  # put after the trigger
         if self._warn:
             print("""
 You should install a third-party library so I don't eat CPU.
@@ -277,40 +499,268 @@ Supported libraries are:
 
 Use pip or easy_install and install one of those libraries above.
 """)
-        while self._running:
-            self._scan()
-            if isinstance(callback, collections.abc.Callable):
-                callback()
-            time.sleep(sleep_time)
+        try:
+            while self._running:
+                if self._scan():
+                    self.checkpoint()
+                if isinstance(callback, collections.abc.Callable):
+                    callback()
+                time.sleep(sleep_time)
+        finally:
+            self.checkpoint(force=True)
 
     def step(self):
-        self._scan()
+        return self._scan()
+
+    def watch(self, interval=0.5):
+        """
+        Asynchronous iterator of ChangeSets. Scans run in the event loop's
+        executor, interval seconds apart while nothing changes.
+        """
+        from .aio import watch_polling
+        return watch_polling(self, interval)
+
+    def _start(self):
+        """
+        Takes the initial snapshot, restoring the saved one if available.
+        Returns what changed while sniffer wasn't running according to the
+        restored snapshot (an empty ChangeSet without one). Those changes
+        also fire events.
+        """
+        restored = self.restore_snapshot()
+        changes = self._scan(trigger=restored)
+        if restored:
+            self._digest_all(self._watched_files)
+        self.checkpoint(force=True)
+        return changes if restored else ChangeSet()
 
     def stop(self):
         self._running = False
+        for pool in (self._pool, self._root_pool):
+            if pool is not None:
+                pool.shutdown(wait=False)
+        self._pool = self._root_pool = None
+
+    def _snapshot_key(self):
+        """
+        Identifies what a snapshot was taken of: the watched paths and the
+        validators. Snapshots taken with a different key are not restored.
+        """
+        validators = sorted(_validator_key(v) for v in self._validators)
+        return '\n'.join(self.paths + tuple(validators) +
+                         (repr(self._filter),))
+
+    def restore_snapshot(self):
+        """
+        Loads the watch list from the snapshot file, if one is configured.
+        Returns True if the snapshot was restored.
+        """
+        if not self._snapshot_file or \
+                not os.path.exists(self._snapshot_file):
+            return False
+        try:
+            files, dirs, key = load_snapshot(self._snapshot_file)
+        except (OSError, SnapshotError) as e:
+            self.log("Ignoring snapshot:", e)
+            return False
+        if key != self._snapshot_key():
+            self.log("Ignoring snapshot: taken with other paths or validators")
+            return False
+
+        children = {}
+        for fpath in files:
+            children.setdefault(os.path.dirname(fpath), ([], []))[0] \
+                .append(fpath)
+        for dirpath in dirs:
+            children.setdefault(os.path.dirname(dirpath), ([], []))[1] \
+                .append(dirpath)
+        self._watched_files = FileTable(files.items())
+        self._dirs = dict(
+            (dirpath, times + children.get(dirpath, ([], [])))
+            for dirpath, times in dirs.items())
+        self.log("Restored snapshot of %d files" % len(files))
+        return True
+
+    def checkpoint(self, force=False):
+        """
+        Saves the watch list to the snapshot file, if one is configured and
+        checkpoint_interval elapsed since the last save (unless forced).
+        """
+        if not self._snapshot_file:
+            return
+        now = time.time()
+        if not force and \
+                now - self._last_checkpoint < self._checkpoint_interval:
+            return
+        dirs = dict((d, v[:2]) for d, v in self._dirs.items())
+        try:
+            save_snapshot(self._snapshot_file, self._watched_files, dirs,
+                          self._snapshot_key())
+        except (OSError, IOError) as e:
+            self.log("Failed to save snapshot:", e)
+        self._last_checkpoint = now
+
+    def _listdir(self, dirpath):
+        """
+        Lists dirpath with os.scandir. Each file that may be valid (not
+        rejected by the path filter or a cached decision) is stat'ed at most
+        once, through its directory entry. Like os.walk, symlinked
+        directories are not followed; neither are the ones the path filter
+        rejects.
+        Returns (signatures, subdirectories), signatures being a list of
+        (filepath, signature) pairs. Runs in worker threads, so it only
+        reads shared state: the validators run later, on the scanning thread
+        (see _update).
+        """
+        signatures, subdirs = [], []
+        decisions, path_filter = self._decisions, self._filter
+        try:
+            entries = os.scandir(dirpath)
+        except OSError:
+            return signatures, subdirs
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink() and \
+                                path_filter.accepts_dir(entry.path):
+                            subdirs.append(entry.path)
+                        continue
+                    filepath = entry.path
+                    decision = decisions.get(filepath)
+                    if decision is None:
+                        decision = path_filter.accepts_file(filepath)
+                    if decision:
+                        signatures.append((filepath,
+                                           _signature(entry.stat())))
+                except OSError:
+                    continue
+        return signatures, subdirs
+
+    def _visit(self, dirpath):
+        """
+        Scans a single directory. In incremental mode, directories whose
+        mtime didn't move since the last scan are not re-listed: their known
+        files just get stat'ed.
+        Returns (signatures, subdirectories, record), record being the
+        directory's incremental cache entry
+        (mtime_ns, listed_at_ns, filepaths, subdirectories), or None.
+        """
+        if not self._incremental:
+            signatures, subdirs = self._listdir(dirpath)
+            return signatures, subdirs, None
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            return [], [], None
+        cached = self._dirs.get(dirpath)
+        if cached is not None and cached[0] == mtime and \
+                cached[1] - mtime >= self.RACY_NS:
+            signatures = []
+            for fpath in cached[2]:
+                try:
+                    signatures.append((fpath, _signature(os.stat(fpath))))
+                except OSError:
+                    continue  # the parent's mtime moves on the next scan
+            return signatures, cached[3], cached
+        listed_at = time.time_ns()
+        signatures, subdirs = self._listdir(dirpath)
+        files = [fpath for fpath, signature in signatures]
+        return signatures, subdirs, (mtime, listed_at, files, subdirs)
+
+    def _walk(self, root):
+        """
+        Scans the tree under root. Returns a list of (dirpath, signatures,
+        record) in walking order.
+
+        The tree is walked one level at a time. With workers, the directories
+        of a level are scanned by the thread pool; results are kept in
+        listing order, so the outcome doesn't depend on thread scheduling.
+        """
+        visited, level = [], [root]
+        while level:
+            pool = self._pool
+            try:
+                if pool is None:
+                    raise RuntimeError
+                results = list(pool.map(self._visit, level))
+            except RuntimeError:  # no pool, or shut down by stop()
+                results = [self._visit(dirpath) for dirpath in level]
+            next_level = []
+            for dirpath, (signatures, subdirs, record) in zip(level, results):
+                visited.append((dirpath, signatures, record))
+                next_level.extend(subdirs)
+            level = next_level
+        return visited
+
+    def _update(self):
+        """
+        Walks the watched paths, bringing the watch list (a FileTable) up to
+        date in place. Returns the ChangeSet against what it held before.
+
+        With several roots, each one is walked by its own thread and the
+        results merged in the order of the roots. The validators then run
+        on this thread, in that order.
+        """
+        roots = self.paths
+        if self._workers > 1 and self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self._workers)
+        if len(roots) > 1:
+            if self._root_pool is None or self._root_pool_size != len(roots):
+                if self._root_pool is not None:
+                    self._root_pool.shutdown(wait=False)
+                self._root_pool = ThreadPoolExecutor(max_workers=len(roots))
+                self._root_pool_size = len(roots)
+            walks = list(self._root_pool.map(self._walk, roots))
+        else:
+            walks = [self._walk(root) for root in roots]
+        table, changes = self._watched_files, ChangeSet()
+        decisions, hits = self._decisions, 0
+        visited_dirs, dirs_seen = set(), {}
+        for visited in walks:
+            for dirpath, signatures, record in visited:
+                # files accepted before skip is_valid_type's bookkeeping
+                valid = [item for item in signatures if decisions.get(item[0])]
+                if len(valid) == len(signatures):
+                    hits += len(valid)
+                else:
+                    valid = [item for item in signatures
+                             if self.is_valid_type(item[0])]
+                table.update_dir(dirpath, valid, changes)
+                visited_dirs.add(dirpath)
+                if record is None:
+                    continue
+                if len(valid) != len(signatures):
+                    rejected = set(fpath for fpath, signature in signatures)
+                    rejected.difference_update(fpath for fpath, signature
+                                               in valid)
+                    record = record[:2] + (
+                        [fpath for fpath in record[2]
+                         if fpath not in rejected], record[3])
+                dirs_seen[dirpath] = record
+        table.prune_dirs(visited_dirs, changes)
+        self.decision_hits += hits
+        if self._incremental:
+            self._dirs = dirs_seen
+        return changes
 
     def _scan(self, trigger=True):
         """
         Walks through the directory to look for changes of the given file
-        types.
-        Returns True if changes occurred (False otherwise).
-        Returns None if polling method isn't being used.
-        """
-        changed = False
-        files_seen = set()
-        os_path_join = os.path.join
-        for path in self.paths:
-            for root, dirs, files in os.walk(path):
-                for f in files:
-                    fpath = os_path_join(root, f)
-                    if not self.is_valid_type(fpath):
-                        continue
-                    files_seen.add(fpath)
-                    if self._requires_new_modtime(fpath):
-                        self._watch_file(fpath, trigger)
-                        changed = True
-            for f in self._watched_files:
-                if f not in files_seen:
-                    self._unwatch_file(f, trigger)
-                    changed = True
-        return changed
+        types, firing an event per change when trigger is True.
+        Returns the ChangeSet against the previous scan (which is falsy if
+        nothing changed). The validators and the path filter can't change
+        while the tree is walked; events fire after.
+        """
+        with self._lock:
+            with self.metrics.span('scan'):
+                changes = self._update()
+            self.metrics.count('files_scanned', len(self._watched_files))
+            for filepath in changes.deleted:
+                self._decisions.pop(filepath, None)
+        if trigger:
+            self._verify_changes(changes, self._watched_files)
+            self._trigger_changes(changes)
+        else:
+            self._digest_all(self._watched_files)
+        return changes
@@ -0,0 +1,264 @@
+"""
+Compact table of the files a scanner watches.
+
+A {filepath: (mtime_ns, size, inode)} dictionary costs several hundred
+bytes per file: the full path string repeats the directory, and every
+signature is a tuple of three boxed integers. With a million files, that is
+hundreds of megabytes. FileTable keeps each directory path once, the file
+names per directory, and the signatures in typed arrays.
+"""
+import os
+import sys
+from array import array
+
+from ..changes import ChangeSet
+
+__all__ = ['FileTable']
+
+
+class FileTable(object):
+    """
+    A mapping of file paths to (mtime_ns, size, inode) signatures.
+
+    Supports the dictionary operations the scanners use (get, [], in, del,
+    len, iteration, items) plus diff(), which compares two tables directory
+    by directory, and update_dir()/prune_dirs(), which bring the table up to
+    date with a scan in place.
+    """
+    def __init__(self, items=()):
+        self._dirs = []        # directory index: dirpath (None once empty)
+        self._dir_index = {}   # dirpath: directory index
+        self._names = []       # directory index: {filename: row} (or None)
+        self._free_dirs = []   # indexes of removed directories, reused first
+        self._mtimes = array('q')
+        self._sizes = array('q')
+        self._inodes = array('Q')
+        self._free = []        # rows of removed files, reused first
+        self._len = 0
+        for filepath, signature in items:
+            self[filepath] = signature
+
+    def _locate(self, filepath):
+        """Returns (names of the directory or None, filename)."""
+        dirpath, name = os.path.split(filepath)
+        index = self._dir_index.get(dirpath)
+        if index is None:
+            return None, name
+        return self._names[index], name
+
+    def _row(self, filepath):
+        names, name = self._locate(filepath)
+        if names is None:
+            return None
+        return names.get(name)
+
+    def _signature(self, row):
+        return (self._mtimes[row], self._sizes[row], self._inodes[row])
+
+    def _dir_entries(self):
+        """Yields (dirpath, {filename: row}) for each directory."""
+        for dirpath, names in zip(self._dirs, self._names):
+            if names is not None:
+                yield dirpath, names
+
+    def _add_names(self, dirpath):
+        if self._free_dirs:
+            index = self._free_dirs.pop()
+            self._dirs[index], self._names[index] = dirpath, {}
+        else:
+            index = len(self._dirs)
+            self._dirs.append(dirpath)
+            self._names.append({})
+        self._dir_index[dirpath] = index
+        return self._names[index]
+
+    def _remove_dir(self, dirpath):
+        """Forgets a directory, once its last file is removed."""
+        index = self._dir_index.pop(dirpath)
+        self._dirs[index] = self._names[index] = None
+        self._free_dirs.append(index)
+
+    def add_dir(self, dirpath, signatures):
+        """
+        Adds the (filepath, signature) pairs of files directly in dirpath.
+        Faster than setting them one by one. Directories are only kept while
+        they hold files.
+        """
+        index = self._dir_index.get(dirpath)
+        names = self._names[index] if index is not None else None
+        start = len(os.path.join(dirpath, ''))
+        for filepath, signature in signatures:
+            if names is None:
+                names = self._add_names(dirpath)
+            name = filepath[start:]
+            row = names.get(name)
+            if row is None:
+                row = names[name] = self._new_row()
+                self._len += 1
+            self._set_row(row, signature)
+
+    def update_dir(self, dirpath, signatures, changes):
+        """
+        Makes the (filepath, signature) pairs the files directly in dirpath,
+        recording the created, modified and deleted ones into the ChangeSet
+        changes. Rows are updated in place: only added files allocate.
+        """
+        index = self._dir_index.get(dirpath)
+        names = self._names[index] if index is not None else None
+        known = len(names) if names is not None else 0
+        mtimes, sizes, inodes = self._mtimes, self._sizes, self._inodes
+        start = len(os.path.join(dirpath, ''))
+        matched = 0
+        for filepath, signature in signatures:
+            row = names.get(filepath[start:]) if names is not None else None
+            if row is None:
+                if names is None:
+                    names = self._add_names(dirpath)
+                row = names[filepath[start:]] = self._new_row()
+                self._len += 1
+                changes.created.add(filepath)
+            else:
+                matched += 1
+                mtime, size, inode = signature
+                if mtimes[row] == mtime and sizes[row] == size and \
+                        inodes[row] == inode:
+                    continue
+                changes.modified.add(filepath)
+            self._set_row(row, signature)
+        if matched == known:
+            return
+        present = set(filepath[start:] for filepath, signature in signatures)
+        for name in [name for name in names if name not in present]:
+            self._free.append(names.pop(name))
+            self._len -= 1
+            changes.deleted.add(os.path.join(dirpath, name))
+        if not names:
+            self._remove_dir(dirpath)
+
+    def prune_dirs(self, kept, changes):
+        """
+        Removes the files of the directories not in kept (a set of paths),
+        recording them as deleted into the ChangeSet changes.
+        """
+        for dirpath, names in list(self._dir_entries()):
+            if dirpath in kept:
+                continue
+            for name, row in names.items():
+                self._free.append(row)
+                changes.deleted.add(os.path.join(dirpath, name))
+            self._len -= len(names)
+            self._remove_dir(dirpath)
+
+    def _new_row(self):
+        if self._free:
+            return self._free.pop()
+        self._mtimes.append(0)
+        self._sizes.append(0)
+        self._inodes.append(0)
+        return len(self._mtimes) - 1
+
+    def _set_row(self, row, signature):
+        self._mtimes[row], self._sizes[row], self._inodes[row] = signature
+
+    def get(self, filepath, default=None):
+        row = self._row(filepath)
+        if row is None:
+            return default
+        return self._signature(row)
+
+    def __getitem__(self, filepath):
+        row = self._row(filepath)
+        if row is None:
+            raise KeyError(filepath)
+        return self._signature(row)
+
+    def __setitem__(self, filepath, signature):
+        self.add_dir(os.path.dirname(filepath), [(filepath, signature)])
+
+    def __delitem__(self, filepath):
+        names, name = self._locate(filepath)
+        if names is None or name not in names:
+            raise KeyError(filepath)
+        self._free.append(names.pop(name))
+        self._len -= 1
+        if not names:
+            self._remove_dir(os.path.dirname(filepath))
+
+    def pop(self, filepath, *default):
+        try:
+            signature = self[filepath]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[filepath]
+        return signature
+
+    def __contains__(self, filepath):
+        return self._row(filepath) is not None
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for dirpath, names in self._dir_entries():
+            for name in names:
+                yield os.path.join(dirpath, name)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        for dirpath, names in self._dir_entries():
+            for name, row in names.items():
+                yield os.path.join(dirpath, name), self._signature(row)
+
+    def under(self, dirpath):
+        """Returns the paths of the files below dirpath."""
+        prefix = os.path.join(dirpath, '')
+        return [os.path.join(d, name) for d, names in self._dir_entries()
+                if d == dirpath or d.startswith(prefix) for name in names]
+
+    def diff(self, new):
+        """
+        Returns the ChangeSet from this table to the new one. Directories
+        are matched first, then the names within them, so unchanged paths
+        are never rebuilt.
+        """
+        changes = ChangeSet()
+        mtimes, sizes, inodes = self._mtimes, self._sizes, self._inodes
+        for dirpath, new_names in new._dir_entries():
+            index = self._dir_index.get(dirpath)
+            old_names = self._names[index] if index is not None else {}
+            for name, new_row in new_names.items():
+                row = old_names.get(name)
+                if row is None:
+                    changes.created.add(os.path.join(dirpath, name))
+                elif mtimes[row] != new._mtimes[new_row] or \
+                        sizes[row] != new._sizes[new_row] or \
+                        inodes[row] != new._inodes[new_row]:
+                    changes.modified.add(os.path.join(dirpath, name))
+            for name in old_names.keys() - new_names.keys():
+                changes.deleted.add(os.path.join(dirpath, name))
+        for dirpath, old_names in self._dir_entries():
+            if dirpath not in new._dir_index:
+                changes.deleted.update(os.path.join(dirpath, name)
+                                       for name in old_names)
+        return changes
+
+    def nbytes(self):
+        """
+        Returns an estimate of the memory used by the table, in bytes
+        (directory and file names, the per directory mappings and the
+        signature columns).
+        """
+        size = sys.getsizeof(self._dirs) + sys.getsizeof(self._dir_index) + \
+            sys.getsizeof(self._names) + sys.getsizeof(self._free) + \
+            sys.getsizeof(self._free_dirs)
+        for dirpath, names in self._dir_entries():
+            size += sys.getsizeof(dirpath) + sys.getsizeof(names)
+            for name, row in names.items():
+                size += sys.getsizeof(name) + sys.getsizeof(row)
+        for column in (self._mtimes, self._sizes, self._inodes):
+            size += column.buffer_info()[1] * column.itemsize
+        return size
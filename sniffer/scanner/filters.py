@@ -0,0 +1,146 @@
+"""
+Declarative path filtering.
+
+A scent file can declare which files to watch with glob patterns and which
+directories to skip altogether. The patterns are compiled once into regular
+expressions, and ignored directories are pruned while walking the tree
+instead of rejecting every file found inside them.
+"""
+import fnmatch
+import os
+import re
+
+__all__ = ['DEFAULT_IGNORED_DIRS', 'PathFilter']
+
+# repository directories cause some exceptions occasionally, .sniffer holds
+# sniffer's own state
+DEFAULT_IGNORED_DIRS = ('.git', '.hg', '.svn', '.cvs', '.bzr', '.sniffer')
+
+
+def _compile(patterns):
+    """
+    Compiles glob patterns into a pair of regular expressions (or None): one
+    matched against basenames (patterns without a slash), the other against
+    the end of the full path (patterns with a slash).
+    """
+    names, paths = [], []
+    for pattern in patterns:
+        pattern = pattern.replace('\\', '/')
+        if '/' in pattern:
+            paths.append(fnmatch.translate('*/' + pattern.lstrip('/')))
+        else:
+            names.append(fnmatch.translate(pattern))
+
+    def join(regexes):
+        if not regexes:
+            return None
+        return re.compile('|'.join('(?:%s)' % r for r in regexes))
+    return join(names), join(paths)
+
+
+def _matches(compiled, path, is_dir=False):
+    names, paths = compiled
+    if names is not None and names.match(os.path.basename(path)):
+        return True
+    if paths is not None:
+        path = path.replace('\\', '/')
+        if is_dir:
+            path += '/'  # so "build/*" also rejects the build directory
+        return paths.match(path) is not None
+    return False
+
+
+class PathFilter(object):
+    """
+    Decides which files and directories a scanner looks at.
+
+    ``include``      Glob patterns. When given, only files matching one of
+                     them are accepted.
+    ``exclude``      Glob patterns rejecting files and directories.
+    ``ignored_dirs`` Directory names that are never walked into.
+    ``roots``        The watched directories. Paths below one of them are
+                     matched from it: the directories above the root (eg -
+                     ``~/build/project``) don't count.
+
+    Patterns without a slash match basenames (eg - ``*.py``). Patterns with
+    a slash match the end of the path (eg - ``build/*``, ``docs/*.py``).
+    The Python file validators of a scent still run on the files a filter
+    accepts.
+    """
+    def __init__(self, include=(), exclude=(),
+                 ignored_dirs=DEFAULT_IGNORED_DIRS, roots=()):
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.ignored_dirs = frozenset(ignored_dirs)
+        self.roots = tuple(os.path.abspath(r) for r in roots)
+        self._include = _compile(self.include)
+        self._exclude = _compile(self.exclude)
+        # deepest first, so nested roots win
+        self._prefixes = sorted((os.path.join(r, '') for r in self.roots),
+                                key=len, reverse=True)
+
+    def for_roots(self, roots):
+        """Returns the same filter, matching paths from the given roots."""
+        return PathFilter(self.include, self.exclude, self.ignored_dirs,
+                          roots)
+
+    def _relative(self, path, root=None):
+        """
+        Returns path from its root (or the given one) with a leading
+        separator, '' for the root itself. Paths outside the roots are
+        returned as they are.
+        """
+        if root is not None:
+            prefixes = [os.path.join(os.path.abspath(root), '')]
+        else:
+            prefixes = self._prefixes
+        for prefix in prefixes:
+            if path.startswith(prefix):
+                return path[len(prefix) - 1:]
+            if path == prefix[:-1]:
+                return ''
+        return path
+
+    def accepts_dir(self, dirpath, root=None):
+        """
+        Returns False if the directory (and everything below it) should be
+        skipped. root is the directory walked from, if known.
+        """
+        dirpath = self._relative(dirpath, root)
+        if not dirpath:
+            return True
+        if os.path.basename(dirpath) in self.ignored_dirs:
+            return False
+        return not _matches(self._exclude, dirpath, is_dir=True)
+
+    def accepts_file(self, filepath, root=None):
+        """
+        Returns True if the file should be watched. Unlike walks, native
+        backends report files at any depth, so every directory of the path
+        (below its root) is checked against ignored_dirs.
+        """
+        filepath = self._relative(filepath, root)
+        parts = filepath.replace('\\', '/').split('/')
+        if not self.ignored_dirs.isdisjoint(parts[:-1]):
+            return False
+        if _matches(self._exclude, filepath):
+            return False
+        if self.include:
+            return _matches(self._include, filepath)
+        return True
+
+    def __eq__(self, other):
+        if not isinstance(other, PathFilter):
+            return NotImplemented
+        return (self.include, self.exclude, self.ignored_dirs) == \
+            (other.include, other.exclude, other.ignored_dirs)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __repr__(self):
+        return "<PathFilter include=%r exclude=%r ignored_dirs=%r>" % (
+            self.include, self.exclude, sorted(self.ignored_dirs))
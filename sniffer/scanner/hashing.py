@@ -0,0 +1,71 @@
+"""
+Content digests used to tell real modifications apart from files that were
+only touched or rewritten with identical bytes (branch switches, formatters,
+build tools restamping files).
+"""
+import hashlib
+
+__all__ = ['ContentHashCache', 'file_digest']
+
+BUFFER_SIZE = 1024 * 1024
+
+
+def file_digest(filepath):
+    """
+    Returns the blake2b digest of a file's content, read in fixed size
+    chunks into a reused buffer.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    buf = bytearray(BUFFER_SIZE)
+    view = memoryview(buf)
+    with open(filepath, 'rb', buffering=0) as handle:
+        while True:
+            size = handle.readinto(buf)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.digest()
+
+
+class ContentHashCache(object):
+    """
+    Remembers the digest of each file along with the (mtime_ns, size, inode)
+    signature it was computed for, so a file is only hashed again once its
+    signature changes.
+    """
+    def __init__(self):
+        self._digests = {}
+        self.hashed = 0
+
+    def digest(self, filepath, signature):
+        """
+        Returns the digest of filepath at the given signature, hashing the
+        file only if the cached digest is for another signature. Returns None
+        if the file can't be read.
+        """
+        cached = self._digests.get(filepath)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        try:
+            value = file_digest(filepath)
+        except (OSError, IOError):
+            self._digests.pop(filepath, None)
+            return None
+        self.hashed += 1
+        self._digests[filepath] = (signature, value)
+        return value
+
+    def changed(self, filepath, signature):
+        """
+        Returns False only if filepath is known to have had the same content
+        before its signature moved to the given one. Files seen for the first
+        time count as changed.
+        """
+        previous = self._digests.get(filepath)
+        if previous is not None and previous[0] == signature:
+            return False
+        current = self.digest(filepath, signature)
+        return previous is None or current is None or previous[1] != current
+
+    def forget(self, filepath):
+        self._digests.pop(filepath, None)
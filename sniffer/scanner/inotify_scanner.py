@@ -0,0 +1,309 @@
+"""
+Scanner built on Linux's inotify API, called through ctypes.
+
+Unlike the pyinotify scanner, this needs no third-party library. Events are
+read in bulk from a non-blocking file descriptor, directories are watched and
+unwatched as they come and go, and a queue overflow falls back to a full
+rescan so no change is lost.
+"""
+from __future__ import absolute_import
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import collections.abc
+
+from .base import PollingScanner
+
+if not sys.platform.startswith('linux'):
+    raise ImportError("inotify is only available on Linux")
+
+_libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                    use_errno=True)
+try:
+    _inotify_init1 = _libc.inotify_init1
+    _inotify_add_watch = _libc.inotify_add_watch
+    _inotify_rm_watch = _libc.inotify_rm_watch
+except AttributeError:
+    raise ImportError("libc doesn't provide inotify")
+_inotify_init1.argtypes = [ctypes.c_int]
+_inotify_init1.restype = ctypes.c_int
+_inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+_inotify_add_watch.restype = ctypes.c_int
+_inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+_inotify_rm_watch.restype = ctypes.c_int
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+              IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF |
+              IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len (then the name)
+BUFFER_SIZE = 1024 * 1024
+
+
+def parse_events(data):
+    """
+    Yields (wd, mask, cookie, name) for each inotify_event record in data.
+    """
+    offset, size = 0, len(data)
+    while offset + _EVENT.size <= size:
+        wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+        offset += _EVENT.size
+        name = data[offset:offset + length].rstrip(b'\0')
+        offset += length
+        yield wd, mask, cookie, os.fsdecode(name)
+
+
+class INotifyScanner(PollingScanner):
+    """
+    Scanner that uses inotify through ctypes for notification events.
+
+    It keeps the polling scanner's watch list (and its snapshot support),
+    but only walks the tree at startup and after an event queue overflow.
+    """
+    def __init__(self, *args, **kwargs):
+        self._fd = None
+        super(INotifyScanner, self).__init__(*args, **kwargs)
+        self._wds = {}    # watch descriptor -> directory
+        self._dirs_watched = {}  # directory -> watch descriptor
+        self.overflows = 0
+
+    def __del__(self):
+        self.close()
+
+    def open(self):
+        """Creates the inotify instance and watches the paths."""
+        if self._fd is not None:
+            return
+        fd = _inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, "inotify_init1: %s" % os.strerror(err))
+        self._fd = fd
+        for path in self.paths:
+            self._add_watches(path)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._wds, self._dirs_watched = {}, {}
+
+    def fileno(self):
+        return self._fd
+
+    def _add_watch(self, dirpath):
+        wd = _inotify_add_watch(self._fd, os.fsencode(dirpath), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                self.log("Out of inotify watches, raise "
+                         "fs.inotify.max_user_watches:", dirpath)
+            elif err not in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                self.log("inotify_add_watch failed:", dirpath,
+                         os.strerror(err))
+            return False
+        self._wds[wd] = dirpath
+        self._dirs_watched[dirpath] = wd
+        return True
+
+    def _add_watches(self, path):
+        """
+        Watches path and every directory below it that the path filter
+        accepts. Returns the valid files found along the way.
+        """
+        files = []
+        stack = [path]
+        while stack:
+            dirpath = stack.pop()
+            if dirpath in self._dirs_watched or not self._add_watch(dirpath):
+                continue
+            try:
+                entries = os.scandir(dirpath)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink() and \
+                                    self.path_filter.accepts_dir(entry.path):
+                                stack.append(entry.path)
+                        elif self.is_valid_type(entry.path):
+                            files.append(entry.path)
+                    except OSError:
+                        continue
+        return files
+
+    def _remove_watches(self, dirpath):
+        """
+        Stops watching dirpath and the directories below it, firing deleted
+        events for the files known there.
+        """
+        prefix = dirpath + os.sep
+        for path in list(self._dirs_watched):
+            if path == dirpath or path.startswith(prefix):
+                wd = self._dirs_watched.pop(path)
+                self._wds.pop(wd, None)
+                _inotify_rm_watch(self._fd, wd)  # fails once already gone
+        for filepath in self._watched_files.under(dirpath):
+            self._file_removed(filepath)
+
+    def _file_changed(self, filepath):
+        """Fires created or modified if filepath's signature moved."""
+        signature = self._get_signature(filepath)
+        if signature is None:
+            return
+        previous = self._watched_files.get(filepath)
+        if previous == signature:
+            return
+        self._watched_files[filepath] = signature
+        if previous is None:
+            if self._hashes is not None:
+                self._hashes.digest(filepath, signature)
+            self._trigger('created', filepath)
+        elif self._content_changed(filepath, signature):
+            self._trigger('modified', filepath)
+        else:
+            self._report_suppressed(1)
+
+    def _file_removed(self, filepath):
+        """Fires deleted if filepath was known and is gone."""
+        if filepath not in self._watched_files or os.path.exists(filepath):
+            return
+        del self._watched_files[filepath]
+        self._decisions.pop(filepath, None)
+        if self._hashes is not None:
+            self._hashes.forget(filepath)
+        self._trigger('deleted', filepath)
+
+    def read_events(self):
+        """
+        Reads every pending event without blocking.
+        Returns a list of (wd, mask, cookie, name).
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self._fd, BUFFER_SIZE)
+            except BlockingIOError:
+                break
+            except InterruptedError:
+                continue
+            if not data:
+                break
+            events.extend(parse_events(data))
+        return events
+
+    def process_events(self, events):
+        """
+        Turns raw inotify events into scanner events.
+        Returns True if any event was processed.
+        """
+        self.metrics.count('inotify_events', len(events))
+        for wd, mask, cookie, name in events:
+            if mask & IN_Q_OVERFLOW:
+                self.rescan()
+                continue
+            if mask & IN_IGNORED:
+                dirpath = self._wds.pop(wd, None)
+                if dirpath is not None and \
+                        self._dirs_watched.get(dirpath) == wd:
+                    del self._dirs_watched[dirpath]
+                continue
+            dirpath = self._wds.get(wd)
+            if dirpath is None or not name:
+                continue  # IN_DELETE_SELF / IN_MOVE_SELF, or a stale watch
+            path = os.path.join(dirpath, name)
+
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._remove_watches(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO) and \
+                        self.path_filter.accepts_dir(path):
+                    # files may land before the new watch is in place
+                    for filepath in self._add_watches(path):
+                        self._file_changed(filepath)
+                continue
+            if not self.is_valid_type(path):
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                self._file_removed(path)
+            else:
+                self._file_changed(path)
+        return bool(events)
+
+    def rescan(self):
+        """
+        Resynchronizes after events were lost: watches directories that
+        appeared meanwhile and diffs the whole tree against the watch list.
+        """
+        self.overflows += 1
+        self.log("inotify queue overflowed, rescanning")
+        for path in self.paths:
+            self._add_watches(path)
+        return self._scan()
+
+    def _wait(self, timeout):
+        """Waits up to timeout seconds for the descriptor to be readable."""
+        try:
+            return bool(select.select([self._fd], [], [], timeout)[0])
+        except InterruptedError:
+            return False
+
+    def loop(self, sleep_time=0.5, callback=None):
+        """
+        Goes into a blocking IO loop. sleep_time is only the interval, in
+        seconds, at which stop() requests are noticed.
+        """
+        self.log("Library of choice: inotify (ctypes)")
+        self._running = True
+        self.trigger_init()
+        self._start()
+        try:
+            while self._running:
+                if self._wait(sleep_time) and \
+                        self.process_events(self.read_events()):
+                    self.checkpoint()
+                    if isinstance(callback, collections.abc.Callable):
+                        callback()
+        finally:
+            self.checkpoint(force=True)
+            self.close()
+
+    def _start(self):
+        self.open()  # watch before walking, so no change slips in between
+        return super(INotifyScanner, self)._start()
+
+    def watch(self, interval=None):
+        """
+        Asynchronous iterator of ChangeSets, woken up by the event loop when
+        the inotify descriptor is readable. interval is ignored.
+        """
+        from .aio import watch_reader
+        return watch_reader(self)
+
+    def step(self):
+        if self._fd is None:
+            self.open()
+            self._scan(trigger=False)
+        if not self._wait(1):
+            return False
+        return self.process_events(self.read_events())
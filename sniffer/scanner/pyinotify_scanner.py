@@ -58,10 +58,14 @@ class PyINotifyScanner(BaseScanner):
             pyinotify.IN_MOVED_TO | pyinotify.IN_MOVED_TO
         for path in self.paths:
             self._watcher.add_watch(path, mask, rec=True, auto_add=True,
-                                    exclude_filter=self.is_valid_type)
+                                    exclude_filter=self._exclude_dir)
 
         return notifier
 
+    def _exclude_dir(self, dirpath):
+        """pyinotify doesn't watch the directories this returns True for."""
+        return not self.path_filter.accepts_dir(dirpath)
+
     def loop(self, sleep_time=None, callback=None):
         self.trigger_init()
         try:
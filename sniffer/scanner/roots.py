@@ -0,0 +1,66 @@
+"""
+Normalizes the directories a scanner watches.
+
+Roots given by a scent (eg - ``watch_paths = ('.', 'src', 'vendor/lib')``)
+can overlap: a root nested in another one, two paths to the same directory
+through a symlink, or a symlink pointing back at one of its ancestors.
+Scanning each of them as given would report the same files several times.
+"""
+import errno
+import os
+
+__all__ = ['normalize_roots']
+
+
+def _covers(outer, inner, path_filter):
+    """
+    Returns True if walking the root outer (an (abspath, realpath) pair)
+    reaches the directory inner. Walks don't follow symlinked directories,
+    so the comparison is made on real paths; the directories in between must
+    be accepted by the path filter, under the names the walk sees them with.
+    """
+    (outer_path, outer_real), (_, inner_real) = outer, inner
+    prefix = os.path.join(outer_real, '')
+    if not inner_real.startswith(prefix):
+        return False
+    dirpath = outer_path
+    for name in inner_real[len(prefix):].split(os.sep):
+        dirpath = os.path.join(dirpath, name)
+        if path_filter is not None and \
+                not path_filter.accepts_dir(dirpath, outer_path):
+            return False
+    return True
+
+
+def normalize_roots(paths, path_filter=None):
+    """
+    Returns the absolute paths of the roots to walk, in the given order,
+    without:
+
+    - roots pointing at a directory already listed (same device and inode),
+    - roots a walk of another root already reaches,
+    - symlinks that can't be resolved because they loop.
+
+    Directories the path filter rejects are not walked, so roots below them
+    are kept. Roots that don't exist (yet) are kept as given.
+    """
+    roots, seen = [], set()
+    for path in paths:
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            if e.errno == errno.ELOOP:
+                continue
+            st = None
+        if st is not None:
+            key = (st.st_dev, st.st_ino)
+            if key in seen:
+                continue
+            seen.add(key)
+        elif path in [p for p, real in roots]:
+            continue
+        roots.append((path, os.path.realpath(path)))
+    return [root[0] for root in roots
+            if not any(other is not root and _covers(other, root, path_filter)
+                       for other in roots)]
@@ -0,0 +1,111 @@
+"""
+On-disk snapshot of a scanner's watch list.
+
+Lets the PollingScanner start warm and notice files that changed while
+sniffer was not running. The file holds a path table followed by packed
+arrays, instead of one record per file:
+
+  header     magic, byte order, file count, directory count, key length
+  key        utf-8 string identifying what was scanned (paths, validators)
+  paths      zlib compressed, NUL separated: files first, then directories
+  columns    file mtime_ns, size and inode; directory mtime_ns, listed_at_ns
+"""
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+__all__ = ['SnapshotError', 'save', 'load']
+
+MAGIC = b'SNIFSNP1'
+HEADER = struct.Struct('<8sBIII')
+_BYTEORDER = {'little': 0, 'big': 1}
+
+
+class SnapshotError(ValueError):
+    "Raised when a snapshot file cannot be decoded."
+
+
+def _encode(path):
+    return path.encode('utf-8', 'surrogateescape')
+
+
+def _decode(data):
+    return data.decode('utf-8', 'surrogateescape')
+
+
+def save(filename, files, dirs=None, key=''):
+    """
+    Writes a snapshot atomically.
+
+    ``files`` {filepath: (mtime_ns, size, inode)} (or a FileTable)
+    ``dirs``  {dirpath: (mtime_ns, listed_at_ns)}, optional.
+    ``key``   String stored alongside, handed back by load().
+    """
+    dirs = dirs or {}
+    items, dirpaths = sorted(files.items()), sorted(dirs)
+    filepaths = [p for p, signature in items]
+    table = zlib.compress(b'\0'.join(_encode(p) for p in filepaths + dirpaths))
+    columns = [
+        array('q', [signature[0] for p, signature in items]),
+        array('q', [signature[1] for p, signature in items]),
+        array('Q', [signature[2] for p, signature in items]),
+        array('q', [dirs[p][0] for p in dirpaths]),
+        array('q', [dirs[p][1] for p in dirpaths]),
+    ]
+    key = _encode(key)
+
+    tmpname = filename + '.tmp'
+    with open(tmpname, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, _BYTEORDER[sys.byteorder],
+                                 len(filepaths), len(dirpaths), len(key)))
+        handle.write(key)
+        handle.write(struct.pack('<I', len(table)))
+        handle.write(table)
+        for column in columns:
+            column.tofile(handle)
+    os.replace(tmpname, filename)
+
+
+def load(filename):
+    """
+    Reads a snapshot written by save().
+    Returns (files, dirs, key). Raises SnapshotError if the file is corrupt.
+    """
+    with open(filename, 'rb') as handle:
+        data = handle.read()
+    try:
+        magic, byteorder, nfiles, ndirs, keylen = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise SnapshotError("%s is not a sniffer snapshot" % filename)
+        offset = HEADER.size
+        key = _decode(data[offset:offset + keylen])
+        offset += keylen
+        tablelen, = struct.unpack_from('<I', data, offset)
+        offset += 4
+        table = zlib.decompress(data[offset:offset + tablelen])
+        offset += tablelen
+
+        columns = []
+        for typecode, count in (('q', nfiles), ('q', nfiles), ('Q', nfiles),
+                                ('q', ndirs), ('q', ndirs)):
+            column = array(typecode)
+            end = offset + count * column.itemsize
+            column.frombytes(data[offset:end])
+            if len(column) != count:
+                raise SnapshotError("%s is truncated" % filename)
+            if byteorder != _BYTEORDER[sys.byteorder]:
+                column.byteswap()
+            columns.append(column)
+            offset = end
+    except (struct.error, zlib.error) as e:
+        raise SnapshotError("%s is corrupt: %s" % (filename, e))
+
+    paths = [_decode(p) for p in table.split(b'\0')] if table else []
+    if len(paths) != nfiles + ndirs:
+        raise SnapshotError("%s has a mismatched path table" % filename)
+    mtimes, sizes, inodes, dir_mtimes, dir_listed = columns
+    files = dict(zip(paths[:nfiles], zip(mtimes, sizes, inodes)))
+    dirs = dict(zip(paths[nfiles:], zip(dir_mtimes, dir_listed)))
+    return files, dirs, key
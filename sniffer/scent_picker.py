@@ -2,10 +2,25 @@
 Loads a `scent.py` configuration file for sniffer and extracts the values there
 """
 from __future__ import print_function
-g = globals().copy()
+import functools
+import importlib.util
+import marshal
 import os
 import sys
+import threading
+import types
 import termstyle
+from .api import Wrapper
+from .changes import ChangeSet
+from .scanner.filters import DEFAULT_IGNORED_DIRS, PathFilter
+
+
+def _call(runner, args, changes):
+    """Calls a runnable, with the changes if it asked for them."""
+    if getattr(runner, 'wants_changes', False):
+        return runner(*args, changes=changes if changes is not None
+                      else ChangeSet())
+    return runner(*args)
 
 
 class ScentModule(object):
@@ -15,6 +30,7 @@ class ScentModule(object):
         self.validators = []
         self.runners = []
         self.runner_name = None
+        self.failed_runners = ()
         for name in dir(self.mod):
             obj = getattr(self.mod, name)
             type = getattr(obj, 'scent_api_type', None)
@@ -26,6 +42,10 @@ class ScentModule(object):
         self.validators = tuple(self.validators)
 
     def reload(self):
+        """
+        Runs the scent file again. Returns the new ScentModule, or this one
+        if the file fails to load.
+        """
         try:
             return load_file(self.filename)
         except Exception:
@@ -35,11 +55,29 @@ class ScentModule(object):
             print("Still using previously valid Scent.")
             return self
 
-    def run(self, args):
+    def run(self, args, runners=None, changes=None):
+        """
+        Calls the runnables (or the given ones) in turn, stopping at the first
+        one failing. With ``parallel_runnables``, they run at once in forked
+        processes instead, if this process has no other thread (forking
+        copies the locks other threads hold). The names of the failing ones
+        are kept in ``failed_runners``. Runnables asking for them get the
+        changes (a ChangeSet).
+        """
+        if runners is None:
+            runners = self.get_runners()
+        if self.parallel and len(runners) > 1 and hasattr(os, 'fork'):
+            if threading.active_count() == 1:
+                return self.run_parallel(args, runners, changes)
+            print("Running the runnables in turn: this process has threads "
+                  "running, parallel_runnables needs a forked run.")
+        self.failed_runners = ()
         try:
-            for r in self.get_runners():
-                if not r(*args):
+            for r in runners:
+                self.failed_runners = (r.__name__,)
+                if not _call(r, args, changes):
                     return False
+            self.failed_runners = ()
             return True
         except Exception:
             import traceback
@@ -47,9 +85,66 @@ class ScentModule(object):
             print()
             return False
 
+    def run_parallel(self, args, runners, changes=None):
+        """
+        Calls every runnable at once, each in a forked process. Their output
+        is printed runnable by runnable. Returns True if they all passed.
+        """
+        from .forkserver import run_forked
+        failed = []
+        calls = [functools.partial(_call, r, args, changes) for r in runners]
+        results = run_forked(calls)
+        for r, (passed, output, elapsed) in zip(runners, results):
+            if output:
+                print(output, end='' if output.endswith('\n') else '\n')
+            print("%s %s in %.2fs" % (r.__name__,
+                                      "passed" if passed else "FAILED",
+                                      elapsed))
+            if not passed:
+                failed.append(r.__name__)
+        self.failed_runners = tuple(failed)
+        return not failed
+
+    def keep_unchanged(self, old):
+        """
+        Replaces the validators and runnables identical to the ones of the
+        old ScentModule (same code, defaults and referenced globals) by the
+        old objects, so scanners holding them keep their cached decisions.
+        Returns the names of the validators and of the runnables that were
+        added, changed or removed.
+        """
+        changed = []
+        for attr in ('validators', 'runners'):
+            previous = dict((_fingerprint(f), f) for f in getattr(old, attr))
+            kept = []
+            for func in getattr(self, attr):
+                func = previous.pop(_fingerprint(func), func)
+                if func not in getattr(old, attr):
+                    changed.append(func.__name__)
+                kept.append(func)
+            changed.extend(f.__name__ for f in previous.values())
+            setattr(self, attr, tuple(kept))
+        return sorted(set(changed))
+
     def set_runner(self, runner_name):
         self.runner_name = runner_name
 
+    def runners_for(self, paths):
+        """
+        Returns the runnables that the select_runnable validators pick for
+        the given paths, or None if no validator selects runnables.
+        """
+        selecting = [v for v in self.validators if hasattr(v, 'runnable')]
+        if not selecting:
+            return None
+        names = set()
+        for path in paths:
+            for validator in selecting:
+                if validator(path):
+                    names.add(validator.runnable)
+                    break
+        return tuple(r for r in self.runners if r.__name__ in names)
+
     def get_runners(self):
         if self.runner_name:
             return tuple(filter(
@@ -78,17 +173,122 @@ class ScentModule(object):
     def watch_paths(self):
         return getattr(self.mod, 'watch_paths', ('.',))
 
+    @property
+    def path_filter(self):
+        return PathFilter(
+            include=getattr(self.mod, 'include_patterns', ()),
+            exclude=getattr(self.mod, 'exclude_patterns', ()),
+            ignored_dirs=DEFAULT_IGNORED_DIRS +
+            tuple(getattr(self.mod, 'ignored_dirs', ())),
+        )
+
+    @property
+    def scanner_options(self):
+        return getattr(self.mod, 'scanner_options', {})
+
+    @property
+    def parallel(self):
+        return getattr(self.mod, 'parallel_runnables', False)
+
+    @property
+    def preload_modules(self):
+        return getattr(self.mod, 'preload_modules', ())
+
+
+def _fingerprint(obj, seen=None):
+    """
+    Returns a value equal for functions behaving the same: same code,
+    defaults, closure and same values for the globals they use
+    (fingerprinted in turn for functions). Validators and runnables also
+    compare their sniffer.api attributes. Other values are compared by repr.
+    """
+    seen = seen if seen is not None else set()
+    if isinstance(obj, Wrapper):
+        return (obj.scent_api_type, getattr(obj, 'runnable', None),
+                getattr(obj, 'wants_changes', None),
+                _fingerprint(obj.func, seen))
+    if not isinstance(obj, types.FunctionType):
+        if isinstance(obj, types.ModuleType):
+            return obj.__name__
+        if isinstance(obj, type):  # new class objects when defined by scent
+            return id(obj)
+        try:
+            return repr(obj)
+        except Exception:
+            return id(obj)
+    if obj.__code__ in seen:
+        return obj.__qualname__
+    seen.add(obj.__code__)
+
+    names, codes = set(), [obj.__code__]
+    while codes:
+        code = codes.pop()
+        names.update(code.co_names)
+        codes.extend(c for c in code.co_consts
+                     if isinstance(c, types.CodeType))
+    used = tuple((name, _fingerprint(obj.__globals__[name], seen))
+                 for name in sorted(names) if name in obj.__globals__)
+    cells = []
+    for cell in obj.__closure__ or ():
+        try:
+            cells.append(_fingerprint(cell.cell_contents, seen))
+        except ValueError:  # empty cell
+            cells.append(None)
+    return (obj.__qualname__, obj.__code__, repr(obj.__defaults__),
+            repr(obj.__kwdefaults__), tuple(cells), used)
+
+
+def _compile(filename):
+    """
+    Returns the code object of a Python file. The bytecode is cached in
+    __pycache__ as a hash checked pyc (PEP 552): it's reused as long as the
+    source hashes the same, regardless of timestamps.
+    """
+    with open(filename, 'rb') as handle:
+        source = handle.read()
+    source_hash = importlib.util.source_hash(source)
+    cache = importlib.util.cache_from_source(filename)
+    header = importlib.util.MAGIC_NUMBER + (3).to_bytes(4, 'little') + \
+        source_hash
+    try:
+        with open(cache, 'rb') as handle:
+            data = handle.read()
+        if data.startswith(header):
+            return marshal.loads(data[len(header):])
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+    code = compile(source, filename, 'exec', dont_inherit=True)
+    if not sys.dont_write_bytecode:
+        try:
+            if not os.path.isdir(os.path.dirname(cache)):
+                os.makedirs(os.path.dirname(cache))
+            tmp = '%s.%d.tmp' % (cache, os.getpid())
+            with open(tmp, 'wb') as handle:
+                handle.write(header + marshal.dumps(code))
+            os.replace(tmp, cache)
+        except OSError:
+            pass
+    return code
+
 
 def load_file(filename):
     "Runs the given scent.py file."
     mod_name = '.'.join(os.path.basename(filename).split('.')[:-1])
     mod_path = os.path.dirname(filename)
 
-    if mod_name in sys.modules:
-        del sys.modules[mod_name]
-    if mod_path not in set(sys.modules.keys()):
+    # so the scent can import its neighbours
+    if mod_path not in sys.path:
         sys.path.insert(0, mod_path)
-    return ScentModule(__import__(mod_name, g, g), filename)
+    code = _compile(filename)
+    mod = types.ModuleType(mod_name)
+    mod.__file__ = filename
+    sys.modules[mod_name] = mod
+    try:
+        exec(code, mod.__dict__)
+    except BaseException:
+        del sys.modules[mod_name]
+        raise
+    return ScentModule(mod, filename)
 
 
 def exec_from_dir(dirname=None, scent="scent.py"):
@@ -0,0 +1,151 @@
+"""
+Runs jobs (test runs, scent reloads) on background threads, apart from the
+threads watching files.
+
+Jobs are named. Submitting a job whose name is already pending merges its
+changes into the pending one, so however many batches arrive during a long
+run, at most one run of each job is waiting, with the union of their
+changes.
+"""
+import itertools
+import threading
+
+from .changes import ChangeSet
+
+__all__ = ['RunScheduler']
+
+
+class _Job(object):
+    def __init__(self, name, func, changes, priority, order):
+        self.name = name
+        self.func = func
+        self.changes = changes
+        self.priority = priority
+        self.order = order
+
+
+class RunScheduler(object):
+    """
+    Runs submitted jobs on up to ``max_concurrency`` worker threads.
+
+    Pending jobs start by priority (lowest first), then in submission order.
+    A job never runs concurrently with itself. ``interrupt(name)``, if
+    given, is called when changes are submitted for a job that is running.
+    """
+    def __init__(self, max_concurrency=1, interrupt=None):
+        self.max_concurrency = max_concurrency
+        self._interrupt = interrupt
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._running = set()
+        self._order = itertools.count()
+        self._threads = []
+        self._stopped = False
+
+    def submit(self, name, func, changes=None, priority=10, older=False):
+        """
+        Schedules ``func(changes)`` under name, merging changes into the
+        pending job of that name, if any. older=True puts the changes before
+        the pending ones (eg - for a job that was cut short).
+        """
+        changes = changes if changes is not None else ChangeSet()
+        with self._cond:
+            if self._stopped:
+                return
+            job = self._pending.get(name)
+            if job is None:
+                merged = ChangeSet()
+                merged.update(changes)
+                self._pending[name] = _Job(name, func, merged, priority,
+                                           next(self._order))
+            else:
+                if older:
+                    merged = ChangeSet()
+                    merged.update(changes)
+                    merged.update(job.changes)
+                    job.changes = merged
+                else:
+                    job.changes.update(changes)
+                job.func = func
+                job.priority = min(job.priority, priority)
+            running = name in self._running
+            self._cond.notify_all()
+        if running and not older and self._interrupt is not None:
+            self._interrupt(name)
+
+    @property
+    def pending(self):
+        """Names of the pending jobs."""
+        with self._cond:
+            return set(self._pending)
+
+    @property
+    def running(self):
+        """Names of the running jobs."""
+        with self._cond:
+            return set(self._running)
+
+    def start(self):
+        """Starts the worker threads."""
+        with self._cond:
+            if self._threads or self._stopped:
+                return
+            for index in range(self.max_concurrency):
+                thread = threading.Thread(target=self._worker,
+                                          name='sniffer-runner-%d' % index)
+                thread.daemon = True
+                self._threads.append(thread)
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Drops the pending jobs and stops the workers once their current job
+        is done, waiting up to timeout seconds for that (0 to not wait).
+        """
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify_all()
+        if timeout != 0:
+            current = threading.current_thread()
+            for thread in self._threads:
+                if thread is not current:
+                    thread.join(timeout)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until no job is pending or running. Returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._pending and not self._running, timeout)
+
+    def _next_job(self):
+        """Returns the job to run next, or None. Called with the lock held."""
+        ready = [job for name, job in self._pending.items()
+                 if name not in self._running]
+        if not ready:
+            return None
+        job = min(ready, key=lambda j: (j.priority, j.order))
+        del self._pending[job.name]
+        self._running.add(job.name)
+        return job
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopped:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+            try:
+                job.func(job.changes)
+            finally:
+                with self._cond:
+                    self._running.discard(job.name)
+                    self._cond.notify_all()
@@ -0,0 +1,322 @@
+"""
+Runs nose tests in parallel worker processes.
+
+The tests to run are grouped by test module and spread over the workers
+(longest first, each to the least loaded worker) using the durations the
+modules took in previous runs. Modules, not single tests, are the unit so
+that module and class fixtures run once. Each worker is a separate nose
+process; its report is printed as soon as it finishes.
+"""
+from __future__ import print_function
+import heapq
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .coverage_db import test_name
+
+__all__ = ['DurationHistory', 'ShardedRun', 'balance', 'collect',
+           'nose_options']
+
+# what worker processes run, with the report file, the file listing the
+# tests to run and nose's options as argv
+WORKER = ("import sys; from sniffer.sharding import worker; "
+          "sys.exit(0 if worker(sys.argv[1], sys.argv[2], sys.argv[3:]) "
+          "else 1)")
+# what the collecting process runs, with the same argv
+COLLECTOR = ("import sys; from sniffer.sharding import collector; "
+             "sys.exit(0 if collector(sys.argv[1], sys.argv[2:]) else 1)")
+
+
+def _worker_env():
+    """Returns the environment of worker processes, with our sys.path."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p or os.curdir for p in sys.path)
+    return env
+
+
+def hooks_plugin(output_stream=None, name='sniffer-hooks', **hooks):
+    """
+    Returns a nose plugin calling the given hooks (eg - startTest=func).
+    nose keeps one plugin per name, so plugins used together need their own.
+    """
+    from nose.plugins import Plugin
+
+    class Hooks(Plugin):
+        name = 'sniffer-hooks'
+        enabled = True
+
+        def options(self, parser, env):
+            pass
+
+        def configure(self, options, conf):
+            self.conf = conf
+
+        def setOutputStream(self, stream):
+            return output_stream
+
+    plugin = Hooks()
+    plugin.name = name
+    for hook_name, hook in hooks.items():
+        setattr(plugin, hook_name, hook)
+    return plugin
+
+
+def nose_options(args):
+    """
+    Returns nose's arguments without the tests (or directories) to run.
+    """
+    from nose.config import Config
+    from nose.plugins.manager import DefaultPluginManager
+    parser = Config(plugins=DefaultPluginManager()).getParser()
+    names = parser.parse_args(list(args))[1]
+    options = list(args)
+    for name in names:
+        options.remove(name)
+    return options
+
+
+class _NullStream(object):
+    def write(self, *args):
+        pass
+
+    def writeln(self, *args):
+        pass
+
+    def flush(self):
+        pass
+
+
+def collect(argv):
+    """
+    Returns the names (nose addresses) of the tests nose would run for argv,
+    without running them, or None if nose failed to collect them.
+    Collecting imports every test module, so it happens in a separate
+    process, like the runs.
+    """
+    report = _temp_file('sniffer-collect-')
+    try:
+        process = subprocess.Popen(
+            [sys.executable, '-c', COLLECTOR, report] + list(argv[1:]),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            env=_worker_env())
+        output = process.communicate()[0].decode('utf-8', 'replace')
+        names = None
+        if process.returncode == 0:
+            try:
+                with open(report) as handle:
+                    names = json.load(handle)
+            except (IOError, OSError, ValueError):
+                pass
+        if names is None:
+            print(output, end='' if output.endswith('\n') else '\n')
+            print("Failed to collect the tests.")
+        return names
+    finally:
+        os.remove(report)
+
+
+def collector(report, args):
+    """
+    Collects the tests nose would run for args, writing their names into
+    the report file if nose collected them all. Returns nose's result.
+    """
+    import nose
+    names = []
+
+    def start_test(test):
+        name = test_name(test)
+        if name is not None:
+            names.append(name)
+    collected = nose.run(argv=['nosetests'] + list(args) + ['--collect-only'],
+                         addplugins=[hooks_plugin(_NullStream(),
+                                                  startTest=start_test)])
+    if collected:
+        with open(report, 'w') as handle:
+            json.dump(names, handle)
+    return collected
+
+
+def _temp_file(prefix, data=None):
+    """
+    Returns the name of a new JSON temporary file, holding data if given.
+    """
+    handle, filename = tempfile.mkstemp(prefix=prefix, suffix='.json')
+    with os.fdopen(handle, 'w') as handle:
+        if data is not None:
+            json.dump(data, handle)
+    return filename
+
+
+def test_module(name):
+    """Returns the file of a test name (``path/to/test.py:Class.test``)."""
+    return name.partition(':')[0]
+
+
+def balance(names, durations, jobs):
+    """
+    Splits test names into at most jobs lists of similar total duration,
+    keeping the tests of a module together. durations maps test modules to
+    seconds; unknown modules are assumed to take the average.
+    """
+    modules = {}
+    for name in names:
+        modules.setdefault(test_module(name), []).append(name)
+    known = [durations[m] for m in modules if m in durations]
+    default = sum(known) / len(known) if known else 1.0
+    shards = [(0.0, index, []) for index in range(min(jobs, len(modules)))]
+    for module in sorted(modules, key=lambda m: (-durations.get(m, default),
+                                                 m)):
+        total, index, shard = heapq.heappop(shards)
+        shard.extend(modules[module])
+        heapq.heappush(shards, (total + durations.get(module, default),
+                                index, shard))
+    return [shard for total, index, shard in sorted(shards,
+                                                    key=lambda s: s[1])]
+
+
+class DurationHistory(object):
+    """
+    Seconds each test module took last time it ran, kept in a JSON file.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.durations = {}
+        try:
+            with open(filename) as handle:
+                self.durations = dict(json.load(handle))
+        except (IOError, OSError, ValueError, TypeError):
+            pass
+
+    def update(self, durations):
+        self.durations.update(durations)
+
+    def prune(self, modules):
+        """Forgets the given test modules (eg - deleted ones)."""
+        for module in modules:
+            self.durations.pop(module, None)
+
+    def save(self):
+        dirname = os.path.dirname(self.filename)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w') as handle:
+            json.dump(self.durations, handle, indent=0, sort_keys=True)
+        os.replace(tmp, self.filename)
+
+
+class ShardedRun(object):
+    """
+    Runs tests over ``jobs`` nose worker processes.
+
+    ``argv``    nose's arguments: the program name, options and, possibly,
+                the tests to run (collected with nose otherwise).
+    ``history`` The DurationHistory balancing the workers, updated with the
+                durations measured.
+    """
+    def __init__(self, jobs, history):
+        self.jobs = jobs
+        self.history = history
+
+    def run(self, argv, names=None):
+        """
+        Runs the given test names, or every test nose collects for argv.
+        Returns True if every worker passed, False if one failed or the
+        tests couldn't be collected.
+        """
+        whole_modules = names is None
+        if whole_modules:
+            names = collect(argv)
+            if names is None:
+                return False
+        options = nose_options(argv[1:])
+        if not names:
+            print("No tests found.")
+            return True
+        shards = balance(names, self.history.durations, self.jobs)
+        started_at = time.time()
+        passed = True
+        with ThreadPoolExecutor(len(shards)) as pool:
+            futures = [pool.submit(self._run_shard, options, shard,
+                                   whole_modules)
+                       for shard in shards]
+            for index, future in enumerate(as_completed(futures)):
+                ok, output, durations, elapsed, count = future.result()
+                passed = passed and ok
+                self.history.update(durations)
+                print(output, end='' if output.endswith('\n') else '\n')
+                print("Worker %d/%d: %d test module(s) %s in %.2fs" % (
+                    index + 1, len(shards), count,
+                    "passed" if ok else "FAILED", elapsed))
+        self.history.save()
+        print("Ran %d worker(s) in %.2fs" % (
+            len(shards), time.time() - started_at))
+        return passed
+
+    def _run_shard(self, options, names, whole_modules=False):
+        """
+        Runs the tests of a shard in a worker process. The tests are given
+        to it in a file, as modules when the shard holds whole modules, so
+        large shards don't overflow its command line.
+        """
+        modules = []
+        for name in names:
+            if test_module(name) not in modules:
+                modules.append(test_module(name))
+        tests = _temp_file('sniffer-tests-',
+                           modules if whole_modules else list(names))
+        report = _temp_file('sniffer-shard-')
+        command = [sys.executable, '-c', WORKER, report, tests] + \
+            list(options)
+        started_at = time.time()
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT,
+                                       env=_worker_env())
+            output = process.communicate()[0].decode('utf-8', 'replace')
+            try:
+                with open(report) as handle:
+                    durations = json.load(handle)
+            except (IOError, OSError, ValueError):
+                durations = {}
+        finally:
+            os.remove(report)
+            os.remove(tests)
+        return (process.returncode == 0, output, durations,
+                time.time() - started_at, len(modules))
+
+
+def worker(report, tests, args):
+    """
+    Runs nose with args over the tests listed in the tests file, writing the
+    seconds each test module took into the report file. Returns nose's
+    result.
+    """
+    import nose
+    with open(tests) as handle:
+        tests = json.load(handle)
+    durations = {}
+    started_at = {}
+
+    def start_test(test):
+        started_at[test] = time.time()
+
+    def stop_test(test):
+        name = test_name(test)
+        if name is not None and test in started_at:
+            module = test_module(name)
+            durations[module] = durations.get(module, 0) + \
+                time.time() - started_at.pop(test)
+
+    def finalize(result):
+        with open(report, 'w') as handle:
+            json.dump(durations, handle)
+    return nose.run(argv=['nosetests'] + list(args) + tests,
+                    addplugins=[hooks_plugin(startTest=start_test,
+                                             stopTest=stop_test,
+                                             finalize=finalize)])
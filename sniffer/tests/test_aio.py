@@ -0,0 +1,92 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase, skipIf
+from ..changes import ChangeSet
+from ..scanner.base import PollingScanner
+
+try:
+    from ..scanner.inotify_scanner import INotifyScanner
+except ImportError:
+    INotifyScanner = None
+
+
+class WatchTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def first_batch(self, scanner):
+        filepath = os.path.join(self.root, 'mod.py')
+
+        async def consume():
+            watcher = scanner.watch(0.01)
+            task = asyncio.ensure_future(watcher.__anext__())
+            await asyncio.sleep(0.1)
+            with open(filepath, 'w') as handle:
+                handle.write('x = 1\n')
+            changes = await asyncio.wait_for(task, 5)
+            await watcher.aclose()
+            return changes
+
+        changes = asyncio.run(consume())
+        self.assertEqual(changes, ChangeSet(created=[filepath]))
+
+    def test_polling_scanner_watch(self):
+        self.first_batch(PollingScanner([self.root], warn_missing_lib=False))
+
+    def test_polling_scanner_stops_when_the_watch_ends(self):
+        os.mkdir(os.path.join(self.root, 'pkg'))
+        scanner = PollingScanner([self.root], warn_missing_lib=False,
+                                 workers=2)
+        self.first_batch(scanner)
+        self.assertIsNone(scanner._pool)
+
+    @skipIf(INotifyScanner is None, "inotify is not available")
+    def test_inotify_scanner_watch(self):
+        scanner = INotifyScanner([self.root])
+        self.addCleanup(scanner.close)
+        self.first_batch(scanner)
+        self.assertIsNone(scanner.fileno())
+
+    @skipIf(INotifyScanner is None, "inotify is not available")
+    def test_inotify_events_are_processed_off_the_loop(self):
+        scanner = INotifyScanner([self.root])
+        self.addCleanup(scanner.close)
+        threads = []
+        process_events = scanner.process_events
+
+        def record(events):
+            threads.append(threading.current_thread())
+            return process_events(events)
+        scanner.process_events = record
+        self.first_batch(scanner)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.main_thread(), threads)
+
+    @skipIf(INotifyScanner is None, "inotify is not available")
+    def test_pending_inotify_events_dont_spin_the_loop(self):
+        scanner = INotifyScanner([self.root])
+        self.addCleanup(scanner.close)
+        filepath = os.path.join(self.root, 'mod.py')
+
+        async def consume():
+            watcher = scanner.watch(0.01)
+            task = asyncio.ensure_future(watcher.__anext__())
+            await asyncio.sleep(0.1)
+            with open(filepath, 'w') as handle:
+                handle.write('x = 1\n')
+            await asyncio.wait_for(task, 5)
+            with open(filepath, 'a') as handle:
+                handle.write('y = 2\n')
+            started_at = time.process_time()
+            await asyncio.sleep(0.5)
+            elapsed = time.process_time() - started_at
+            await watcher.aclose()
+            return elapsed
+
+        self.assertLess(asyncio.run(consume()), 0.2)
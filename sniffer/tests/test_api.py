@@ -1,5 +1,12 @@
+import os
+import shutil
+import tempfile
 from unittest import TestCase
-from ..api import file_validator, select_runnable
+from .. import api
+from ..api import changed_files, file_validator, runnable, select_runnable, \
+    targets_for
+from ..changes import ChangeSet
+from ..scent_picker import ScentModule
 
 
 class SelectRunnableDecorator(TestCase):
@@ -13,3 +20,65 @@ class SelectRunnableDecorator(TestCase):
 
         self.assertEqual(validator.runnable, 'tagged')
 
+
+class RunnableDecorator(TestCase):
+
+    def test_runnables_can_ask_for_the_changes(self):
+        calls = []
+
+        @runnable
+        def plain(*args):
+            calls.append(args)
+            return True
+
+        @runnable(changes=True)
+        def incremental(*args, **kwargs):
+            calls.append((args, kwargs['changes']))
+            return True
+
+        changes = ChangeSet(modified=['a.py'])
+        scent = ScentModule(None, 'scent.py')
+        self.assertTrue(scent.run(('prog',), (plain, incremental), changes))
+        self.assertEqual(calls, [('prog',), (('prog',), changes)])
+
+
+class ChangeHelpers(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def touch(self, *parts):
+        filepath = self.path(*parts)
+        if not os.path.isdir(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+        open(filepath, 'w').close()
+        return filepath
+
+    def test_changed_files_filters_by_extension(self):
+        changes = ChangeSet(created=['b.py'], modified=['a.py', 'c.js'],
+                            deleted=['d.py'])
+        self.assertEqual(changed_files(changes), ['a.py', 'b.py', 'c.js'])
+        self.assertEqual(changed_files(changes, 'py', deleted=True),
+                         ['a.py', 'b.py', 'd.py'])
+
+    def test_targets_for_picks_the_deepest_target(self):
+        targets = [self.path('pkg'), self.path('pkg', 'sub'),
+                   self.path('other')]
+        self.assertEqual(
+            targets_for([self.path('pkg', 'sub', 'a.py'),
+                         self.path('setup.py')], targets),
+            [self.path('pkg', 'sub')])
+
+    def test_test_files_for_maps_modules_to_their_tests(self):
+        test_a = self.touch('tests', 'test_a.py')
+        test_b = self.touch('tests', 'test_b.py')
+        self.touch('tests', 'test_c.py')
+        self.assertEqual(
+            api.test_files_for([self.path('pkg', 'a.py'), test_b,
+                                self.path('pkg', 'd.py'), self.path('a.txt')],
+                               self.root),
+            [test_a, test_b])
@@ -0,0 +1,55 @@
+import threading
+from unittest import TestCase
+from ..batcher import EventBatcher
+from ..changes import ChangeSet
+
+
+class ChangeSetAddTest(TestCase):
+
+    def test_folds_events_per_path(self):
+        changes = ChangeSet()
+        changes.add('created', 'new.py')
+        changes.add('modified', 'new.py')
+        changes.add('created', 'tmp.py')
+        changes.add('deleted', 'tmp.py')
+        changes.add('deleted', 'saved.py')
+        changes.add('created', 'saved.py')
+        changes.add('modified', 'gone.py')
+        changes.add('deleted', 'gone.py')
+
+        self.assertEqual(changes, ChangeSet(created=['new.py'],
+                                            modified=['saved.py'],
+                                            deleted=['gone.py']))
+        self.assertEqual(sorted(changes.timestamps),
+                         ['gone.py', 'new.py', 'saved.py'])
+
+
+class EventBatcherTest(TestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.dispatched = threading.Event()
+        self.batcher = EventBatcher(self.dispatch, quiet=0.05)
+        self.addCleanup(self.batcher.stop)
+
+    def dispatch(self, changes):
+        self.batches.append(changes)
+        self.dispatched.set()
+
+    def test_burst_of_events_is_dispatched_once(self):
+        for i in range(20):
+            self.batcher.modified('a.py')
+        self.batcher.deleted('b.py')
+        self.batcher.created('b.py')
+        self.batcher.start()
+
+        self.assertTrue(self.dispatched.wait(5))
+        self.assertEqual(self.batches, [ChangeSet(modified=['a.py', 'b.py'])])
+
+    def test_max_latency_caps_a_never_settling_batch(self):
+        self.batcher.quiet, self.batcher.max_latency = 10, 0.05
+        self.batcher.init()
+        self.batcher.start()
+
+        self.assertTrue(self.dispatched.wait(5))
+        self.assertEqual(self.batches, [ChangeSet()])
@@ -0,0 +1,91 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+from ..changes import ChangeSet
+from ..coverage_db import CoverageDatabase, LineTracer, MODULE_LEVEL
+
+
+class CoverageDatabaseTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.db = CoverageDatabase(os.path.join(self.root, '.sniffer',
+                                                'coverage.db'))
+        self.addCleanup(self.db.close)
+        self.mod = self.write('mod.py', 'X = 1\n\ndef a():\n    return 1\n\n'
+                              'def b():\n    return 2\n')
+        self.db.begin(full=True)
+        self.db.record(MODULE_LEVEL, [(self.mod, 1), (self.mod, 3),
+                                      (self.mod, 6)])
+        self.db.record('test_mod.py:test_a', [(self.mod, 4)])
+        self.db.record('test_mod.py:test_b', [(self.mod, 7)])
+
+    def write(self, name, content):
+        filepath = os.path.join(self.root, name)
+        with open(filepath, 'w') as handle:
+            handle.write(content)
+        return filepath
+
+    def changes(self, event, *filepaths):
+        changes = ChangeSet()
+        for filepath in filepaths:
+            changes.add(event, filepath)
+        return changes
+
+    def test_selects_tests_running_changed_lines(self):
+        self.write('mod.py', 'X = 1\n\ndef a():\n    return 1\n\n'
+                   'def b():\n    return 3\n')
+        self.assertEqual(self.db.select(self.changes('modified', self.mod)),
+                         ['test_mod.py:test_b'])
+
+    def test_rows_follow_moved_lines(self):
+        self.write('mod.py', '# comment\n# comment\nX = 1\n\ndef a():\n'
+                   '    return 1\n\ndef b():\n    return 2\n')
+        self.db.select(self.changes('modified', self.mod))
+        self.write('mod.py', '# comment\n# comment\nX = 1\n\ndef a():\n'
+                   '    return 0\n\ndef b():\n    return 2\n')
+        self.assertEqual(self.db.select(self.changes('modified', self.mod)),
+                         ['test_mod.py:test_a'])
+
+    def test_module_level_changes_select_every_test_of_the_file(self):
+        self.write('mod.py', 'X = 2\n\ndef a():\n    return 1\n\n'
+                   'def b():\n    return 2\n')
+        self.assertEqual(self.db.select(self.changes('modified', self.mod)),
+                         ['test_mod.py:test_a', 'test_mod.py:test_b'])
+
+    def test_deleted_files_are_pruned(self):
+        os.remove(self.mod)
+        self.assertEqual(self.db.select(self.changes('deleted', self.mod)),
+                         ['test_mod.py:test_a', 'test_mod.py:test_b'])
+        self.assertTrue(self.db.is_empty())
+
+    def test_falls_back_to_everything(self):
+        other = self.write('other.py', '')
+        self.assertEqual(self.db.select(self.changes('created', other)), None)
+        self.assertEqual(self.db.select(ChangeSet()), None)
+        self.db.begin(full=True)
+        self.assertEqual(self.db.select(self.changes('modified', self.mod)),
+                         None)
+
+
+def traced():
+    return os.path.join('a', 'b')
+
+
+class LineTracerTest(TestCase):
+
+    def test_traces_only_files_under_paths(self):
+        tracer = LineTracer([os.path.dirname(__file__)])
+        tracer.start()
+        try:
+            value = traced()
+        finally:
+            tracer.stop()
+        here = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+        files = set(filepath for filepath, line in tracer.take())
+        self.assertEqual(value, os.path.join('a', 'b'))
+        self.assertEqual(files, set([here]))
+        self.assertEqual(sys.gettrace(), None)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase, skipUnless
+from ..failures import FailureHistory
+from ..runner import Sniffer
+from .test_sharding import NOSE_RUNS
+
+FAILING = """
+def test_fails():
+    assert False
+"""
+
+PASSING = """
+import os
+
+
+def test_passes():
+    open(os.path.join(os.path.dirname(__file__), 'ran'), 'w').close()
+"""
+
+
+class FailureHistoryTest(TestCase):
+
+    def test_failures_persist_per_runner(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        filename = os.path.join(root, '.sniffer', 'failures.json')
+        history = FailureHistory(filename)
+        self.assertEqual(history.get('nose'), [])
+        history.set('nose', ['b.py:test_2', 'a.py:T.test', 'b.py:test_1'])
+        history.set('runnables', ['execute'])
+        history.prune(['b.py'])
+        history.save()
+        history = FailureHistory(filename)
+        self.assertEqual(history.get('nose'), ['a.py:T.test'])
+        self.assertEqual(history.get('runnables'), ['execute'])
+        history.set('runnables', [])
+        self.assertEqual(history.failures, {'nose': ['a.py:T.test']})
+
+
+@skipUnless(NOSE_RUNS, "nose can't run on this python")
+class RunFailedFirstTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for name, source in (('test_ff_failing', FAILING),
+                             ('test_ff_passing', PASSING)):
+            with open(os.path.join(self.root, name + '.py'), 'w') as handle:
+                handle.write(source)
+            self.addCleanup(sys.modules.pop, name, None)
+        self.failing = os.path.join(self.root,
+                                    'test_ff_failing.py') + ':test_fails'
+        self.marker = os.path.join(self.root, 'ran')
+        self.sniffer = Sniffer()
+        self.sniffer.state_dir = os.path.join(self.root, '.sniffer')
+        self.sniffer.test_args = (self.root,)
+        self.signaled = []
+        self.sniffer.signal_failure = lambda: self.signaled.append(
+            os.path.exists(self.marker))
+        history = FailureHistory(self.sniffer.state_path('failures.json'))
+        history.set('nose', [self.failing])
+        history.save()
+
+    def failures(self):
+        return FailureHistory(
+            self.sniffer.state_path('failures.json')).get('nose')
+
+    def test_failures_are_signaled_before_the_other_tests_run(self):
+        self.assertFalse(self.sniffer.run_failed_first())
+        self.assertEqual(self.signaled, [False])
+        self.assertTrue(os.path.exists(self.marker))
+        self.assertEqual(self.failures(), [self.failing])
+
+    def test_failed_only_skips_the_other_tests(self):
+        self.sniffer.failed_only = True
+        self.assertFalse(self.sniffer.run_failed_first())
+        self.assertEqual(self.signaled, [False])
+        self.assertFalse(os.path.exists(self.marker))
+        self.assertEqual(self.failures(), [self.failing])
@@ -0,0 +1,88 @@
+import os
+from unittest import TestCase
+from ..changes import ChangeSet
+from ..scanner.filetable import FileTable
+
+
+def path(*parts):
+    return os.path.join(os.sep, 'root', *parts)
+
+
+class FileTableTest(TestCase):
+
+    def setUp(self):
+        self.table = FileTable()
+        self.table.add_dir(path('pkg'), [(path('pkg', 'a.py'), (1, 10, 100)),
+                                         (path('pkg', 'b.py'), (2, 20, 200))])
+        self.table[path('pkg', 'sub', 'c.py')] = (3, 30, 300)
+
+    def test_behaves_like_a_dict(self):
+        table = self.table
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table[path('pkg', 'b.py')], (2, 20, 200))
+        self.assertEqual(table.get(path('pkg', 'x.py')), None)
+        self.assertTrue(path('pkg', 'sub', 'c.py') in table)
+        del table[path('pkg', 'a.py')]
+        self.assertRaises(KeyError, table.__delitem__, path('pkg', 'a.py'))
+        table[path('pkg', 'd.py')] = (4, 40, 400)
+        self.assertEqual(dict(table.items()), {
+            path('pkg', 'b.py'): (2, 20, 200),
+            path('pkg', 'd.py'): (4, 40, 400),
+            path('pkg', 'sub', 'c.py'): (3, 30, 300)})
+        self.assertEqual(sorted(table.under(path('pkg', 'sub'))),
+                         [path('pkg', 'sub', 'c.py')])
+
+    def test_directories_are_dropped_with_their_last_file(self):
+        table = FileTable()
+        for i in range(3):
+            tmp = path('tmp%d' % i)
+            table.add_dir(tmp, [(os.path.join(tmp, 'a.py'), (1, 1, 1))])
+            table.pop(os.path.join(tmp, 'a.py'))
+        table.add_dir(path('empty'), [])
+        self.assertEqual((len(table), len(table._dir_index)), (0, 0))
+        self.assertEqual(len(table._dirs), 1)  # the slot is reused
+        self.assertEqual(table.under(path('tmp2')), [])
+        self.assertFalse(FileTable().diff(table))
+
+    def test_diff(self):
+        new = FileTable([(path('pkg', 'a.py'), (1, 10, 100)),
+                         (path('pkg', 'b.py'), (5, 20, 200)),
+                         (path('other', 'e.py'), (6, 60, 600))])
+        changes = self.table.diff(new)
+        self.assertEqual(changes.created, set([path('other', 'e.py')]))
+        self.assertEqual(changes.modified, set([path('pkg', 'b.py')]))
+        self.assertEqual(changes.deleted, set([path('pkg', 'sub', 'c.py')]))
+
+    def test_update_dir_updates_rows_in_place(self):
+        a, b, d = path('pkg', 'a.py'), path('pkg', 'b.py'), path('pkg', 'd.py')
+        changes = ChangeSet()
+        self.table.update_dir(path('pkg'), [(a, (1, 10, 100)),
+                                            (b, (2, 20, 200))], changes)
+        self.assertFalse(changes)
+        self.assertEqual(len(self.table._mtimes), 3)
+
+        self.table.update_dir(path('pkg'), [(b, (5, 20, 200)),
+                                            (d, (4, 40, 400))], changes)
+        self.assertEqual(changes, ChangeSet(created=[d], modified=[b],
+                                            deleted=[a]))
+        self.assertEqual(len(self.table._mtimes), 4)
+        self.assertEqual(self.table[b], (5, 20, 200))
+        self.assertEqual(len(self.table), 3)
+
+    def test_prune_dirs(self):
+        changes = ChangeSet()
+        self.table.update_dir(path('pkg'), [], changes)
+        self.table.prune_dirs(set([path('pkg')]), changes)
+        self.assertEqual(changes.deleted, set([path('pkg', 'a.py'),
+                                               path('pkg', 'b.py'),
+                                               path('pkg', 'sub', 'c.py')]))
+        self.assertEqual((len(self.table), len(self.table._dir_index)),
+                         (0, 0))
+
+    def test_takes_less_memory_than_a_dict(self):
+        files = dict((path('some', 'deep', 'package', 'mod%d.py' % i),
+                      (1500000000000000000 + i, 1000 + i, 10000000 + i))
+                     for i in range(1000))
+        table = FileTable(files.items())
+        self.assertEqual(dict(table.items()), files)
+        self.assertLess(table.nbytes(), 1000 * 150)
@@ -0,0 +1,37 @@
+from unittest import TestCase
+from ..scanner.filters import PathFilter
+
+
+class PathFilterTest(TestCase):
+
+    def test_default_filter_skips_repository_directories(self):
+        path_filter = PathFilter()
+        self.assertFalse(path_filter.accepts_dir('/src/.git'))
+        self.assertFalse(path_filter.accepts_file('/src/.hg/store/data.py'))
+        self.assertTrue(path_filter.accepts_dir('/src/pkg'))
+        self.assertTrue(path_filter.accepts_file('/src/pkg/mod.py'))
+
+    def test_include_and_exclude_patterns(self):
+        path_filter = PathFilter(include=['*.py', '*.cfg'],
+                                 exclude=['test_*.py', 'build/*'],
+                                 ignored_dirs=['node_modules'])
+        self.assertTrue(path_filter.accepts_file('/src/pkg/mod.py'))
+        self.assertTrue(path_filter.accepts_file('/src/setup.cfg'))
+        self.assertFalse(path_filter.accepts_file('/src/pkg/mod.js'))
+        self.assertFalse(path_filter.accepts_file('/src/pkg/test_mod.py'))
+        self.assertFalse(path_filter.accepts_file('/src/build/lib/mod.py'))
+        self.assertFalse(path_filter.accepts_dir('/src/node_modules'))
+        self.assertFalse(path_filter.accepts_dir('/src/pkg/build'))
+
+    def test_paths_are_matched_from_their_root(self):
+        path_filter = PathFilter(exclude=['build/*'], ignored_dirs=['build'],
+                                 roots=['/home/me/build/proj', '/src'])
+        self.assertTrue(path_filter.accepts_file('/home/me/build/proj/a.py'))
+        self.assertTrue(path_filter.accepts_dir('/home/me/build/proj/pkg'))
+        self.assertTrue(path_filter.accepts_dir('/home/me/build/proj'))
+        self.assertFalse(path_filter.accepts_dir('/home/me/build/proj/build'))
+        self.assertFalse(
+            path_filter.accepts_file('/home/me/build/proj/build/a.py'))
+        self.assertFalse(path_filter.accepts_file('/src/build/a.py'))
+        self.assertTrue(path_filter.accepts_file('/src/pkg/a.py'))
+        self.assertTrue(path_filter.accepts_file('/build/a.py', root='/build'))
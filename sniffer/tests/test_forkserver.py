@@ -0,0 +1,79 @@
+import os
+import signal
+import sys
+import threading
+import time
+import unittest
+from unittest import TestCase
+from ..forkserver import ForkServer, run_forked
+
+
+def check(request):
+    if request.get('exit'):
+        os._exit(request['exit'])
+    if request.get('extra'):
+        return {'passed': 1, 'extra': request['extra']}
+    if request.get('sleep'):
+        time.sleep(request['sleep'])
+    name = request['module']
+    loaded = name in sys.modules
+    __import__(name)
+    return loaded
+
+
+@unittest.skipUnless(ForkServer.available, "needs os.fork")
+class ForkServerTest(TestCase):
+
+    def setUp(self):
+        self.server = ForkServer(check, paths=[os.path.dirname(__file__)],
+                                 freeze=False)
+        self.addCleanup(self.server.stop)
+
+    def test_children_inherit_the_dependencies_of_previous_runs(self):
+        self.assertFalse('wave' in sys.modules)
+        self.assertFalse(self.server.run({'module': 'wave'})['passed'])
+        self.assertTrue(self.server.run({'module': 'wave'})['passed'])
+        self.assertFalse('wave' in sys.modules)
+
+    def test_targets_can_add_to_the_response(self):
+        response = self.server.run({'extra': 'value'})
+        self.assertEqual((response['passed'], response['extra']),
+                         (True, 'value'))
+
+    def test_reports_children_dying_without_a_result(self):
+        response = self.server.run({'exit': 3})
+        self.assertFalse(response['passed'])
+        self.assertTrue('error' in response)
+        self.assertTrue(self.server.run({'module': 'os'})['passed'])
+
+    def test_cancel_kills_the_running_child(self):
+        def cancel():
+            while not self.server.cancel():
+                time.sleep(0.01)
+        thread = threading.Thread(target=cancel)
+        thread.start()
+        started_at = time.time()
+        response = self.server.run({'sleep': 10, 'module': 'os'})
+        thread.join()
+        self.assertLess(time.time() - started_at, 5)
+        self.assertFalse(response['passed'])
+        self.assertEqual(response['signal'], signal.SIGTERM)
+        self.assertFalse(self.server.cancel())
+
+
+def report(text, passed):
+    time.sleep(0.3)
+    print(text)
+    return passed
+
+
+@unittest.skipUnless(ForkServer.available, "needs os.fork")
+class RunForkedTest(TestCase):
+
+    def test_calls_run_at_once_and_report_in_order(self):
+        started_at = time.time()
+        results = list(run_forked([lambda: report('one', True),
+                                   lambda: report('two', False)]))
+        self.assertLess(time.time() - started_at, 0.55)
+        self.assertEqual([(passed, output) for passed, output, _ in results],
+                         [(True, 'one\n'), (False, 'two\n')])
@@ -0,0 +1,106 @@
+import os
+import shutil
+import sys
+import tempfile
+from importlib.util import find_spec
+from unittest import TestCase, skipUnless
+from ..changes import ChangeSet
+from ..impact import ImportGraph, module_name
+from ..runner import Sniffer
+
+
+class ImportGraphTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.init = self.write('pkg/__init__.py', '')
+        self.core = self.write('pkg/core.py', 'x = 1\n')
+        self.util = self.write('pkg/util.py', 'from .core import x\n')
+        self.other = self.write('pkg/other.py', 'y = 2\n')
+        self.test_util = self.write('tests/test_util.py',
+                                    'from pkg import util\n')
+        self.test_other = self.write('tests/test_other.py',
+                                     'import pkg.other\n')
+        self.graph = ImportGraph([self.root])
+
+    def write(self, name, content):
+        filepath = os.path.join(self.root, name)
+        if not os.path.isdir(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+        with open(filepath, 'w') as handle:
+            handle.write(content)
+        return filepath
+
+    def changes(self, event, *filepaths):
+        changes = ChangeSet()
+        for filepath in filepaths:
+            changes.add(event, filepath)
+        return changes
+
+    def test_module_name_follows_packages(self):
+        self.assertEqual(module_name(self.core), 'pkg.core')
+        self.assertEqual(module_name(self.init), 'pkg')
+        self.assertEqual(module_name(self.test_util), 'test_util')
+
+    def test_selects_tests_importing_the_changes_transitively(self):
+        self.assertEqual(
+            self.graph.select(self.changes('modified', self.core)),
+            [self.test_util])
+        self.assertEqual(
+            self.graph.select(self.changes('modified', self.other)),
+            [self.test_other])
+        self.assertEqual(
+            self.graph.select(self.changes('modified', self.init)),
+            [self.test_other, self.test_util])
+
+    def test_graph_follows_edits(self):
+        self.graph.build()
+        self.write('pkg/other.py', 'from pkg.core import x\n')
+        self.assertEqual(
+            self.graph.select(self.changes('modified', self.other)),
+            [self.test_other])
+        self.assertEqual(
+            self.graph.select(self.changes('modified', self.core)),
+            [self.test_other, self.test_util])
+
+        os.remove(self.test_util)
+        self.assertEqual(
+            self.graph.select(self.changes('deleted', self.test_util)), [])
+        self.assertEqual(
+            self.graph.select(self.changes('modified', self.util)), [])
+
+    def test_falls_back_to_everything_when_undecidable(self):
+        readme = self.write('README', 'hi\n')
+        self.assertEqual(
+            self.graph.select(self.changes('modified', readme)), None)
+        self.write('pkg/core.py', 'def broken(:\n')
+        self.assertEqual(
+            self.graph.select(self.changes('modified', self.core)), None)
+        self.assertEqual(self.graph.select(ChangeSet()), None)
+
+    def test_dynamic_imports_are_always_selected(self):
+        dynamic = self.write('tests/test_plugins.py',
+                             'import importlib\n'
+                             'importlib.import_module("pkg.other")\n')
+        self.assertEqual(
+            self.graph.select(self.changes('modified', self.core)),
+            [dynamic, self.test_util])
+
+
+@skipUnless(find_spec('nose'), "nose is not installed")
+class SelectedTestArgumentsTest(TestCase):
+
+    def setUp(self):
+        self.sniffer = Sniffer()
+        self.sniffer.test_args = ('-x', 'tests', '--with-doctest')
+
+    def test_every_test_arg_is_kept_without_a_selection(self):
+        self.assertEqual(self.sniffer.test_arguments(),
+                         [sys.argv[0], '-x', 'tests', '--with-doctest'])
+
+    def test_selected_tests_replace_the_tests_to_run(self):
+        self.sniffer.selected_tests = ['tests/test_a.py']
+        self.assertEqual(self.sniffer.test_arguments(),
+                         [sys.argv[0], '-x', '--with-doctest',
+                          'tests/test_a.py'])
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, skipIf
+
+try:
+    from ..scanner.inotify_scanner import INotifyScanner
+except ImportError:
+    INotifyScanner = None
+
+
+@skipIf(INotifyScanner is None, "inotify is not available")
+class INotifyScannerTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.scanner = INotifyScanner([self.root])
+        self.addCleanup(self.scanner.close)
+        self.events = []
+        for event in ('created', 'modified', 'deleted'):
+            self.scanner.observe(event, self.recorder(event))
+        self.scanner.open()
+
+    def recorder(self, event):
+        def record(filepath):
+            self.events.append((event, filepath))
+        return record
+
+    def test_file_events(self):
+        filepath = os.path.join(self.root, 'mod.py')
+        with open(filepath, 'w') as handle:
+            handle.write('x = 1\n')
+        self.scanner.step()
+        os.utime(filepath, (1, 1))
+        self.scanner.step()
+        os.remove(filepath)
+        self.scanner.step()
+
+        self.assertEqual(self.events, [('created', filepath),
+                                       ('modified', filepath),
+                                       ('deleted', filepath)])
+
+    def test_new_directories_are_watched(self):
+        dirpath = os.path.join(self.root, 'pkg')
+        os.mkdir(dirpath)
+        self.scanner.step()
+        filepath = os.path.join(dirpath, 'mod.py')
+        with open(filepath, 'w') as handle:
+            handle.write('x = 1\n')
+        self.scanner.step()
+
+        self.assertEqual(self.events, [('created', filepath)])
+
+    def test_overflow_rescans(self):
+        filepath = os.path.join(self.root, 'mod.py')
+        with open(filepath, 'w') as handle:
+            handle.write('x = 1\n')
+        self.scanner.process_events([(-1, 0x4000, 0, '')])
+
+        self.assertEqual(self.events, [('created', filepath)])
+        self.assertEqual(self.scanner.overflows, 1)
@@ -0,0 +1,44 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ..metrics import Metrics
+from ..scanner.base import PollingScanner
+
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.metrics = Metrics(
+            jsonl=os.path.join(self.root, 'state', 'profile.jsonl'),
+            prometheus=os.path.join(self.root, 'state', 'metrics.prom'))
+
+    def test_scanner_phases_and_counters(self):
+        for name in ('a.py', 'b.py', 'c.txt'):
+            open(os.path.join(self.root, name), 'w').close()
+        scanner = PollingScanner([self.root], warn_missing_lib=False,
+                                 metrics=self.metrics)
+        scanner._scan()
+        times, counts = self.metrics.totals
+        self.assertEqual(times['scan'][1], 1)
+        self.assertEqual(times['validate'][1], 3)
+        self.assertEqual(counts, {'files_scanned': 2, 'events_fired': 2})
+
+    def test_flush_writes_cycles_and_totals(self):
+        for i in range(2):
+            with self.metrics.span('run'):
+                self.metrics.count('events_fired', 3)
+            self.metrics.flush(changes=i)
+        with open(self.metrics.jsonl) as handle:
+            records = [json.loads(line) for line in handle]
+        self.assertEqual([(r['changes'], r['counters'], r['phases']['run']
+                           ['count']) for r in records],
+                         [(0, {'events_fired': 3}, 1),
+                          (1, {'events_fired': 3}, 1)])
+        with open(self.metrics.prometheus) as handle:
+            lines = handle.read().splitlines()
+        self.assertTrue('sniffer_phase_seconds_count{phase="run"} 2' in lines)
+        self.assertTrue('sniffer_events_fired_total 6' in lines)
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import types
+from unittest import TestCase
+from ..modules_restore_point import ModulesRestorePoint
+
+
+class ModulesRestorePointTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.sys_modules = {'os': os}
+        self.restore_point = ModulesRestorePoint(self.sys_modules)
+        self.load('core', 'X = 1\n')
+        self.load('util', 'from core import X\n')
+        self.load('test_util', 'import util\n')
+        self.load('other', 'import os\n')
+
+    def load(self, name, source):
+        filepath = os.path.join(self.root, name.replace('.', os.sep) + '.py')
+        if not os.path.isdir(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+        with open(filepath, 'w') as handle:
+            handle.write(source)
+        module = types.ModuleType(name)
+        module.__file__ = filepath
+        self.sys_modules[name] = module
+        parent_name, _, attr = name.rpartition('.')
+        if parent_name in self.sys_modules:
+            setattr(self.sys_modules[parent_name], attr, module)
+        return filepath
+
+    def path(self, name):
+        return os.path.join(self.root, name + '.py')
+
+    def test_restore_unloads_everything_since_the_restore_point(self):
+        self.restore_point.restore()
+        self.assertEqual(sorted(self.sys_modules), ['os'])
+
+    def test_restore_unloads_changed_modules_and_their_importers(self):
+        self.restore_point.restore([self.path('core')])
+        self.assertEqual(sorted(self.sys_modules), ['os', 'other'])
+
+    def test_restore_keeps_modules_unrelated_to_the_changes(self):
+        self.restore_point.restore([self.path('test_util')])
+        self.assertEqual(sorted(self.sys_modules),
+                         ['core', 'os', 'other', 'util'])
+        self.restore_point.restore([os.path.join(self.root, 'unknown.py')])
+        self.assertEqual(sorted(self.sys_modules),
+                         ['core', 'os', 'other', 'util'])
+
+    def test_restore_unloads_everything_for_non_python_changes(self):
+        self.restore_point.restore([os.path.join(self.root, 'data.json')])
+        self.assertEqual(sorted(self.sys_modules), ['os'])
+
+    def test_restore_detaches_unloaded_submodules_from_their_package(self):
+        package = types.ModuleType('pkg')
+        package.__file__ = os.path.join(self.root, 'pkg', '__init__.py')
+        self.sys_modules['pkg'] = package
+        self.restore_point.save()
+        self.load('pkg.core', 'X = 1\n')
+        self.load('test_pkg', 'from pkg import core\n')
+
+        self.restore_point.restore([self.load('pkg.core', 'X = 2\n')])
+        self.assertFalse(hasattr(package, 'core'))
+        self.assertNotIn('pkg.core', self.sys_modules)
+        self.assertNotIn('test_pkg', self.sys_modules)
+        self.assertIn('pkg', self.sys_modules)
+
+    def test_restore_unloads_the_submodules_of_unloaded_packages(self):
+        self.load('pkg.mod', 'Y = 1\n')
+        init = os.path.join(self.root, 'pkg', '__init__.py')
+        with open(init, 'w') as handle:
+            handle.write('X = 1\n')
+        package = types.ModuleType('pkg')
+        package.__file__ = init
+        self.sys_modules['pkg'] = package
+        self.load('pkg.sub.deep', 'Z = 1\n')
+        self.load('test_mod', 'import pkg.mod\n')
+
+        self.restore_point.restore([init])
+        self.assertEqual(sorted(self.sys_modules),
+                         ['core', 'os', 'other', 'test_util', 'util'])
@@ -0,0 +1,290 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+from ..changes import ChangeSet
+from ..scanner.base import PollingScanner
+from ..scanner.filters import PathFilter
+from ..scanner.snapshot import load, save
+
+
+class ScannerTestCase(TestCase):
+    scanner_options = {}
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.scanner = PollingScanner([self.root], warn_missing_lib=False,
+                                      **self.scanner_options)
+        self.events = []
+        for event in ('created', 'modified', 'deleted'):
+            self.scanner.observe(event, self.recorder(event))
+
+    def recorder(self, event):
+        def record(filepath):
+            self.events.append((event, filepath))
+        return record
+
+    def write(self, name, content='x = 1\n', mtime=None):
+        filepath = os.path.join(self.root, name)
+        if not os.path.isdir(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+        with open(filepath, 'w') as handle:
+            handle.write(content)
+        if mtime is not None:
+            os.utime(filepath, (mtime, mtime))
+        return filepath
+
+
+class PollingScannerTest(ScannerTestCase):
+
+    def test_scan_fires_created_and_modified_once(self):
+        self.scanner._scan(trigger=False)
+        created = self.write('pkg/mod.py')
+        self.scanner.step()
+        self.assertEqual(self.events, [('created', created)])
+
+        os.utime(created, (1, 1))
+        self.scanner.step()
+        self.scanner.step()
+        self.assertEqual(self.events[1:], [('modified', created)])
+
+    def test_scan_ignores_invalid_types(self):
+        self.scanner._scan(trigger=False)
+        self.write('notes.txt')
+        self.write('.hidden.py')
+        self.scanner.step()
+        self.assertEqual(self.events, [])
+
+    def test_scan_prunes_directories_rejected_by_the_filter(self):
+        self.scanner.set_filter(PathFilter(ignored_dirs=['node_modules']))
+        self.write('node_modules/pkg/index.py')
+        listed = []
+        listdir = self.scanner._listdir
+        self.scanner._listdir = lambda d: listed.append(d) or listdir(d)
+        self.scanner.step()
+        self.assertEqual(listed, [self.root])
+        self.assertEqual(self.events, [])
+
+    def test_directories_above_the_root_are_not_filtered(self):
+        root = os.path.join(self.root, 'build', 'proj')
+        os.makedirs(root)
+        scanner = PollingScanner(
+            [root], warn_missing_lib=False, path_filter=PathFilter(
+                exclude=['build/*'], ignored_dirs=['build']),
+            **self.scanner_options)
+        kept = self.write('build/proj/pkg/mod.py')
+        self.write('build/proj/build/mod.py')
+        self.assertEqual(set(scanner._scan(trigger=False).created),
+                         set([kept]))
+
+    def test_scan_fires_deleted(self):
+        first = self.write('a.py')
+        second = self.write('b.py')
+        self.scanner._scan(trigger=False)
+        os.remove(first)
+        os.remove(second)
+        changes = self.scanner.step()
+        self.assertEqual(self.events, [('deleted', first),
+                                       ('deleted', second)])
+        self.assertEqual(changes, ChangeSet(deleted=[first, second]))
+
+
+class IncrementalPollingScannerTest(PollingScannerTest):
+    scanner_options = {'incremental': True}
+
+    def test_unchanged_directories_are_not_relisted(self):
+        filepath = self.write('pkg/mod.py')
+        os.utime(os.path.dirname(filepath), (1, 1))
+        os.utime(self.root, (1, 1))
+        self.scanner._scan(trigger=False)
+
+        listed = []
+        listdir = self.scanner._listdir
+        self.scanner._listdir = lambda d: listed.append(d) or listdir(d)
+        os.utime(filepath, (2, 2))
+        self.scanner.step()
+        self.assertEqual(listed, [])
+        self.assertEqual(self.events, [('modified', filepath)])
+
+    def test_validators_changing_during_a_scan_apply_to_the_next(self):
+        self.write('a.py')
+        notes = self.write('b.txt')
+        os.utime(self.root, (1, 1))
+        scanning, resume = threading.Event(), threading.Event()
+
+        def slow_py_files(filepath):
+            scanning.set()
+            resume.wait(5)
+            return filepath.endswith('.py')
+        self.scanner.set_validators([slow_py_files])
+        scan = threading.Thread(target=self.scanner._scan,
+                                kwargs={'trigger': False})
+        scan.start()
+        scanning.wait(5)
+        reconfigure = threading.Thread(
+            target=self.scanner.set_validators,
+            args=([lambda filepath: True],))
+        reconfigure.start()
+        reconfigure.join(0.1)
+        self.assertTrue(reconfigure.is_alive())
+        resume.set()
+        scan.join()
+        reconfigure.join()
+
+        self.scanner.step()
+        self.assertEqual(self.events, [('created', notes)])
+
+
+class ParallelPollingScannerTest(PollingScannerTest):
+    scanner_options = {'workers': 4}
+
+
+class MultiRootPollingScannerTest(ScannerTestCase):
+
+    def test_overlapping_roots_are_scanned_once(self):
+        self.scanner.add_path(os.path.join(self.root, 'pkg'))
+        self.scanner.add_path(self.root)
+        self.assertEqual(self.scanner.paths, (self.root,))
+
+        self.scanner._scan(trigger=False)
+        created = self.write('pkg/mod.py')
+        self.scanner.step()
+        self.assertEqual(self.events, [('created', created)])
+
+    def test_independent_roots_fire_one_stream(self):
+        other = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other)
+        self.scanner.add_path(other)
+        self.assertEqual(self.scanner.paths, (self.root, other))
+
+        self.scanner._scan(trigger=False)
+        first = self.write('a.py')
+        second = os.path.join(other, 'b.py')
+        with open(second, 'w') as handle:
+            handle.write('x = 1\n')
+        changes = self.scanner.step()
+        self.assertEqual(changes.created, set([first, second]))
+        self.assertEqual(sorted(self.events),
+                         sorted([('created', first), ('created', second)]))
+
+
+class ThreadedValidationTest(ScannerTestCase):
+    scanner_options = {'workers': 4}
+
+    def test_validators_run_on_the_scanning_thread(self):
+        other = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other)
+        self.scanner.add_path(other)
+        threads = set()
+
+        def validator(filepath):
+            threads.add(threading.current_thread())
+            return filepath.endswith('.py')
+        self.scanner.add_validator(validator)
+        for name in ('a.py', 'b.txt', 'pkg/c.py', 'pkg/sub/d.py'):
+            self.write(name)
+        with open(os.path.join(other, 'e.py'), 'w') as handle:
+            handle.write('x = 1\n')
+
+        changes = self.scanner._scan(trigger=False)
+        self.assertEqual(len(changes.created), 4)
+        self.assertEqual(threads, set([threading.current_thread()]))
+
+    def test_stop_shuts_the_pools_down(self):
+        self.scanner.add_path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.scanner.paths[1])
+        self.scanner._scan(trigger=False)
+        pools = (self.scanner._pool, self.scanner._root_pool)
+        self.scanner.stop()
+        for pool in pools:
+            self.assertRaises(RuntimeError, pool.submit, len, '')
+        created = self.write('mod.py')
+        self.scanner.step()
+        self.assertEqual(self.events, [('created', created)])
+
+
+class VerifyContentTest(ScannerTestCase):
+    scanner_options = {'verify_content': True}
+
+    def test_identical_rewrites_are_suppressed(self):
+        self.scanner._scan(trigger=False)
+        filepath = self.write('mod.py', 'x = 1\n', mtime=1)
+        self.scanner.step()
+        self.write('mod.py', 'x = 1\n', mtime=2)
+        self.scanner.step()
+        self.write('mod.py', 'x = 2\n', mtime=3)
+        self.scanner.step()
+
+        self.assertEqual(self.events, [('created', filepath),
+                                       ('modified', filepath)])
+        self.assertEqual(self.scanner.suppressed_events, 1)
+
+    def test_files_present_at_startup_are_verified(self):
+        filepath = self.write('mod.py', 'x = 1\n', mtime=1)
+        self.scanner._scan(trigger=False)
+        self.write('mod.py', 'x = 1\n', mtime=2)
+        self.scanner.step()
+        self.assertEqual(self.events, [])
+        self.assertEqual(self.scanner.suppressed_events, 1)
+
+        self.write('mod.py', 'x = 2\n', mtime=3)
+        self.scanner.step()
+        self.assertEqual(self.events, [('modified', filepath)])
+
+
+class SnapshotTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.snapshot = os.path.join(self.root, 'watch.snapshot')
+
+    def new_scanner(self):
+        return PollingScanner([self.root], warn_missing_lib=False,
+                              incremental=True, snapshot=self.snapshot)
+
+    def test_save_and_load_round_trip(self):
+        files = {'/a/b.py': (10 ** 18, 3, 2 ** 63), u'/a/\xe9.py': (1, 2, 3)}
+        dirs = {'/a': (5, 6)}
+        save(self.snapshot, files, dirs, key='k')
+        self.assertEqual(load(self.snapshot), (files, dirs, 'k'))
+
+    def test_snapshot_key_survives_new_validator_objects(self):
+        def py_files():
+            return lambda filepath: filepath.endswith('.py')
+
+        def txt_files():
+            return lambda filepath: filepath.endswith('.txt')
+        first = self.new_scanner()
+        first.add_validator(py_files())
+        first._scan(trigger=False)
+        first.checkpoint(force=True)
+
+        scanner = self.new_scanner()
+        scanner.add_validator(py_files())
+        self.assertTrue(scanner.restore_snapshot())
+        scanner = self.new_scanner()
+        scanner.add_validator(txt_files())
+        self.assertFalse(scanner.restore_snapshot())
+
+    def test_restored_snapshot_reports_offline_changes(self):
+        kept = os.path.join(self.root, 'kept.py')
+        removed = os.path.join(self.root, 'removed.py')
+        for filepath in (kept, removed):
+            with open(filepath, 'w') as handle:
+                handle.write('x = 1\n')
+        scanner = self.new_scanner()
+        scanner._scan(trigger=False)
+        scanner.checkpoint(force=True)
+
+        os.remove(removed)
+        added = os.path.join(self.root, 'added.py')
+        with open(added, 'w') as handle:
+            handle.write('y = 2\n')
+
+        scanner = self.new_scanner()
+        self.assertTrue(scanner.restore_snapshot())
+        self.assertEqual(scanner._scan(),
+                         ChangeSet(created=[added], deleted=[removed]))
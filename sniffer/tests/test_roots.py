@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ..scanner.filters import PathFilter
+from ..scanner.roots import normalize_roots
+
+
+class NormalizeRootsTest(TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        for dirname in ('src/pkg', 'lib', 'other', 'node_modules/dep'):
+            os.makedirs(self.path(dirname))
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_nested_and_duplicate_roots_are_dropped(self):
+        os.symlink(self.path('lib'), self.path('src/vendor'))
+        roots = normalize_roots([self.path('src'), self.path('src/pkg'),
+                                 self.path('src/vendor'), self.path('lib'),
+                                 self.path('src/../other')])
+        self.assertEqual(roots, [self.path('src'), self.path('src/vendor'),
+                                 self.path('other')])
+
+    def test_symlinked_root_covered_by_its_target_ancestor(self):
+        os.symlink(self.root, self.path('src/up'))
+        roots = normalize_roots([self.path('src/up'), self.path('other')])
+        self.assertEqual(roots, [self.path('src/up')])
+
+    def test_looping_symlinks_are_dropped(self):
+        os.symlink(self.path('loop'), self.path('loop'))
+        roots = normalize_roots([self.path('loop'), self.path('lib')])
+        self.assertEqual(roots, [self.path('lib')])
+
+    def test_roots_below_filtered_directories_are_kept(self):
+        path_filter = PathFilter(ignored_dirs=['node_modules'])
+        dep = self.path('node_modules/dep')
+        self.assertEqual(normalize_roots([self.root, dep], path_filter),
+                         [self.root, dep])
+        self.assertEqual(normalize_roots([self.root, dep]), [self.root])
+
+    def test_missing_roots_are_kept(self):
+        missing = os.path.join(tempfile.gettempdir(), 'sniffer-missing-root')
+        self.assertEqual(normalize_roots([missing, missing, self.root]),
+                         [missing, self.root])
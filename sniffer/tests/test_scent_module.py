@@ -1,7 +1,35 @@
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
 from unittest import TestCase
+from ..changes import ChangeSet
+from ..runner import ScentSniffer
 from ..scent_picker import load_file
 from ..scanner.base import BaseScanner
 
+SCENT = """
+from sniffer.api import *
+
+EXTS = %r
+
+
+@file_validator
+def py_files(filename):
+    return filename.endswith(EXTS)
+
+
+@file_validator
+def visible_files(filename):
+    return not filename.startswith('.')
+
+
+@runnable
+def execute(*args):
+    return True
+"""
+
 
 class ScentModuleTest(TestCase):
 
@@ -15,6 +43,25 @@ class ScentModuleTest(TestCase):
         scent.set_runner('execute_type2')
         self.assertEqual(scent.get_runners(), (scent.runners[1],))
 
+    def test_run_stops_at_the_first_failing_runner(self):
+        scent = load_file('sniffer/tests/scent_file.py')
+        calls = []
+        self.assertFalse(scent.run([calls.append]))
+        self.assertEqual((calls, scent.failed_runners),
+                         (['type1'], ('execute_type1',)))
+
+        calls = []
+        self.assertFalse(scent.run([calls.append], scent.runners[::-1]))
+        self.assertEqual((calls, scent.failed_runners),
+                         (['type2'], ('execute_type2',)))
+
+    def test_runners_for_picks_the_runnables_files_select(self):
+        scent = load_file('sniffer/tests/scent_file.py')
+        self.assertEqual(scent.runners_for(['a.type2']), (scent.runners[1],))
+        self.assertEqual(scent.runners_for(['a.type1', 'b.type2', 'c.txt']),
+                         scent.runners)
+        self.assertEqual(scent.runners_for([]), ())
+
     def test_scent_module_interaction_with_scanner(self):
         scent = load_file('sniffer/tests/scent_file.py')
         scanner = BaseScanner([], scent)
@@ -26,3 +73,124 @@ class ScentModuleTest(TestCase):
         self.assertTrue(scanner.is_valid_type('file.type2'))
         self.assertFalse(scanner.is_valid_type('file.negative'))
 
+    def test_scanner_caches_validator_decisions(self):
+        scent = load_file('sniffer/tests/scent_file.py')
+        scanner = BaseScanner([], scent)
+        for v in scent.validators:
+            scanner.add_validator(v)
+
+        scanner.is_valid_type('file.type1')
+        scanner.is_valid_type('file.type2')
+        self.assertTrue(scanner.is_valid_type('file.type1'))
+        self.assertEqual(scent.get_runners(), scent.runners)
+        self.assertEqual((scanner.decision_hits, scanner.decision_misses),
+                         (1, 2))
+
+        scanner.remove_validator(scent.validators[0])
+        self.assertFalse(scanner.is_valid_type('file.type1'))
+        self.assertEqual(scanner.decision_misses, 3)
+
+
+class ScentRoutingTest(TestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        shutil.copy('sniffer/tests/scent_file.py',
+                    os.path.join(root, 'routing_scent.py'))
+        self.addCleanup(sys.modules.pop, 'routing_scent', None)
+        self.addCleanup(lambda: sys.path.remove(root)
+                        if root in sys.path else None)
+        self.sniffer = ScentSniffer(root, 'routing_scent.py')
+        self.scanner = BaseScanner([], self.sniffer.scent)
+        self.sniffer.scent_observe_scanner(self.scanner)
+
+    def runner_names(self, changes):
+        ran = []
+        self.sniffer.clear = False
+        self.sniffer._run = lambda: ran.extend(
+            r.__name__ for r in self.sniffer.scent_runners())
+        self.sniffer._run_batch(changes)
+        return ran
+
+    def test_scanning_doesnt_pick_the_runnables(self):
+        self.assertTrue(self.scanner.is_valid_type('a.type1'))
+        self.assertEqual(self.sniffer.fork_request().get('runner_name'),
+                         None)
+        self.assertEqual(self.runner_names(ChangeSet()),
+                         ['execute_type1', 'execute_type2'])
+
+    def test_batches_run_the_runnables_their_files_select(self):
+        self.assertTrue(self.scanner.is_valid_type('a.type1'))
+        self.assertEqual(self.runner_names(ChangeSet(modified=['b.type2'])),
+                         ['execute_type2'])
+        self.assertEqual(self.runner_names(ChangeSet(modified=['c.txt'])),
+                         ['execute_type1', 'execute_type2'])
+
+    def test_unobserve_scanner_removes_the_scent_validators(self):
+        def extra(filepath):
+            return True
+        self.scanner.add_validator(extra)
+        self.sniffer.unobserve_scanner(self.scanner)
+        self.assertEqual(self.scanner.validators, (extra,))
+
+
+class ScentReloadTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.filename = os.path.join(self.root, 'reloaded_scent.py')
+        self.addCleanup(sys.modules.pop, 'reloaded_scent', None)
+        self.addCleanup(lambda: sys.path.remove(self.root)
+                        if self.root in sys.path else None)
+
+    def write(self, exts):
+        with open(self.filename, 'w') as handle:
+            handle.write(SCENT % (exts,))
+        os.utime(self.filename, (1, 1))
+
+    def test_reloading_keeps_sys_path_bounded(self):
+        self.write('.py')
+        scent = load_file(self.filename)
+        length = len(sys.path)
+        scent.reload().reload()
+        self.assertEqual(len(sys.path), length)
+        self.assertEqual(sys.path.count(self.root), 1)
+
+    def test_bytecode_is_cached_and_checked_against_the_source(self):
+        self.addCleanup(setattr, sys, 'dont_write_bytecode',
+                        sys.dont_write_bytecode)
+        sys.dont_write_bytecode = False
+        self.write('.py')
+        load_file(self.filename)
+        self.assertTrue(os.path.exists(
+            importlib.util.cache_from_source(self.filename)))
+
+        # same size and mtime: only the source hash tells them apart
+        self.write('.px')
+        scent = load_file(self.filename)
+        self.assertEqual(scent.mod.EXTS, '.px')
+
+    def test_unchanged_validators_keep_the_scanner_decisions(self):
+        self.write('.py')
+        old = load_file(self.filename)
+        scanner = BaseScanner([], old)
+        scanner.set_validators(old.validators)
+        self.assertTrue(scanner.is_valid_type('mod.py'))
+
+        new = old.reload()
+        self.assertEqual(new.keep_unchanged(old), [])
+        self.assertEqual(new.validators, old.validators)
+        scanner.set_validators(new.validators)
+        scanner.is_valid_type('mod.py')
+        self.assertEqual((scanner.decision_hits, scanner.decision_misses),
+                         (1, 1))
+
+        self.write('.px')
+        newer = new.reload()
+        self.assertEqual(newer.keep_unchanged(new), ['py_files'])
+        self.assertIs(newer.validators[1], new.validators[1])
+        self.assertEqual(newer.runners, new.runners)
+        scanner.set_validators(newer.validators)
+        self.assertFalse(scanner.is_valid_type('mod.py'))
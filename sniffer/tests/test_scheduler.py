@@ -0,0 +1,81 @@
+import threading
+import time
+from unittest import TestCase
+from ..changes import ChangeSet
+from ..scheduler import RunScheduler
+
+
+class RunSchedulerTest(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.interrupted = []
+        self.release = threading.Event()
+        self.scheduler = RunScheduler(interrupt=self.interrupted.append)
+        self.addCleanup(self.scheduler.stop, 5)
+
+    def job(self, name, block=False):
+        def run(changes):
+            self.calls.append((name, sorted(changes.paths)))
+            if block:
+                self.release.wait(5)
+        return run
+
+    def changes(self, *paths):
+        return ChangeSet(modified=paths)
+
+    def test_changes_queued_during_a_run_are_merged(self):
+        self.scheduler.submit('tests', self.job('tests', block=True),
+                              self.changes('a.py'))
+        self.scheduler.start()
+        while not self.scheduler.running:
+            time.sleep(0.01)
+        self.scheduler.submit('tests', self.job('tests'), self.changes('b.py'))
+        self.scheduler.submit('tests', self.job('tests'), self.changes('c.py'))
+        self.release.set()
+
+        self.assertTrue(self.scheduler.wait(5))
+        self.assertEqual(self.calls, [('tests', ['a.py']),
+                                      ('tests', ['b.py', 'c.py'])])
+        self.assertEqual(self.interrupted, ['tests', 'tests'])
+
+    def test_pending_jobs_run_by_priority(self):
+        self.scheduler.submit('tests', self.job('tests'), self.changes('a.py'))
+        self.scheduler.submit('scent', self.job('scent'), priority=0)
+        self.scheduler.start()
+
+        self.assertTrue(self.scheduler.wait(5))
+        self.assertEqual(self.calls, [('scent', []), ('tests', ['a.py'])])
+
+    def test_older_changes_are_put_first(self):
+        self.scheduler.submit('tests', self.job('tests'), self.changes('b.py'))
+        self.scheduler.submit('tests', self.job('tests'),
+                              ChangeSet(created=['b.py']), older=True)
+        self.scheduler.start()
+
+        self.assertTrue(self.scheduler.wait(5))
+        self.assertEqual(self.calls, [('tests', ['b.py'])])
+        self.assertEqual(self.interrupted, [])
+
+    def test_jobs_run_concurrently_up_to_the_maximum(self):
+        self.scheduler.max_concurrency = 2
+        self.scheduler.submit('a', self.job('a', block=True))
+        self.scheduler.submit('b', self.job('b', block=True))
+        self.scheduler.submit('c', self.job('c'))
+        self.scheduler.start()
+        while len(self.scheduler.running) < 2:
+            time.sleep(0.01)
+        self.assertEqual(self.scheduler.running, set(['a', 'b']))
+        self.assertEqual(self.scheduler.pending, set(['c']))
+        self.release.set()
+        self.assertTrue(self.scheduler.wait(5))
+        self.assertEqual(sorted(name for name, paths in self.calls),
+                         ['a', 'b', 'c'])
+
+    def test_stop_drops_pending_jobs(self):
+        self.scheduler.submit('tests', self.job('tests'))
+        self.scheduler.stop()
+        self.scheduler.start()
+        self.scheduler.submit('tests', self.job('tests'))
+        self.assertEqual(self.scheduler.pending, set())
+        self.assertEqual(self.calls, [])
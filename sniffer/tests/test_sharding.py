@@ -0,0 +1,94 @@
+import collections
+import io
+import os
+import re
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from importlib.util import find_spec
+from unittest import TestCase, skipUnless
+from ..sharding import DurationHistory, ShardedRun, balance
+
+# nose 1.3 still uses collections.Callable, gone since Python 3.10
+NOSE_RUNS = (find_spec('nose') is not None and
+             hasattr(collections, 'Callable'))
+
+
+class BalanceTest(TestCase):
+
+    def test_spreads_modules_by_duration(self):
+        names = ['a.py:test_1', 'a.py:test_2', 'b.py', 'c.py', 'd.py:T.test']
+        durations = {'a.py': 4.0, 'b.py': 3.0, 'c.py': 2.0, 'd.py': 1.0}
+        self.assertEqual(balance(names, durations, 2),
+                         [['a.py:test_1', 'a.py:test_2', 'd.py:T.test'],
+                          ['b.py', 'c.py']])
+
+    def test_unknown_modules_take_the_average(self):
+        names = ['a.py', 'b.py', 'c.py']
+        self.assertEqual(balance(names, {'a.py': 5.0, 'b.py': 1.0}, 2),
+                         [['a.py'], ['c.py', 'b.py']])
+
+    def test_never_makes_more_shards_than_modules(self):
+        self.assertEqual(balance(['a.py:test_1', 'a.py:test_2'], {}, 4),
+                         [['a.py:test_1', 'a.py:test_2']])
+
+
+class DurationHistoryTest(TestCase):
+
+    def test_durations_persist(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        filename = os.path.join(root, '.sniffer', 'durations.json')
+        history = DurationHistory(filename)
+        self.assertEqual(history.durations, {})
+        history.update({'a.py': 1.5, 'b.py': 2.0})
+        history.prune(['b.py'])
+        history.save()
+        self.assertEqual(DurationHistory(filename).durations, {'a.py': 1.5})
+
+
+@skipUnless(NOSE_RUNS, "nose can't run on this python")
+class ShardedRunTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.tests = os.path.join(self.root, 'tests')
+        os.mkdir(self.tests)
+        for index in range(3):
+            filename = os.path.join(self.tests, 'test_%d.py' % index)
+            with open(filename, 'w') as handle:
+                handle.write('def test_a():\n    pass\n\n\n'
+                             'def test_b():\n    pass\n')
+        self.history = DurationHistory(os.path.join(self.root,
+                                                    'durations.json'))
+
+    def run_sharded(self, argv, names=None):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            passed = ShardedRun(3, self.history).run(argv, names)
+        return passed, output.getvalue()
+
+    def test_each_worker_runs_its_own_shard(self):
+        passed, output = self.run_sharded(['nosetests', self.tests])
+        self.assertTrue(passed)
+        self.assertEqual([int(count) for count in
+                          re.findall(r'^Ran (\d+) tests?', output, re.M)],
+                         [2, 2, 2])
+        self.assertEqual(len(self.history.durations), 3)
+
+    def test_runs_the_names_given(self):
+        names = [os.path.join(self.tests, 'test_0.py') + ':test_a',
+                 os.path.join(self.tests, 'test_1.py') + ':test_b']
+        passed, output = self.run_sharded(['nosetests', self.tests], names)
+        self.assertTrue(passed)
+        self.assertEqual([int(count) for count in
+                          re.findall(r'^Ran (\d+) tests?', output, re.M)],
+                         [1, 1])
+
+    def test_fails_when_the_tests_cant_be_collected(self):
+        passed, output = self.run_sharded(
+            ['nosetests', '--no-such-option', self.tests])
+        self.assertFalse(passed)
+        self.assertIn("Failed to collect the tests.", output)
+        self.assertNotIn("Worker", output)